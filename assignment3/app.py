@@ -5,6 +5,7 @@ from flask import Flask, request, jsonify
 from flask_cors import CORS
 import google.generativeai as genai
 import requests
+from requests.adapters import HTTPAdapter
 import os
 from dotenv import load_dotenv
 import time
@@ -28,6 +29,14 @@ conversation_history = []
 ALPHA_VANTAGE_API_KEY = os.getenv('ALPHA_VANTAGE_API_KEY')
 ALPHA_VANTAGE_BASE_URL = 'https://www.alphavantage.co/query'
 
+# One session for every Alpha Vantage call, so the keep-alive connection
+# (and its TLS handshake) is reused instead of reopened per call
+http_session = requests.Session()
+http_session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=10))
+# Connect and read timeouts in seconds
+REQUEST_TIMEOUT = (float(os.getenv('UPSTREAM_CONNECT_TIMEOUT_SECONDS', '5')),
+                   float(os.getenv('UPSTREAM_READ_TIMEOUT_SECONDS', '30')))
+
 # Rate limiting setup
 last_request_time = 0
 min_request_interval = 12  # Alpha Vantage free tier allows 5 calls per minute
@@ -58,7 +67,8 @@ def get_stock_info(symbol):
                     'apikey': ALPHA_VANTAGE_API_KEY
                 }
                 
-                response = requests.get(ALPHA_VANTAGE_BASE_URL, params=params)
+                response = http_session.get(ALPHA_VANTAGE_BASE_URL, params=params,
+                                            timeout=REQUEST_TIMEOUT)
                 response.raise_for_status()
                 data = response.json()
                 
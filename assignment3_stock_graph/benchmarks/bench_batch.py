@@ -0,0 +1,108 @@
+"""Compare the news + price + plot + email flow over /call_function and
+/call_functions
+
+The sequential flow makes one round trip per call; the batch sends all four
+at once, with news and price running concurrently and plot and email
+waiting for what they depend on.
+
+    python benchmarks/bench_batch.py --latency 0.5 --runs 3
+"""
+
+import argparse
+import asyncio
+import time
+
+import httpx
+
+from stubs import load_server
+
+FROM_DATE = "2024-01-01"
+TO_DATE = "2024-03-31"
+
+
+def flow(stock_name: str):
+    """The calls the extension's agent makes for one analysis"""
+    dates = {"from_date": FROM_DATE, "to_date": TO_DATE}
+    return [
+        {
+            "id": "news",
+            "func_name": "get_stock_news",
+            "params": {"stock_name": stock_name, **dates},
+        },
+        {
+            "id": "price",
+            "func_name": "get_stock_price",
+            "params": {"stock_name": stock_name, **dates},
+        },
+        {
+            "id": "plot",
+            "func_name": "plot_graph",
+            "params": {"stock_name": stock_name, **dates},
+            "depends_on": ["news", "price"],
+        },
+        {
+            "id": "email",
+            "func_name": "send_email",
+            "params": {
+                "recipient_email": "bench@example.com",
+                "stock_name": stock_name,
+                "body": "Benchmark analysis",
+                **dates,
+            },
+            "depends_on": ["plot"],
+        },
+    ]
+
+
+async def sequential(client: httpx.AsyncClient, stock_name: str):
+    for call in flow(stock_name):
+        payload = {"func_name": call["func_name"], "params": call["params"]}
+        response = await client.post("/call_function", json=payload)
+        response.raise_for_status()
+
+
+async def batched(client: httpx.AsyncClient, stock_name: str):
+    response = await client.post(
+        "/call_functions", json={"calls": flow(stock_name)}
+    )
+    response.raise_for_status()
+    errors = [r for r in response.json()["results"] if r["status"] != "success"]
+    assert not errors, errors
+
+
+async def run(app, runs: int):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench", timeout=300
+    ) as client:
+        # Warm the render workers so kaleido start-up is not measured
+        await sequential(client, "WARM")
+        for name, mode in (("sequential", sequential), ("batch", batched)):
+            timings = []
+            for i in range(runs):
+                # A fresh stock per run so every call misses the cache
+                start = time.perf_counter()
+                await mode(client, f"{name.upper()}{i}")
+                timings.append(time.perf_counter() - start)
+            print(f"{name:>12} {sum(timings) / runs:>10.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    server = load_server(price_latency=args.latency, news_latency=args.latency)
+    server.alpha_vantage_limiter.rate = 1000
+    server.render_pool.start()
+    print(f"upstream latency {args.latency * 1000:.0f} ms")
+    print(f"{'mode':>12} {'seconds':>10}")
+    try:
+        asyncio.run(run(server.app, args.runs))
+    finally:
+        server.render_pool.shutdown()
+
+
+if __name__ == "__main__":
+    main()
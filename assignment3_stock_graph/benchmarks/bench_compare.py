@@ -0,0 +1,82 @@
+"""Comparing several symbols: one call per symbol versus one batch call
+
+Times, for --symbols symbols not yet in storage and then again warm:
+
+- per symbol: get_stock_price and plot_graph for each symbol in turn, as
+  the agent does today, rendering one chart per symbol
+- batch: one get_stock_prices and one plot_comparison call, fetching the
+  missing series PRICE_FETCH_CONCURRENCY at a time and rendering one chart
+
+Upstream prices come from the stub client with --latency seconds per
+call, with the Alpha Vantage rate limit lifted (pass --real-quotas to keep
+it). Runs with the server's startup hooks so plots render on the pool.
+
+    python benchmarks/bench_compare.py --symbols 5 --latency 0.3
+"""
+
+import argparse
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta
+
+from stubs import load_server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--symbols", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument(
+        "--real-quotas",
+        action="store_true",
+        help="Keep the free-tier upstream rate limits",
+    )
+    args = parser.parse_args()
+
+    if not args.real_quotas:
+        os.environ.setdefault("ALPHA_VANTAGE_RATE_PER_MINUTE", "1000000")
+    server = load_server(price_latency=args.latency)
+    to_date = datetime.now().date()
+    from_date = (to_date - timedelta(days=args.days)).strftime("%Y-%m-%d")
+    to_date = to_date.strftime("%Y-%m-%d")
+
+    def per_symbol(symbols):
+        for symbol in symbols:
+            server.get_stock_price(symbol, from_date, to_date)
+            server.plot_graph(symbol, from_date, to_date)
+
+    def batch(symbols):
+        server.get_stock_prices(symbols, from_date, to_date)
+        server.plot_comparison(symbols, from_date, to_date)
+
+    def run():
+        print(
+            f"{args.symbols} symbols, {args.days} days, "
+            f"{args.latency:.2f} s per upstream call"
+        )
+        print(f"{'flow':>12} {'cold s':>9} {'warm s':>9} {'upstream':>9}")
+        for name, flow in (("per symbol", per_symbol), ("batch", batch)):
+            symbols = [f"{name[0].upper()}{i}" for i in range(args.symbols)]
+            calls = server.ts.calls
+            start = time.perf_counter()
+            flow(symbols)
+            cold = time.perf_counter() - start
+            start = time.perf_counter()
+            flow(symbols)
+            warm = time.perf_counter() - start
+            print(
+                f"{name:>12} {cold:>9.2f} {warm:>9.3f} "
+                f"{server.ts.calls - calls:>9}"
+            )
+
+    async def session():
+        async with server.app.router.lifespan_context(server.app):
+            await asyncio.to_thread(run)
+
+    asyncio.run(session())
+
+
+if __name__ == "__main__":
+    main()
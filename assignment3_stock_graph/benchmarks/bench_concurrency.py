@@ -0,0 +1,68 @@
+"""Measure /call_function throughput as client concurrency grows
+
+Upstream calls are stubbed with a fixed latency so the numbers reflect how
+many requests the server overlaps, not network conditions.
+
+    python benchmarks/bench_concurrency.py --latency 0.2 --requests 64
+"""
+
+import argparse
+import asyncio
+import time
+
+import httpx
+
+from stubs import load_server
+
+
+async def run(app, concurrency: int, total: int) -> float:
+    """Send total requests with at most concurrency in flight"""
+    semaphore = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=app)
+
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+
+        async def one(i: int):
+            async with semaphore:
+                # A distinct range per request so each one misses the cache
+                payload = {
+                    "func_name": "get_stock_news",
+                    "params": {
+                        "stock_name": f"SYM{i}",
+                        "from_date": "2024-01-01",
+                        "to_date": "2024-01-05",
+                    },
+                }
+                response = await client.post("/call_function", json=payload)
+                response.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(total)))
+        return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, nargs="+")
+    args = parser.parse_args()
+
+    server = load_server(news_latency=args.latency)
+    levels = args.concurrency or [1, 2, 4, 8, 16, 32]
+
+    print(f"upstream latency {args.latency * 1000:.0f} ms")
+    print(f"{'concurrency':>12} {'seconds':>10} {'req/s':>10}")
+    for concurrency in levels:
+        server.redis_client.flushall()
+        elapsed = asyncio.run(run(server.app, concurrency, args.requests))
+        print(
+            f"{concurrency:>12} {elapsed:>10.2f} "
+            f"{args.requests / elapsed:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
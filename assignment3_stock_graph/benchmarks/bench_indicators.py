@@ -0,0 +1,88 @@
+"""Indicator cost when a day is appended to a cached price series
+
+Stores a symbol's 20-year series without its last day and computes the
+default indicators over it, then appends the day and times each indicator
+three ways through IndicatorStorage.get_indicator:
+
+- full: no cached values, the whole history is computed
+- append: cached values for all but the new day, which alone is computed
+- hit: the values already cover the series
+
+along with the computation alone (compute_indicator) for the full history
+and for the appended day. fakeredis runs in process, so set BENCH_REDIS_URL
+to include real network round trips. Also checks the appended values match
+a full recompute.
+
+    python benchmarks/bench_indicators.py --repeat 50
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from stubs import load_server
+
+
+def timed(function, setup, repeat: int) -> float:
+    """Median milliseconds of repeat calls of function, each after setup"""
+    latencies = []
+    for _ in range(repeat):
+        setup()
+        start = time.perf_counter()
+        function()
+        latencies.append(time.perf_counter() - start)
+    return float(np.median(latencies)) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    server = load_server()
+    from indicators import DEFAULT_INDICATORS, compute_indicator
+
+    prices, _ = server.ts.get_daily("BENCH", outputsize="full")
+    prices = prices.sort_index()
+    previous = prices.iloc[:-1]
+    storage = server.indicator_storage
+    backend = storage.backend
+
+    def forget(spec):
+        backend.delete(storage._get_key("BENCH", spec))
+        backend.hdel(storage._get_meta_key("BENCH"), spec)
+
+    print(f"median ms over {args.repeat} runs; {len(prices)} price rows")
+    columns = ["full", "append", "hit", "compute", "compute+1"]
+    print(f"{'indicator':>14} " + " ".join(f"{c:>10}" for c in columns))
+    closes = prices["4. close"].to_numpy()
+    for spec in DEFAULT_INDICATORS:
+        get = lambda: storage.get_indicator("BENCH", spec, prices)  # noqa
+        full = timed(get, lambda: forget(spec), args.repeat)
+        expected = get()
+
+        def cache_previous():
+            forget(spec)
+            storage.get_indicator("BENCH", spec, previous)
+
+        append = timed(get, cache_previous, args.repeat)
+        hit = timed(get, lambda: None, args.repeat)
+        if not np.allclose(get(), expected, equal_nan=True):
+            print(f"{spec}: appended values differ from a full recompute")
+
+        _, state = compute_indicator(spec, closes[:-1])
+        compute = timed(
+            lambda: compute_indicator(spec, closes), lambda: None, args.repeat
+        )
+        compute_day = timed(
+            lambda: compute_indicator(spec, closes, len(closes) - 1, state),
+            lambda: None,
+            args.repeat,
+        )
+        results = [full, append, hit, compute, compute_day]
+        print(f"{spec:>14} " + " ".join(f"{r:>10.3f}" for r in results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Hot-symbol read latency with and without the in-process L1 cache
+
+Warms one symbol's 20-year price series and a month of news, then has
+several threads read them repeatedly through StockPriceStorage.get_prices
+and NewsStorage.get_news, reporting p50/p99 per read. fakeredis runs in
+process, so set BENCH_REDIS_URL to include real network round trips.
+
+    python benchmarks/bench_l1_cache.py --threads 8 --reads 500
+"""
+
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from stubs import load_server
+
+
+def measure(read, threads: int, reads: int) -> np.ndarray:
+    """Latencies in ms of reads calls of read on each of threads threads"""
+
+    def worker(_):
+        latencies = []
+        for _ in range(reads):
+            start = time.perf_counter()
+            read()
+            latencies.append(time.perf_counter() - start)
+        return latencies
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        results = executor.map(worker, range(threads))
+    return np.array([lat for result in results for lat in result]) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--reads", type=int, default=500)
+    args = parser.parse_args()
+
+    server = load_server()
+    to_date = datetime.now().date()
+    from_date = (to_date - timedelta(days=30)).strftime("%Y-%m-%d")
+    to_date = to_date.strftime("%Y-%m-%d")
+    server.get_stock_price("HOT", from_date, to_date)
+    server.get_stock_news("HOT", from_date, to_date)
+
+    reads = {
+        "get_prices": lambda: server.price_storage.get_prices(
+            "HOT", from_date, to_date
+        ),
+        "get_news": lambda: server.news_storage.get_news(
+            "HOT", from_date, to_date
+        ),
+        "get_news date+title": lambda: server.news_storage.get_news(
+            "HOT", from_date, to_date, fields=("date", "title")
+        ),
+    }
+
+    print(f"{args.threads} threads x {args.reads} reads")
+    print(f"{'read':>20} {'L1':>4} {'p50 ms':>8} {'p99 ms':>8} {'reads/s':>9}")
+    for l1 in (False, True):
+        if l1:
+            server.l1_cache.start()
+            while not server.l1_cache.enabled:
+                time.sleep(0.01)
+        for name, read in reads.items():
+            read()
+            start = time.perf_counter()
+            latencies = measure(read, args.threads, args.reads)
+            elapsed = time.perf_counter() - start
+            p50, p99 = np.percentile(latencies, [50, 99])
+            print(
+                f"{name:>20} {'on' if l1 else 'off':>4} {p50:>8.3f} "
+                f"{p99:>8.3f} {len(latencies) / elapsed:>9.0f}"
+            )
+    server.l1_cache.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""Time a cold one-year news backfill through get_stock_news
+
+Compares year-long windows fetched one at a time, close to the old single
+request for the whole range, with shorter windows fetched concurrently. The stub Finnhub
+client's latency grows with the number of days requested.
+
+    python benchmarks/bench_news_backfill.py --latency-per-day 0.01
+"""
+
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from stubs import StubFinnhubClient, load_server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--latency-per-day", type=float, default=0.01)
+    parser.add_argument("--from-date", default="2024-01-01")
+    parser.add_argument("--to-date", default="2024-12-31")
+    args = parser.parse_args()
+
+    server = load_server()
+    server.finnhub_limiter.rate = 1000
+    configurations = [
+        ("366-day windows x1", 366, 1),
+        ("30-day windows x4", 30, 4),
+        ("30-day windows x8", 30, 8),
+        ("14-day windows x8", 14, 8),
+    ]
+
+    print(f"{'configuration':>20} {'requests':>9} {'seconds':>9}")
+    for name, window_days, concurrency in configurations:
+        server.redis_client.flushall()
+        server.finnhub_client = StubFinnhubClient(
+            latency=args.latency, latency_per_day=args.latency_per_day
+        )
+        server.news_window_days = window_days
+        server.news_backfill_executor = ThreadPoolExecutor(concurrency)
+
+        start = time.perf_counter()
+        news = server.get_stock_news("BENCH", args.from_date, args.to_date)
+        elapsed = time.perf_counter() - start
+        assert news, "backfill returned no news"
+        print(f"{name:>20} {server.finnhub_client.calls:>9} {elapsed:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
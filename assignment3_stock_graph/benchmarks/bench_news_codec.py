@@ -0,0 +1,118 @@
+"""Compare JSON with the columnar msgpack news encoding per 10k articles
+
+Articles are grouped into one payload per day, as NewsStorage stores them,
+with randomly worded ~300 character summaries. Reports the bytes stored per
+10k articles and the time to decode them all, in full and projected to the
+date and title plot_graph uses. With BENCH_REDIS_URL set, also reports the
+memory Redis itself reports for the keys.
+
+    python benchmarks/bench_news_codec.py --articles 10000
+"""
+
+import argparse
+import json
+import os
+import sys
+import timeit
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from stubs import SERVER_DIR
+
+sys.path.insert(0, SERVER_DIR)
+import news_codec  # noqa: E402
+
+WORDS = (
+    "shares revenue quarter guidance analysts market growth profit cloud "
+    "chip demand outlook investors earnings margin forecast deal sales "
+    "report rally decline product launch regulators buyback dividend"
+).split()
+
+
+def make_days(articles: int, per_day: int):
+    """Synthetic articles grouped by day like NewsStorage.store_news"""
+    rng = np.random.default_rng(0)
+    start = datetime(2020, 1, 1)
+    days = []
+    for day in range(-(-articles // per_day)):
+        date = (start + timedelta(days=day)).strftime("%Y-%m-%d")
+        count = min(per_day, articles - day * per_day)
+        days.append(
+            [
+                {
+                    "date": date,
+                    "title": " ".join(rng.choice(WORDS, 10)).capitalize(),
+                    "summary": " ".join(rng.choice(WORDS, 45)).capitalize()
+                    + ".",
+                }
+                for _ in range(count)
+            ]
+        )
+    return days
+
+
+def redis_bytes(payloads):
+    """Memory Redis reports for the payloads, None without a real Redis"""
+    if "BENCH_REDIS_URL" not in os.environ:
+        return None
+    import redis
+
+    client = redis.from_url(os.environ["BENCH_REDIS_URL"])
+    pipeline = client.pipeline(transaction=False)
+    keys = [f"bench:news:{i}" for i in range(len(payloads))]
+    for key, payload in zip(keys, payloads):
+        pipeline.set(key, payload)
+    pipeline.execute()
+    for key in keys:
+        pipeline.memory_usage(key)
+    used = sum(pipeline.execute())
+    client.delete(*keys)
+    return used
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--articles", type=int, default=10_000)
+    parser.add_argument("--per-day", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    days = make_days(args.articles, args.per_day)
+    scale = 10_000 / args.articles
+    encodings = {
+        "json": lambda day: json.dumps(day).encode(),
+        "msgpack": lambda day: news_codec.encode_news(day, compress=False),
+        "msgpack+zstd": news_codec.encode_news,
+    }
+
+    print(f"{args.articles} articles, {args.per_day} per day")
+    print(
+        f"{'encoding':>13} {'bytes/10k':>10} {'redis/10k':>10} "
+        f"{'full ms/10k':>12} {'date+title ms/10k':>18}"
+    )
+    for name, encode in encodings.items():
+        payloads = [encode(day) for day in days]
+        stored = sum(len(payload) for payload in payloads)
+        used = redis_bytes(payloads)
+
+        def decode(fields=None):
+            for payload in payloads:
+                news_codec.decode_news(payload, fields)
+
+        full_ms, projected_ms = (
+            timeit.timeit(lambda: decode(fields), number=args.repeat)
+            / args.repeat
+            * 1000
+            * scale
+            for fields in (None, ("date", "title"))
+        )
+        print(
+            f"{name:>13} {stored * scale:>10.0f} "
+            f"{'-' if used is None else f'{used * scale:.0f}':>10} "
+            f"{full_ms:>12.2f} {projected_ms:>18.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Compare news-marker construction in plot_graph before and after
+vectorization
+
+The old path looked up every article's date with list.index and added one
+trace and one annotation per article; build_plot_figure joins news to the
+price index in one pass and draws all markers as a single trace.
+
+    python benchmarks/bench_news_markers.py --years 2 --per-day 2
+
+The per-article path is quadratic; with ~1,000 items it takes minutes.
+"""
+
+import argparse
+import time
+
+import plotly.graph_objects as go
+
+from stubs import StubFinnhubClient, load_server
+
+
+def build_figure_per_article(stored_data, news) -> go.Figure:
+    """The per-article marker loop plot_graph used before"""
+    dates = stored_data.index.strftime("%Y-%m-%d").tolist()
+    prices = stored_data["4. close"].tolist()
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(x=dates, y=prices, mode="lines+markers"))
+    for i, news_item in enumerate(news):
+        date = news_item["date"]
+        if date in dates:
+            price = prices[dates.index(date)]
+            fig.add_trace(
+                go.Scatter(
+                    x=[date],
+                    y=[price],
+                    mode="markers",
+                    name=news_item["title"][:30],
+                    marker=dict(size=12, color="red", symbol="star"),
+                    showlegend=False,
+                )
+            )
+            fig.add_annotation(
+                x=date,
+                y=price,
+                text=news_item["title"][:30] + "...",
+                ay=-40 if i % 2 == 0 else 40,
+            )
+    return fig
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--years", type=int, default=2)
+    parser.add_argument("--per-day", type=int, default=2)
+    args = parser.parse_args()
+
+    server = load_server()
+    to_date = "2024-12-31"
+    from_date = f"{2024 - args.years + 1}-01-01"
+    stored_data = server.ts.get_daily("BENCH")[0].sort_index()
+    stored_data = stored_data.loc[from_date:to_date]
+    raw = StubFinnhubClient(per_day=args.per_day).company_news(
+        "BENCH", _from=from_date, to=to_date
+    )
+    news = [
+        {
+            "date": time.strftime("%Y-%m-%d", time.localtime(n["datetime"])),
+            "title": n["headline"],
+        }
+        for n in raw
+    ]
+    print(f"{len(stored_data)} trading days, {len(news)} news items")
+
+    builders = {
+        "per-article": lambda: build_figure_per_article(stored_data, news),
+        "vectorized": lambda: server.build_plot_figure(
+            "BENCH", stored_data, news
+        ),
+    }
+    print(
+        f"{'builder':>12} {'build s':>9} {'to_json s':>10} "
+        f"{'traces':>7} {'annotations':>12} {'json bytes':>11}"
+    )
+    for name, build in builders.items():
+        start = time.perf_counter()
+        fig = build()
+        built = time.perf_counter()
+        payload = fig.to_json()
+        serialized = time.perf_counter()
+        print(
+            f"{name:>12} {built - start:>9.3f} {serialized - built:>10.3f} "
+            f"{len(fig.data):>7} {len(fig.layout.annotations):>12} "
+            f"{len(payload):>11}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Compare pickle with the columnar price codec for cached price frames
+
+Reports encode/decode time for a full daily history and the Redis bytes
+each encoding costs per symbol-year (252 trading days).
+
+    python benchmarks/bench_price_codec.py --years 20
+"""
+
+import argparse
+import os
+import pickle
+import sys
+import timeit
+
+import pandas as pd
+
+from stubs import SERVER_DIR, StubTimeSeries
+
+sys.path.insert(0, SERVER_DIR)
+from price_codec import decode_frame, encode_frame  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--years", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    data, _ = StubTimeSeries(years=args.years).get_daily("BENCH")
+    data.index = pd.to_datetime(data.index)
+    data = data.sort_index()
+
+    codecs = {
+        "pickle": (pickle.dumps, pickle.loads),
+        "columnar f64": (encode_frame, decode_frame),
+        "columnar f32": (
+            lambda frame: encode_frame(frame, float32=True),
+            decode_frame,
+        ),
+    }
+
+    print(f"{len(data)} rows ({args.years} years), {args.repeat} runs each")
+    print(
+        f"{'codec':>14} {'encode ms':>10} {'decode ms':>10} "
+        f"{'bytes':>10} {'bytes/yr':>10}"
+    )
+    for name, (encode, decode) in codecs.items():
+        payload = encode(data)
+        encode_ms = (
+            timeit.timeit(lambda: encode(data), number=args.repeat)
+            / args.repeat
+            * 1000
+        )
+        decode_ms = (
+            timeit.timeit(lambda: decode(payload), number=args.repeat)
+            / args.repeat
+            * 1000
+        )
+        print(
+            f"{name:>14} {encode_ms:>10.3f} {decode_ms:>10.3f} "
+            f"{len(payload):>10} {len(payload) / args.years:>10.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
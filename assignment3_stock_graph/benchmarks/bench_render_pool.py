@@ -0,0 +1,66 @@
+"""Measure plot rendering throughput of the kaleido render pool
+
+Renders a plot_graph-sized figure (one year of daily prices with news
+markers) concurrently with 1, 4 and 8 worker processes. Throughput scales
+with the number of cores available, not beyond it.
+
+    python benchmarks/bench_render_pool.py --plots 24
+"""
+
+import argparse
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import plotly.graph_objects as go
+
+from stubs import SERVER_DIR
+
+sys.path.insert(0, SERVER_DIR)
+from render_pool import RenderPool  # noqa: E402
+
+
+def build_figure(points: int = 252, markers: int = 30) -> go.Figure:
+    """A figure shaped like the ones plot_graph renders"""
+    dates = np.arange("2024-01-01", points, dtype="datetime64[D]")
+    prices = 100 + np.cumsum(np.random.default_rng(0).normal(0, 1, points))
+    fig = go.Figure(go.Scatter(x=dates, y=prices, mode="lines+markers"))
+    picks = np.linspace(0, points - 1, markers).astype(int)
+    fig.add_trace(
+        go.Scatter(
+            x=dates[picks],
+            y=prices[picks],
+            mode="markers",
+            marker=dict(size=12, color="red", symbol="star"),
+        )
+    )
+    fig.update_xaxes(rangeslider_visible=True)
+    return fig
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--plots", type=int, default=24)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8])
+    args = parser.parse_args()
+
+    figure = build_figure()
+    print(f"{args.plots} plots per run")
+    print(f"{'workers':>8} {'seconds':>10} {'plots/s':>10}")
+    for workers in args.workers:
+        pool = RenderPool(workers, queue_size=args.plots, timeout=300)
+        # Warm every worker so kaleido start-up is not measured
+        with ThreadPoolExecutor(workers) as warm:
+            list(warm.map(lambda _: pool.render(figure), range(workers)))
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(args.plots) as clients:
+            list(clients.map(lambda _: pool.render(figure), range(args.plots)))
+        elapsed = time.perf_counter() - start
+        pool.shutdown()
+        print(f"{workers:>8} {elapsed:>10.2f} {args.plots / elapsed:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
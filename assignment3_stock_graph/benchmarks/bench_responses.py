@@ -0,0 +1,108 @@
+"""Serialization time and bytes sent for a 5-year daily price series
+
+First times encoding the get_stock_price result for /call_function with
+FastAPI's default path (jsonable_encoder + json) against orjson and the
+compact delta/f32 price encodings, with the size after gzip and brotli. Then
+sends the same call through the app to check the bytes on the wire with
+content negotiation.
+
+    python benchmarks/bench_responses.py --years 5
+"""
+
+import argparse
+import timeit
+from datetime import datetime, timedelta
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+
+from stubs import load_server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--years", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    server = load_server()
+    from http_encoding import (
+        FastJSONResponse,
+        brotli,
+        compress,
+        encode_price_array,
+    )
+
+    to_date = datetime.now().date()
+    from_date = to_date - timedelta(days=365 * args.years)
+    params = {
+        "stock_name": "BENCH",
+        "from_date": from_date.strftime("%Y-%m-%d"),
+        "to_date": to_date.strftime("%Y-%m-%d"),
+    }
+    prices = server.get_stock_price(**params)
+
+    def default(values):
+        return JSONResponse(
+            jsonable_encoder({"status": "success", "result": values})
+        ).body
+
+    def fast(values):
+        return FastJSONResponse({"status": "success", "result": values}).body
+
+    encoders = {
+        "default json": lambda: default(prices),
+        "orjson": lambda: fast(prices),
+        "orjson delta": lambda: fast(encode_price_array(prices, "delta")),
+        "orjson f32": lambda: fast(encode_price_array(prices, "f32")),
+    }
+    encodings = ["gzip"] + (["br"] if brotli is not None else [])
+
+    print(f"{len(prices)} closes ({args.years} years), {args.repeat} runs")
+    print(
+        f"{'encoder':>13} {'ms':>7} {'bytes':>7} "
+        + " ".join(f"{name:>7} {name + ' ms':>8}" for name in encodings)
+    )
+    for name, encode in encoders.items():
+        body = encode()
+        encode_ms = timeit.timeit(encode, number=args.repeat) / args.repeat
+        cells = []
+        for encoding in encodings:
+            compressed = compress(body, encoding)
+            compress_ms = (
+                timeit.timeit(
+                    lambda: compress(body, encoding), number=args.repeat
+                )
+                / args.repeat
+            )
+            cells.append(f"{len(compressed):>7} {compress_ms * 1000:>8.3f}")
+        print(
+            f"{name:>13} {encode_ms * 1000:>7.3f} {len(body):>7} "
+            + " ".join(cells)
+        )
+
+    print("\nOver HTTP (bytes on the wire, mean ms per call)")
+    client = TestClient(server.app)
+    for price_encoding in ("list", "delta", "f32"):
+        for accept in ("identity", "gzip", "br, gzip"):
+            request = dict(
+                url=f"/call_function?price_encoding={price_encoding}",
+                json={"func_name": "get_stock_price", "params": params},
+                headers={"Accept-Encoding": accept},
+            )
+            response = client.post(**request)
+            response.raise_for_status()
+            elapsed = timeit.timeit(
+                lambda: client.post(**request), number=args.repeat // 4
+            ) / (args.repeat // 4)
+            print(
+                f"{price_encoding:>5} {accept:>9} "
+                f"{response.headers.get('content-encoding', '-'):>5} "
+                f"{response.headers['content-length']:>7} "
+                f"{elapsed * 1000:>7.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""Compare the Redis, memory and SQLite storage backends
+
+Builds the news, price and plot stores on each backend and times opening
+the backend, writing and reading a 20-year price series, a year of news by
+day, the coverage check for that year, and storing and reading plots.
+The Redis numbers use in-process fakeredis unless BENCH_REDIS_URL points at
+a real server; SQLite uses a WAL-mode file in a temporary directory.
+
+    python benchmarks/bench_storage_backends.py --repeat 200
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from stubs import load_server
+
+
+def timed(function, repeat: int) -> float:
+    """Median milliseconds of repeat calls of function"""
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        latencies.append(time.perf_counter() - start)
+    return float(np.median(latencies)) * 1000
+
+
+def make_news(from_date: str, days: int, per_day: int):
+    """Articles shaped like the ones get_stock_news stores"""
+    start = datetime.strptime(from_date, "%Y-%m-%d")
+    return [
+        {
+            "date": (start + timedelta(days=day)).strftime("%Y-%m-%d"),
+            "title": f"Headline {i} of day {day}",
+            "summary": "Lorem ipsum dolor sit amet. " * 8,
+        }
+        for day in range(days)
+        for i in range(per_day)
+    ]
+
+
+def open_backends(server, directory: str):
+    """Open each backend, returning (name, client, milliseconds to open)"""
+    import redis
+    from storage_backends import MemoryBackend, SQLiteBackend
+
+    start = time.perf_counter()
+    client = redis.from_url(os.getenv("BENCH_REDIS_URL", server.redis_url))
+    client.ping()
+    client.flushdb()
+    yield "redis", client, (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    client = MemoryBackend()
+    yield "memory", client, (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    client = SQLiteBackend(os.path.join(directory, "bench.db"))
+    yield "sqlite", client, (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--news-days", type=int, default=365)
+    args = parser.parse_args()
+
+    server = load_server()
+    prices, _ = server.StubTimeSeries().get_daily("BENCH", outputsize="full")
+    to_date = datetime.now().date()
+    from_date = (to_date - timedelta(days=args.news_days - 1)).strftime(
+        "%Y-%m-%d"
+    )
+    to_date = to_date.strftime("%Y-%m-%d")
+    news = make_news(from_date, args.news_days, per_day=3)
+    plot = {"image": "x" * 200_000}
+
+    columns = [
+        "open",
+        "store_prices",
+        "get_prices",
+        "store_news",
+        "get_news",
+        "missing",
+        "store_plot",
+        "get_plot",
+    ]
+    print(
+        f"median ms over {args.repeat} runs; {len(prices)} price rows, "
+        f"{len(news)} articles over {args.news_days} days"
+    )
+    print(f"{'backend':>8} " + " ".join(f"{c:>12}" for c in columns))
+    with tempfile.TemporaryDirectory() as directory:
+        for name, client, open_ms in open_backends(server, directory):
+            policy = server.CachePolicy(
+                client,
+                budget_bytes=1024**3,
+                store_ttls={"news": 0, "prices": 0, "plots": 0},
+            )
+            news_storage = server.NewsStorage(client, policy=policy)
+            price_storage = server.StockPriceStorage(client, policy=policy)
+            plot_storage = server.PlotStorage(client, policy=policy)
+
+            # The writes are fewer: each one also runs the budget check
+            writes = max(1, args.repeat // 10)
+            results = [
+                open_ms,
+                timed(
+                    lambda: price_storage.store_prices("BENCH", prices), writes
+                ),
+                timed(
+                    lambda: price_storage.get_prices(
+                        "BENCH", from_date, to_date
+                    ),
+                    args.repeat,
+                ),
+                timed(
+                    lambda: news_storage.store_news(
+                        "BENCH", from_date, to_date, news
+                    ),
+                    writes,
+                ),
+                timed(
+                    lambda: news_storage.get_news("BENCH", from_date, to_date),
+                    args.repeat,
+                ),
+                timed(
+                    lambda: news_storage.get_missing_dates(
+                        "BENCH", from_date, to_date
+                    ),
+                    args.repeat,
+                ),
+                timed(
+                    lambda: plot_storage.store_plot(
+                        "BENCH", from_date, to_date, "fp", plot
+                    ),
+                    writes,
+                ),
+                timed(
+                    lambda: plot_storage.get_plot("BENCH", from_date, to_date),
+                    args.repeat,
+                ),
+            ]
+            print(f"{name:>8} " + " ".join(f"{r:>12.3f}" for r in results))
+            client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+"""Handshakes saved by the pooled upstream client fetching symbols in a row
+
+Serves Alpha Vantage shaped quotes over HTTPS from a local server with a
+self-signed certificate (made with the openssl command), then fetches
+--symbols quotes back to back:
+
+- requests.get per call, as alpha_vantage and assignment3/app.py did,
+  which opens a new TCP + TLS connection every time
+- the pooled UpstreamClient, one call after another
+- the pooled UpstreamClient from --concurrency threads, as the server's
+  price fetch pool calls it
+- UpstreamClient.aget_json, --concurrency calls at a time
+
+and reports the time per call and the connections opened. Localhost has no
+round-trip time, so the saving shown is the CPU cost of the handshakes; on
+a real network every avoided handshake also saves the TCP and TLS round
+trips to the provider. Pass --url to time a real HTTPS endpoint instead.
+
+    python benchmarks/bench_upstream_pool.py --symbols 200
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import ssl
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import requests
+
+from stubs import SERVER_DIR  # noqa: F401 (puts the server on sys.path)
+
+
+class QuoteHandler(BaseHTTPRequestHandler):
+    """Answers every GET with a small Global Quote, keeping the connection"""
+
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; without this Nagle and
+    # delayed ACKs add 40 ms to every call on a kept-alive connection
+    disable_nagle_algorithm = True
+
+    latency = 0.0
+
+    def do_GET(self):
+        time.sleep(self.latency)
+        body = json.dumps(
+            {"Global Quote": {"01. symbol": "BENCH", "05. price": "100.0"}}
+        ).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_server(directory: str):
+    """Start the local HTTPS server, returning its URL and certificate"""
+    cert = os.path.join(directory, "cert.pem")
+    key = os.path.join(directory, "key.pem")
+    subprocess.run(
+        [
+            "openssl",
+            "req",
+            "-x509",
+            "-newkey",
+            "rsa:2048",
+            "-nodes",
+            "-keyout",
+            key,
+            "-out",
+            cert,
+            "-days",
+            "1",
+            "-subj",
+            "/CN=localhost",
+            "-addext",
+            "subjectAltName=DNS:localhost,IP:127.0.0.1",
+        ],
+        check=True,
+        capture_output=True,
+    )
+    context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+    context.load_cert_chain(cert, key)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), QuoteHandler)
+    server.daemon_threads = True
+    # Handshake in the handler threads rather than serially in accept
+    server.socket = context.wrap_socket(
+        server.socket, server_side=True, do_handshake_on_connect=False
+    )
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"https://127.0.0.1:{server.server_address[1]}", cert
+
+
+def report(name: str, latencies, elapsed: float, connections: int):
+    latencies = np.array(latencies) * 1000
+    print(
+        f"{name:>22} {np.mean(latencies):>9.2f} "
+        f"{np.percentile(latencies, 50):>9.2f} {elapsed:>9.2f} "
+        f"{connections:>6}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument("--symbols", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--url", help="Real HTTPS base URL to fetch instead")
+    parser.add_argument("--path", default="/query")
+    parser.add_argument(
+        "--server-latency",
+        type=float,
+        default=0.0,
+        help="Seconds the local server takes to answer",
+    )
+    args = parser.parse_args()
+
+    import metrics
+    from upstream_http import UpstreamClient
+
+    with tempfile.TemporaryDirectory() as directory:
+        if args.url:
+            base_url, verify = args.url, True
+        else:
+            QuoteHandler.latency = args.server_latency
+            base_url, verify = start_server(directory)
+        symbols = [f"SYM{i}" for i in range(args.symbols)]
+
+        print(f"{args.symbols} quotes from {base_url}")
+        print(
+            f"{'client':>22} {'mean ms':>9} {'p50 ms':>9} {'total s':>9} "
+            f"{'conns':>6}"
+        )
+
+        per_call = []
+        start = time.perf_counter()
+        for symbol in symbols:
+            call_start = time.perf_counter()
+            requests.get(
+                base_url + args.path,
+                params={"function": "GLOBAL_QUOTE", "symbol": symbol},
+                verify=verify,
+            ).json()
+            per_call.append(time.perf_counter() - call_start)
+        report(
+            "requests.get per call",
+            per_call,
+            time.perf_counter() - start,
+            len(symbols),
+        )
+
+        metrics.reset()
+        client = UpstreamClient("bench", base_url, verify=verify)
+        latencies = []
+        start = time.perf_counter()
+        for symbol in symbols:
+            call_start = time.perf_counter()
+            client.get_json(
+                args.path, {"function": "GLOBAL_QUOTE", "symbol": symbol}
+            )
+            latencies.append(time.perf_counter() - call_start)
+        elapsed = time.perf_counter() - start
+        connections = int(metrics.get_counters()["upstream_connections:bench"])
+        report("pooled", latencies, elapsed, connections)
+        client.close()
+        saved = (np.mean(per_call) - np.mean(latencies)) * 1000
+
+        metrics.reset()
+        client = UpstreamClient(
+            "bench", base_url, max_connections=args.concurrency, verify=verify
+        )
+        latencies = []
+
+        def fetch(symbol):
+            call_start = time.perf_counter()
+            client.get_json(
+                args.path, {"function": "GLOBAL_QUOTE", "symbol": symbol}
+            )
+            latencies.append(time.perf_counter() - call_start)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            list(executor.map(fetch, symbols))
+        elapsed = time.perf_counter() - start
+        connections = int(metrics.get_counters()["upstream_connections:bench"])
+        report(
+            f"pooled x{args.concurrency} threads",
+            latencies,
+            elapsed,
+            connections,
+        )
+        client.close()
+
+        metrics.reset()
+        client = UpstreamClient(
+            "bench", base_url, max_connections=args.concurrency, verify=verify
+        )
+
+        async def fetch_all():
+            latencies = []
+            semaphore = asyncio.Semaphore(args.concurrency)
+
+            async def fetch(symbol):
+                async with semaphore:
+                    call_start = time.perf_counter()
+                    await client.aget_json(
+                        args.path,
+                        {"function": "GLOBAL_QUOTE", "symbol": symbol},
+                    )
+                    latencies.append(time.perf_counter() - call_start)
+
+            await asyncio.gather(*(fetch(symbol) for symbol in symbols))
+            await client.aclose()
+            return latencies
+
+        start = time.perf_counter()
+        latencies = asyncio.run(fetch_all())
+        elapsed = time.perf_counter() - start
+        connections = int(metrics.get_counters()["upstream_connections:bench"])
+        report(
+            f"pooled async x{args.concurrency}", latencies, elapsed, connections
+        )
+        client.close()
+
+        print(f"\nSaved per call by reusing connections: {saved:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""Replay the chrome extension's call sequence against the app offline
+
+Each simulated user runs sessions of the extension's agent loop for a
+symbol: get_stock_news and get_stock_price for the last five days, then
+send_email (with --flow full, plot_graph before the email). Requests go
+through the ASGI app in process, with the server's startup hooks run, over
+fakeredis (or BENCH_REDIS_URL) and stub Alpha Vantage, Finnhub and Gmail
+clients with the given latencies.
+
+Reports throughput, p50/p95/p99 per call and overall, and a per-stage
+breakdown from the server's own metrics: time in each function, upstream
+API, rate limiter and Redis round trips per request. Save a run with
+--output and compare a later one with --baseline to flag regressions.
+
+    python benchmarks/loadtest.py --users 8 --sessions 64 --news-latency 0.2
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+import httpx
+import numpy as np
+
+from stubs import load_server
+
+EXTENSION_FLOW = ["get_stock_news", "get_stock_price", "send_email"]
+FULL_FLOW = ["get_stock_news", "get_stock_price", "plot_graph", "send_email"]
+
+
+def session_calls(flow: List[str], stock_name: str) -> List[Dict]:
+    """The /call_function bodies of one extension session"""
+    to_date = datetime.now().date()
+    dates = {
+        "from_date": (to_date - timedelta(days=5)).strftime("%Y-%m-%d"),
+        "to_date": to_date.strftime("%Y-%m-%d"),
+    }
+    params = {
+        "get_stock_news": {"stock_name": stock_name, **dates},
+        "get_stock_price": {"stock_name": stock_name, **dates},
+        "plot_graph": {"stock_name": stock_name, **dates},
+        "send_email": {
+            "recipient_email": "loadtest@example.com",
+            "stock_name": stock_name,
+            "body": f"Analysis of {stock_name}",
+            **dates,
+        },
+    }
+    return [{"func_name": name, "params": params[name]} for name in flow]
+
+
+async def run(app, args) -> Dict[str, List[float]]:
+    """Run the sessions and return client-side latencies per call"""
+    latencies = defaultdict(list)
+    rng = random.Random(args.seed)
+    symbols = [f"SYM{i}" for i in range(args.symbols)]
+    queue: asyncio.Queue = asyncio.Queue()
+    for _ in range(args.sessions):
+        queue.put_nowait(rng.choice(symbols))
+    flow = FULL_FLOW if args.flow == "full" else EXTENSION_FLOW
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://loadtest", timeout=300
+    ) as client:
+
+        async def user():
+            while not queue.empty():
+                stock_name = queue.get_nowait()
+                for call in session_calls(flow, stock_name):
+                    start = time.perf_counter()
+                    response = await client.post("/call_function", json=call)
+                    elapsed = time.perf_counter() - start
+                    if response.status_code != 200:
+                        latencies["errors"].append(elapsed)
+                    latencies[call["func_name"]].append(elapsed)
+                    # The agent waits for the LLM between calls
+                    if args.think_time:
+                        await asyncio.sleep(args.think_time)
+
+        await asyncio.gather(*(user() for _ in range(args.users)))
+    return latencies
+
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    p50, p95, p99 = np.percentile(np.array(values) * 1000, [50, 95, 99])
+    return {"count": len(values), "p50": p50, "p95": p95, "p99": p99}
+
+
+def stage_breakdown(metrics) -> Dict[str, Dict[str, float]]:
+    """Mean time or count per sample of the server's stage histograms"""
+    stages = {}
+    for name, (count, total) in sorted(metrics.get_histograms().items()):
+        if count and not name.startswith("request_latency_seconds"):
+            stages[name] = {"count": count, "mean": total / count}
+    counters = metrics.get_counters()
+    for name, total in sorted(counters.items()):
+        if name.startswith("rate_limit_wait_seconds:"):
+            calls = counters.get(name.replace("_wait_seconds", "_calls"), 0)
+            if calls:
+                stages[name] = {"count": calls, "mean": total / calls}
+    return stages
+
+
+def compare(result: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Describe metrics that regressed by more than tolerance"""
+    regressions = []
+    if result["throughput"] < baseline["throughput"] * (1 - tolerance):
+        regressions.append(
+            f"throughput {result['throughput']:.1f} < "
+            f"{baseline['throughput']:.1f} sessions/s"
+        )
+    for call, stats in result["calls"].items():
+        before = baseline["calls"].get(call)
+        if before is None:
+            continue
+        for key in ("p50", "p95", "p99"):
+            if stats[key] > before[key] * (1 + tolerance):
+                regressions.append(
+                    f"{call} {key} {stats[key]:.1f} > {before[key]:.1f} ms"
+                )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument("--users", type=int, default=8)
+    parser.add_argument("--sessions", type=int, default=64)
+    parser.add_argument("--symbols", type=int, default=16)
+    parser.add_argument("--flow", choices=["extension", "full"])
+    parser.add_argument("--price-latency", type=float, default=0.3)
+    parser.add_argument("--news-latency", type=float, default=0.2)
+    parser.add_argument("--gmail-latency", type=float, default=0.2)
+    parser.add_argument("--think-time", type=float, default=0.0)
+    parser.add_argument(
+        "--real-quotas",
+        action="store_true",
+        help="Keep the free-tier upstream rate limits",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the results as JSON")
+    parser.add_argument("--baseline", help="JSON results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    if not args.real_quotas:
+        os.environ.setdefault("ALPHA_VANTAGE_RATE_PER_MINUTE", "1000000")
+        os.environ.setdefault("FINNHUB_RATE_PER_MINUTE", "1000000")
+    server = load_server(
+        price_latency=args.price_latency,
+        news_latency=args.news_latency,
+        gmail_latency=args.gmail_latency,
+    )
+
+    async def session():
+        async with server.app.router.lifespan_context(server.app):
+            start = time.perf_counter()
+            latencies = await run(server.app, args)
+            return latencies, time.perf_counter() - start
+
+    latencies, elapsed = asyncio.run(session())
+    errors = latencies.pop("errors", [])
+    result = {
+        "users": args.users,
+        "sessions": args.sessions,
+        "seconds": elapsed,
+        "throughput": args.sessions / elapsed,
+        "errors": len(errors),
+        "calls": {
+            name: percentiles(values) for name, values in latencies.items()
+        },
+        "stages": stage_breakdown(server.metrics),
+    }
+    result["calls"]["all"] = percentiles(
+        [value for values in latencies.values() for value in values]
+    )
+
+    print(
+        f"{args.sessions} sessions, {args.users} users, {args.symbols} "
+        f"symbols: {elapsed:.2f} s, {result['throughput']:.1f} sessions/s, "
+        f"{len(errors)} errors"
+    )
+    print(
+        f"\n{'call':>16} {'count':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"
+    )
+    for name, stats in result["calls"].items():
+        print(
+            f"{name:>16} {stats['count']:>6} {stats['p50']:>8.1f} "
+            f"{stats['p95']:>8.1f} {stats['p99']:>8.1f}"
+        )
+    print(f"\n{'stage':>60} {'count':>6} {'mean':>9}")
+    for name, stats in result["stages"].items():
+        unit = "" if "round_trips" in name else " ms"
+        mean = stats["mean"] if unit == "" else stats["mean"] * 1000
+        print(f"{name:>60} {stats['count']:>6.0f} {mean:>9.2f}{unit}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(result, json.load(f), args.tolerance)
+        if regressions:
+            print("\nRegressions beyond tolerance:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print("\nNo regressions beyond tolerance")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""Local stand-ins for Redis and the upstream APIs used by server.py
+
+Importing server.py needs API keys and a reachable Redis, and every function
+call goes out to Alpha Vantage or Finnhub. The helpers here let benchmarks
+import the server offline with fakeredis and stub clients that sleep for a
+configurable latency instead of calling the network.
+"""
+
+import os
+import sys
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVER_DIR)
+
+from outbox import StubTransport  # noqa: E402
+from stub_clients import StubFinnhubClient, StubTimeSeries  # noqa: E402
+
+
+def load_server(
+    price_latency: float = 0.0,
+    news_latency: float = 0.0,
+    gmail_latency: float = 0.0,
+):
+    """Import server.py against fakeredis and stub upstream clients"""
+    import fakeredis
+    import redis
+
+    for name in (
+        "ALPHA_VANTAGE_KEY",
+        "FINNHUB_KEY",
+        "GMAIL_USER",
+        "GMAIL_APP_PASSWORD",
+    ):
+        os.environ.setdefault(name, "benchmark")
+    os.environ.setdefault("GMAIL_TRANSPORT", "stub")
+
+    if "BENCH_REDIS_URL" in os.environ:
+        os.environ["REDIS_URL"] = os.environ["BENCH_REDIS_URL"]
+    else:
+        fake_server = fakeredis.FakeServer()
+        redis.from_url = lambda url, **kwargs: fakeredis.FakeRedis(
+            server=fake_server, **kwargs
+        )
+
+    import server
+
+    server.ts = StubTimeSeries(latency=price_latency)
+    server.finnhub_client = StubFinnhubClient(latency=news_latency)
+    server.email_outbox.transport = StubTransport(latency=gmail_latency)
+    return server
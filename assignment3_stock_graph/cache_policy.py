@@ -0,0 +1,251 @@
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+import metrics
+from storage_backends import register_script
+
+LRU = "lru"
+LFU = "lfu"
+
+# Account for a cached value: move its size from the store it was counted
+# under (if any) to its store, and record its access score and expiry.
+# KEYS: size hash, store hash, bytes-per-store hash, access zset, expiry zset
+# ARGV: cached key, store, size, eviction policy, now, expires at (0: never)
+_TRACK = """
+local old_size = redis.call('HGET', KEYS[1], ARGV[1])
+local old_store = redis.call('HGET', KEYS[2], ARGV[1])
+if old_size and old_store then
+    redis.call('HINCRBY', KEYS[3], old_store, -tonumber(old_size))
+end
+redis.call('HSET', KEYS[1], ARGV[1], ARGV[3])
+redis.call('HSET', KEYS[2], ARGV[1], ARGV[2])
+redis.call('HINCRBY', KEYS[3], ARGV[2], ARGV[3])
+if ARGV[4] == 'lfu' then
+    redis.call('ZINCRBY', KEYS[4], 1, ARGV[1])
+else
+    redis.call('ZADD', KEYS[4], ARGV[5], ARGV[1])
+end
+if tonumber(ARGV[6]) > 0 then
+    redis.call('ZADD', KEYS[5], ARGV[6], ARGV[1])
+else
+    redis.call('ZREM', KEYS[5], ARGV[1])
+end
+"""
+
+# Record reads of tracked keys, ignoring keys that are not tracked
+# KEYS: access zset; ARGV: eviction policy, now, cached keys...
+_TOUCH = """
+for i = 3, #ARGV do
+    if redis.call('ZSCORE', KEYS[1], ARGV[i]) then
+        if ARGV[1] == 'lfu' then
+            redis.call('ZINCRBY', KEYS[1], 1, ARGV[i])
+        else
+            redis.call('ZADD', KEYS[1], ARGV[2], ARGV[i])
+        end
+    end
+end
+"""
+
+# Stop tracking keys that expired or were evicted, returning their stores
+# KEYS: size hash, store hash, bytes-per-store hash, access zset, expiry zset
+# ARGV: cached keys...
+_FORGET = """
+local stores = {}
+for i = 1, #ARGV do
+    local size = redis.call('HGET', KEYS[1], ARGV[i])
+    local store = redis.call('HGET', KEYS[2], ARGV[i])
+    if size and store then
+        redis.call('HINCRBY', KEYS[3], store, -tonumber(size))
+    end
+    stores[i] = store or ''
+    redis.call('HDEL', KEYS[1], ARGV[i])
+    redis.call('HDEL', KEYS[2], ARGV[i])
+    redis.call('ZREM', KEYS[4], ARGV[i])
+    redis.call('ZREM', KEYS[5], ARGV[i])
+end
+return stores
+"""
+
+
+def _track_local(client, keys: List[str], args: List):
+    """_TRACK on a local storage backend"""
+    key, store, size, eviction, now, expires_at = args
+    old_size = client.hget(keys[0], key)
+    old_store = client.hget(keys[1], key)
+    if old_size is not None and old_store is not None:
+        client.hincrby(keys[2], old_store, -int(old_size))
+    client.hset(keys[0], key, size)
+    client.hset(keys[1], key, store)
+    client.hincrby(keys[2], store, int(size))
+    if eviction == LFU:
+        client.zincrby(keys[3], 1, key)
+    else:
+        client.zadd(keys[3], {key: now})
+    if float(expires_at) > 0:
+        client.zadd(keys[4], {key: expires_at})
+    else:
+        client.zrem(keys[4], key)
+
+
+def _touch_local(client, keys: List[str], args: List):
+    """_TOUCH on a local storage backend"""
+    eviction, now, *cached = args
+    for key in cached:
+        if client.zscore(keys[0], key) is not None:
+            if eviction == LFU:
+                client.zincrby(keys[0], 1, key)
+            else:
+                client.zadd(keys[0], {key: now})
+
+
+def _forget_local(client, keys: List[str], args: List) -> List:
+    """_FORGET on a local storage backend"""
+    stores = []
+    for key in args:
+        size = client.hget(keys[0], key)
+        store = client.hget(keys[1], key)
+        if size is not None and store is not None:
+            client.hincrby(keys[2], store, -int(size))
+        stores.append(store or "")
+        client.hdel(keys[0], key)
+        client.hdel(keys[1], key)
+        client.zrem(keys[3], key)
+        client.zrem(keys[4], key)
+    return stores
+
+
+class CachePolicy:
+    """TTLs, memory budget and eviction shared by the cached stores
+
+    Stores report every value they write (with its size) and the keys they
+    read. Values get a per-store TTL, or a shorter one when they hold data
+    for a recent trading day that may still change. Bytes are tracked per
+    store, and when the total goes over the budget the least recently (LRU)
+    or least frequently (LFU) used values are deleted. Stores can register a
+    callback to clean up their indexes when their values are evicted or
+    expire.
+    """
+
+    def __init__(
+        self,
+        redis_client,
+        budget_bytes: int,
+        eviction: str = LRU,
+        store_ttls: Dict[str, int] = None,
+        recent_days: int = 7,
+        recent_ttl: int = 3600,
+        evict_batch: int = 32,
+    ):
+        self.redis = redis_client
+        self.budget_bytes = budget_bytes
+        self.eviction = eviction
+        self.store_ttls = store_ttls or {}
+        self.recent_days = recent_days
+        self.recent_ttl = recent_ttl
+        self.evict_batch = evict_batch
+        self.prefix = "cache:"
+        self._keys = [
+            f"{self.prefix}size",
+            f"{self.prefix}store",
+            f"{self.prefix}bytes",
+            f"{self.prefix}access",
+            f"{self.prefix}expiry",
+        ]
+        self._on_evict: Dict[str, Callable[[List[str]], None]] = {}
+        self._track = register_script(self.redis, _TRACK, _track_local)
+        self._touch = register_script(self.redis, _TOUCH, _touch_local)
+        self._forget = register_script(self.redis, _FORGET, _forget_local)
+
+    def register_store(
+        self, store: str, on_evict: Callable[[List[str]], None] = None
+    ):
+        """Register a callback run with the keys evicted from a store or
+        expired in it
+        """
+        if on_evict is not None:
+            self._on_evict[store] = on_evict
+
+    def is_recent(self, date: str) -> bool:
+        """Check if a date is recent enough that its data may still change"""
+        cutoff = datetime.now() - timedelta(days=self.recent_days)
+        return date >= cutoff.strftime("%Y-%m-%d")
+
+    def ttl_for(self, store: str, date: str = None) -> Optional[int]:
+        """Seconds a value should live, None if it never expires"""
+        ttl = self.store_ttls.get(store) or None
+        if date is not None and self.is_recent(date):
+            return min(ttl, self.recent_ttl) if ttl else self.recent_ttl
+        return ttl
+
+    def track(self, pipeline, store: str, key: str, size: int, ttl: int = None):
+        """Queue accounting for a value written with the given TTL"""
+        now = time.time()
+        expires_at = now + ttl if ttl else 0
+        self._track(
+            keys=self._keys,
+            args=[key, store, size, self.eviction, now, expires_at],
+            client=pipeline,
+        )
+
+    def touch(self, pipeline, keys: List[str]):
+        """Queue recording a read of the given keys"""
+        if keys:
+            self._touch(
+                keys=[self._keys[3]],
+                args=[self.eviction, time.time(), *keys],
+                client=pipeline,
+            )
+
+    def forget(self, keys: List[str]):
+        """Stop tracking values a store deleted itself"""
+        if keys:
+            self._forget(keys=self._keys, args=keys)
+
+    def record_lookup(self, store: str, hit: bool):
+        """Count a cache hit or miss for a store"""
+        metrics.increment(f"cache_{'hits' if hit else 'misses'}:{store}")
+
+    def get_bytes(self) -> Dict[str, int]:
+        """Bytes currently tracked per store"""
+        return {
+            (store.decode() if isinstance(store, bytes) else store): int(size)
+            for store, size in self.redis.hgetall(self._keys[2]).items()
+        }
+
+    def _by_store(self, keys: List[str], stores: List) -> Dict[str, List]:
+        """Group forgotten keys by the store _FORGET returned for each"""
+        grouped: Dict[str, List[str]] = {}
+        for key, store in zip(keys, stores):
+            store = store.decode() if isinstance(store, bytes) else store
+            grouped.setdefault(store, []).append(key)
+        return grouped
+
+    def enforce(self):
+        """Drop expired entries and evict until under the memory budget"""
+        expired = [
+            key.decode() if isinstance(key, bytes) else key
+            for key in self.redis.zrangebyscore(
+                self._keys[4], "-inf", time.time()
+            )
+        ]
+        if expired:
+            stores = self._forget(keys=self._keys, args=expired)
+            for store, keys in self._by_store(expired, stores).items():
+                if store in self._on_evict:
+                    self._on_evict[store](keys)
+
+        while sum(self.get_bytes().values()) > self.budget_bytes:
+            victims = self.redis.zrange(self._keys[3], 0, self.evict_batch - 1)
+            if not victims:
+                break
+            victims = [
+                key.decode() if isinstance(key, bytes) else key
+                for key in victims
+            ]
+            self.redis.delete(*victims)
+            stores = self._forget(keys=self._keys, args=victims)
+            for store, keys in self._by_store(victims, stores).items():
+                metrics.increment(f"cache_evictions:{store}", len(keys))
+                if store in self._on_evict:
+                    self._on_evict[store](keys)
@@ -14,7 +14,9 @@ You have the following tools at hand. You are supposed to complete the task only
 where python_function_name is one of the following:
 1. get_stock_news(stock_name,from_date,to_date):return news
 2. get_stock_price(stock_name,from_date,to_date): return list of prices for the given stock name and date range in chronological ascending order
-3. send_email(recipient_email,stock_name,body): return True if email is sent successfully, else return False
+3. get_stock_prices(stock_names,from_date,to_date): return the dates and, for each stock in the stock_names list, its prices on those dates, to compare several stocks in one call
+4. get_indicators(stock_name,from_date,to_date,indicators): return the first, last, lowest and highest value in the date range of each indicator, where indicators is an optional list of "returns", "sma:<days>", "ema:<days>", "rsi:<days>", "volatility:<days>" and "drawdown"
+5. send_email(recipient_email,stock_name,body): queue the email and return its message id, else return False
 
 
 For example: if you are responding for getting stock news for stock named Ola for last 3 days, then you should return:
@@ -1,5 +1,7 @@
 import base64
 import os.path
+import threading
+from datetime import datetime, timedelta
 from email.mime.text import MIMEText
 
 from google.auth.transport.requests import Request
@@ -11,7 +13,16 @@ from googleapiclient.discovery import build
 SCOPES = ["https://www.googleapis.com/auth/gmail.send"]
 
 
-def get_gmail_service():
+# Refresh the access token this long before it expires, so a send never
+# has to wait for a refresh
+TOKEN_REFRESH_MARGIN = timedelta(minutes=5)
+
+_service = None
+_credentials = None
+_service_lock = threading.Lock()
+
+
+def _load_credentials():
     creds = None
     if os.path.exists("token.json"):
         creds = Credentials.from_authorized_user_file("token.json", SCOPES)
@@ -26,9 +37,34 @@ def get_gmail_service():
             creds = flow.run_local_server(port=0)
         with open("token.json", "w") as token:
             token.write(creds.to_json())
+    return creds
+
 
-    service = build("gmail", "v1", credentials=creds)
-    return service
+def _expires_soon(creds) -> bool:
+    # Credentials.expiry is a naive UTC datetime
+    return creds.expiry is not None and (
+        creds.expiry - datetime.utcnow() < TOKEN_REFRESH_MARGIN
+    )
+
+
+def get_gmail_service():
+    """Return a long-lived Gmail service shared by all callers
+
+    token.json is read and the discovery document built once per process;
+    later calls only refresh the token when it is about to expire.
+    """
+    global _service, _credentials
+    with _service_lock:
+        if _service is None:
+            _credentials = _load_credentials()
+            _service = build(
+                "gmail", "v1", credentials=_credentials, cache_discovery=False
+            )
+        elif _expires_soon(_credentials) and _credentials.refresh_token:
+            _credentials.refresh(Request())
+            with open("token.json", "w") as token:
+                token.write(_credentials.to_json())
+        return _service
 
 
 def send_email(sender, to, subject, body_text):
@@ -0,0 +1,189 @@
+import re
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Technical indicators over a stock's daily closes. Each indicator computes
+# the values of closes[start:] given the closes before them and the state
+# it returned for closes[:start], so when new days are appended to a series
+# only the new rows are computed: windowed indicators re-read the last
+# window of closes, recursive ones (EMA, RSI, drawdown) carry their last
+# value in the state. start=0 with no state computes the whole history.
+TRADING_DAYS = 252
+
+Compute = Callable[..., Tuple[np.ndarray, Dict[str, float]]]
+
+
+def _pad(n: int, start: int, first: int, values: np.ndarray) -> np.ndarray:
+    """Rows start..n-1, NaN before the first one that has a value"""
+    out = np.full(n - start, np.nan)
+    if first < n:
+        out[max(first, start) - start :] = values[max(start - first, 0) :]
+    return out
+
+
+def _ewm(values: np.ndarray, alpha: float, initial: float) -> np.ndarray:
+    """y[t] = y[t-1] + alpha * (values[t] - y[t-1]), from y[-1] = initial"""
+    smoothed = (
+        pd.Series(np.concatenate(([initial], values)))
+        .ewm(alpha=alpha, adjust=False)
+        .mean()
+        .to_numpy()
+    )
+    return smoothed[1:]
+
+
+def returns(closes: np.ndarray, start: int, state: Dict) -> Tuple:
+    """Daily simple returns"""
+    lo = max(start - 1, 0)
+    segment = closes[lo:]
+    values = segment[1:] / segment[:-1] - 1
+    return _pad(len(closes), start, lo + 1, values), {}
+
+
+def sma(closes: np.ndarray, start: int, state: Dict, window: int) -> Tuple:
+    """Simple moving average of the last window closes"""
+    lo = max(start - window + 1, 0)
+    sums = np.cumsum(np.concatenate(([0.0], closes[lo:])))
+    values = (sums[window:] - sums[:-window]) / window
+    return _pad(len(closes), start, lo + window - 1, values), {}
+
+
+def ema(closes: np.ndarray, start: int, state: Dict, span: int) -> Tuple:
+    """Exponential moving average, seeded with the first close"""
+    if not closes.size:
+        return np.empty(0), {}
+    if "ema" in state:
+        values = _ewm(closes[start:], 2 / (span + 1), state["ema"])
+    else:
+        values = _ewm(closes[1:], 2 / (span + 1), closes[0])
+        values = np.concatenate((closes[:1], values))[start:]
+    return values, {"ema": float(values[-1])} if values.size else state
+
+
+def rsi(closes: np.ndarray, start: int, state: Dict, period: int) -> Tuple:
+    """Relative strength index with Wilder's smoothing"""
+    n = len(closes)
+    changes = np.diff(closes)
+    gains = np.clip(changes, 0, None)
+    losses = np.clip(-changes, 0, None)
+    if "gain" in state:
+        # The change into row t is changes[t - 1]
+        avg_gain = _ewm(gains[start - 1 :], 1 / period, state["gain"])
+        avg_loss = _ewm(losses[start - 1 :], 1 / period, state["loss"])
+        first = start
+    elif n > period:
+        # The first average is the plain mean of the first period changes
+        seed_gain = gains[:period].mean()
+        seed_loss = losses[:period].mean()
+        avg_gain = np.concatenate(
+            ([seed_gain], _ewm(gains[period:], 1 / period, seed_gain))
+        )
+        avg_loss = np.concatenate(
+            ([seed_loss], _ewm(losses[period:], 1 / period, seed_loss))
+        )
+        first = period
+    else:
+        return np.full(n - start, np.nan), {}
+    with np.errstate(divide="ignore", invalid="ignore"):
+        values = 100 - 100 / (1 + avg_gain / avg_loss)
+    # No losses in the window: fully overbought
+    values[avg_loss == 0] = 100.0
+    if avg_gain.size:
+        state = {"gain": float(avg_gain[-1]), "loss": float(avg_loss[-1])}
+    return _pad(n, start, first, values), state
+
+
+def volatility(
+    closes: np.ndarray, start: int, state: Dict, window: int
+) -> Tuple:
+    """Annualized standard deviation of the last window daily log returns"""
+    lo = max(start - window, 0)
+    log_returns = np.diff(np.log(closes[lo:]))
+    if len(log_returns) < window:
+        return np.full(len(closes) - start, np.nan), {}
+    values = sliding_window_view(log_returns, window).std(axis=1, ddof=1)
+    values *= np.sqrt(TRADING_DAYS)
+    return _pad(len(closes), start, lo + window, values), {}
+
+
+def drawdown(closes: np.ndarray, start: int, state: Dict) -> Tuple:
+    """Fall of the close from the highest close so far in the history"""
+    segment = closes[start:]
+    if not segment.size:
+        return np.empty(0), state
+    peak = np.maximum.accumulate(
+        np.concatenate(([state.get("peak", segment[0])], segment))
+    )[1:]
+    return segment / peak - 1, {"peak": float(peak[-1])}
+
+
+# name -> (function, default parameters)
+INDICATORS: Dict[str, Tuple[Compute, Tuple[int, ...]]] = {
+    "returns": (returns, ()),
+    "sma": (sma, (20,)),
+    "ema": (ema, (20,)),
+    "rsi": (rsi, (14,)),
+    "volatility": (volatility, (20,)),
+    "drawdown": (drawdown, ()),
+}
+DEFAULT_INDICATORS = (
+    "returns",
+    "sma:20",
+    "ema:20",
+    "rsi:14",
+    "volatility:20",
+    "drawdown",
+)
+
+
+def parse_spec(spec: str) -> str:
+    """Normalize an indicator spec such as "SMA:20", filling in defaults
+
+    "sma20" is read as "sma:20". Raises ValueError for unknown indicators
+    and invalid parameters.
+    """
+    spec = str(spec).strip().lower()
+    spec = re.sub(r"^([a-z]+)(\d+)$", r"\1:\2", spec)
+    name, *params = spec.split(":")
+    if name not in INDICATORS:
+        raise ValueError(
+            f"Unknown indicator {name}, expected one of "
+            f"{', '.join(INDICATORS)}"
+        )
+    defaults = INDICATORS[name][1]
+    if len(params) > len(defaults):
+        raise ValueError(f"Indicator {name} takes {len(defaults)} parameter(s)")
+    try:
+        params = [int(p) for p in params] + list(defaults[len(params) :])
+    except ValueError:
+        raise ValueError(f"Parameters of {spec} must be integers")
+    if any(p < 1 for p in params):
+        raise ValueError(f"Parameters of {spec} must be positive")
+    return ":".join([name, *map(str, params)])
+
+
+def parse_specs(specs: Union[str, Sequence[str], None]) -> List[str]:
+    """Normalized specs of a list or comma-separated string, deduplicated
+
+    Returns the default indicators when there are none.
+    """
+    if isinstance(specs, str):
+        specs = specs.split(",")
+    specs = [spec for spec in specs or () if str(spec).strip()]
+    return list(dict.fromkeys(map(parse_spec, specs or DEFAULT_INDICATORS)))
+
+
+def compute_indicator(
+    spec: str,
+    closes: np.ndarray,
+    start: int = 0,
+    state: Optional[Dict[str, float]] = None,
+) -> Tuple[np.ndarray, Dict[str, float]]:
+    """Values of a parsed spec for closes[start:] and the state after them"""
+    name, *params = spec.split(":")
+    function = INDICATORS[name][0]
+    closes = np.asarray(closes, dtype="f8")
+    return function(closes, start, state or {}, *map(int, params))
@@ -0,0 +1,185 @@
+import json
+import logging
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict, Optional
+
+import anyio
+import redis
+
+import metrics
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+FINISHED = (DONE, FAILED)
+
+_worker_redis = None
+
+
+def _get_key(job_id: str) -> str:
+    """Generate the key of a job"""
+    return f"job:{job_id}"
+
+
+def _init_worker(env: Dict[str, str]):
+    """Apply environment overrides before a worker imports the runner"""
+    os.environ.update(env)
+
+
+def _run_job(
+    job_id: str,
+    runner: Callable[[str, Dict[str, Any]], Any],
+    redis_url: str,
+    result_ttl: int,
+):
+    """Run a job in a worker process and record its outcome in Redis"""
+    global _worker_redis
+    if _worker_redis is None:
+        _worker_redis = redis.from_url(redis_url)
+
+    key = _get_key(job_id)
+    func_name, params = _worker_redis.hmget(key, ["func_name", "params"])
+    _worker_redis.hset(
+        key, mapping={"status": RUNNING, "started_at": time.time()}
+    )
+    try:
+        result = runner(func_name.decode(), json.loads(params))
+        update = {"status": DONE, "result": json.dumps(result)}
+    except Exception as e:
+        update = {"status": FAILED, "error": str(e)}
+    update["finished_at"] = time.time()
+    pipeline = _worker_redis.pipeline()
+    pipeline.hset(key, mapping=update)
+    pipeline.expire(key, result_ttl)
+    pipeline.execute()
+
+
+class JobQueue:
+    """Runs long function calls as background jobs in a process pool
+
+    A job is a hash job:<id> holding the call, its status (queued, running,
+    done or failed), timestamps and the JSON result or error. Workers record
+    the outcome themselves, so the result is readable from any server
+    worker, and it expires result_ttl seconds after the job finishes. Jobs
+    that never finish (their server died before the worker started) expire
+    job_ttl seconds after they were submitted. Watchers poll Redis on
+    threads taken from limiter, the server's pool for blocking calls.
+    """
+
+    def __init__(
+        self,
+        redis_client,
+        redis_url: str,
+        runner: Callable[[str, Dict[str, Any]], Any],
+        workers: int,
+        result_ttl: int = 3600,
+        job_ttl: int = 86400,
+        worker_env: Optional[Dict[str, str]] = None,
+        limiter: Optional[anyio.CapacityLimiter] = None,
+    ):
+        self.redis = redis_client
+        self.redis_url = redis_url
+        self.runner = runner
+        self.workers = workers
+        self.result_ttl = result_ttl
+        self.job_ttl = job_ttl
+        self.worker_env = worker_env or {}
+        self.limiter = limiter
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(self.worker_env,),
+                )
+            return self._executor
+
+    def shutdown(self):
+        """Stop the worker processes"""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def submit(self, func_name: str, params: Dict[str, Any]) -> str:
+        """Queue a function call and return its job id"""
+        job_id = uuid.uuid4().hex
+        key = _get_key(job_id)
+        pipeline = self.redis.pipeline()
+        pipeline.hset(
+            key,
+            mapping={
+                "func_name": func_name,
+                "params": json.dumps(params),
+                "status": QUEUED,
+                "created_at": time.time(),
+            },
+        )
+        pipeline.expire(key, self.job_ttl)
+        pipeline.execute()
+        future = self._get_executor().submit(
+            _run_job, job_id, self.runner, self.redis_url, self.result_ttl
+        )
+        future.add_done_callback(lambda f: self._on_done(job_id, f))
+        metrics.increment(f"jobs_submitted:{func_name}")
+        return job_id
+
+    def _on_done(self, job_id: str, future):
+        """Mark jobs whose worker died before recording an outcome"""
+        error = None if future.cancelled() else future.exception()
+        if future.cancelled() or error is not None:
+            logging.error(f"Job {job_id} did not complete: {error}")
+            key = _get_key(job_id)
+            pipeline = self.redis.pipeline()
+            pipeline.hset(
+                key,
+                mapping={
+                    "status": FAILED,
+                    "error": str(error or "Job was cancelled"),
+                    "finished_at": time.time(),
+                },
+            )
+            pipeline.expire(key, self.result_ttl)
+            pipeline.execute()
+
+    def get_status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Return a job's status, timestamps and result or error"""
+        job = {
+            field.decode(): value.decode()
+            for field, value in self.redis.hgetall(_get_key(job_id)).items()
+        }
+        if not job:
+            return None
+        job["params"] = json.loads(job["params"])
+        if "result" in job:
+            job["result"] = json.loads(job["result"])
+        return job
+
+    async def watch(
+        self, job_id: str, poll_interval: float = 0.5
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Yield the job each time its status changes, until it finishes"""
+        last_status = None
+        while True:
+            job = await anyio.to_thread.run_sync(
+                self.get_status, job_id, limiter=self.limiter
+            )
+            if job is None:
+                return
+            if job["status"] != last_status:
+                last_status = job["status"]
+                yield job
+            if last_status in FINISHED:
+                return
+            await anyio.sleep(poll_interval)
@@ -0,0 +1,200 @@
+import json
+import logging
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, Optional, Tuple
+
+import pandas as pd
+
+import metrics
+
+# Returned by LocalCache.get on a miss, as None is a cacheable value
+MISS = object()
+
+
+def estimate_size(value: Any) -> int:
+    """Approximate bytes held by a decoded cache value"""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True).sum())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_size(v) for v in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(
+            estimate_size(v) for v in value.values()
+        )
+    return sys.getsizeof(value)
+
+
+class LocalCache:
+    """Bounded in-process cache of decoded values in front of Redis
+
+    Entries are evicted least recently used first once their estimated size
+    exceeds max_bytes, and expire after ttl seconds as a bound on staleness.
+    Writers call invalidate with the Redis keys they changed; the keys are
+    dropped locally and published on a channel that every worker's
+    listener thread applies. The cache only serves entries while its
+    listener is subscribed, so processes that never start it, and gaps
+    while it reconnects, always read Redis.
+    """
+
+    def __init__(
+        self,
+        redis_client,
+        max_bytes: int,
+        ttl: float = 300,
+        channel: str = "cache:invalidate",
+    ):
+        self.redis = redis_client
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.channel = channel
+        self.worker_id = uuid.uuid4().hex
+        self._lock = threading.Lock()
+        # (key, variant) -> (value, size, expires_at)
+        self._entries: "OrderedDict[Tuple[str, Hashable], Tuple]" = (
+            OrderedDict()
+        )
+        self._variants: Dict[str, set] = {}
+        self._bytes = 0
+        # Bumped on every invalidation: a value read from Redis before one
+        # may be stale and is not cached
+        self._generation = 0
+        self._listening = False
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0 and self._listening
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def get(self, key: str, variant: Hashable = None) -> Any:
+        """Return a cached value, or MISS"""
+        if not self.enabled:
+            return MISS
+        with self._lock:
+            entry = self._entries.get((key, variant))
+            if entry is None:
+                return MISS
+            if entry[2] < time.monotonic():
+                self._remove((key, variant))
+                return MISS
+            self._entries.move_to_end((key, variant))
+            return entry[0]
+
+    def put(
+        self,
+        key: str,
+        value: Any,
+        generation: int,
+        variant: Hashable = None,
+        size: Optional[int] = None,
+    ):
+        """Cache a value read from Redis at the given generation"""
+        if not self.enabled:
+            return
+        size = estimate_size(value) if size is None else size
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._remove((key, variant))
+            self._entries[(key, variant)] = (
+                value,
+                size,
+                time.monotonic() + self.ttl,
+            )
+            self._variants.setdefault(key, set()).add(variant)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                metrics.increment("l1_evictions")
+
+    def _remove(self, entry_key: Tuple[str, Hashable]):
+        entry = self._entries.pop(entry_key, None)
+        if entry is None:
+            return
+        self._bytes -= entry[1]
+        key, variant = entry_key
+        variants = self._variants.get(key)
+        if variants is not None:
+            variants.discard(variant)
+            if not variants:
+                del self._variants[key]
+
+    def _drop(self, keys: Iterable[str]):
+        with self._lock:
+            self._generation += 1
+            for key in keys:
+                for variant in list(self._variants.get(key, ())):
+                    self._remove((key, variant))
+
+    def clear(self):
+        """Drop every entry"""
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._variants.clear()
+            self._bytes = 0
+
+    def invalidate(self, keys: Iterable[str]):
+        """Drop keys here and in every other worker"""
+        keys = list(keys)
+        if not keys:
+            return
+        self._drop(keys)
+        if self.max_bytes > 0:
+            self.redis.publish(
+                self.channel,
+                json.dumps({"worker": self.worker_id, "keys": keys}),
+            )
+
+    def get_bytes(self) -> int:
+        return self._bytes
+
+    def start(self):
+        """Start the invalidation listener thread"""
+        if self.max_bytes <= 0:
+            return
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run, name="l1-invalidation", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self):
+        """Stop the invalidation listener thread"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def _run(self):
+        while not self._stop.is_set():
+            pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+            try:
+                pubsub.subscribe(self.channel)
+                # Invalidations missed while unsubscribed cannot be replayed
+                self.clear()
+                self._listening = True
+                while not self._stop.is_set():
+                    message = pubsub.get_message(timeout=1.0)
+                    if message is None:
+                        continue
+                    data = json.loads(message["data"])
+                    if data["worker"] != self.worker_id:
+                        self._drop(data["keys"])
+            except Exception as e:
+                logging.error(f"Error listening for invalidations: {str(e)}")
+                self._stop.wait(1)
+            finally:
+                self._listening = False
+                pubsub.close()
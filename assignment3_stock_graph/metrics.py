@@ -0,0 +1,259 @@
+import bisect
+import contextvars
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Process-wide counters, histograms and gauges, guarded by a lock because
+# /call_function runs functions on a thread pool. Names follow the
+# "<metric>:<label value>:..." convention; LABELS gives the label names used
+# when rendering them for Prometheus.
+_lock = threading.Lock()
+_counters: Dict[str, float] = defaultdict(float)
+_gauges: Dict[str, float] = {}
+# name -> [bucket counts..., +Inf count, sum]
+_histograms: Dict[str, List[float]] = {}
+_buckets: Dict[str, Sequence[float]] = {}
+
+LATENCY_BUCKETS = (
+    0.001,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+    30,
+    60,
+)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+LABELS = {
+    "cache_hits": ("store",),
+    "cache_misses": ("store",),
+    "cache_evictions": ("store",),
+    "cache_bytes": ("store",),
+    "cache_hit_ratio": ("store",),
+    "l1_hits": ("store",),
+    "l1_misses": ("store",),
+    "jobs_submitted": ("function",),
+    "function_latency_seconds": ("function",),
+    "function_errors": ("function",),
+    "upstream_latency_seconds": ("provider",),
+    "upstream_requests": ("provider",),
+    "upstream_retries": ("provider",),
+    "upstream_retries_denied": ("provider",),
+    "upstream_connections": ("provider",),
+    "upstream_connect_seconds": ("provider",),
+    "request_latency_seconds": ("endpoint",),
+    "redis_round_trips_per_request": ("endpoint",),
+    "rate_limit_rejected_calls": ("provider",),
+    "rate_limit_throttled_calls": ("provider", "priority"),
+    "rate_limit_calls": ("provider", "priority"),
+    "rate_limit_wait_seconds": ("provider", "priority"),
+    "storage_backend": ("backend",),
+}
+
+# Redis round trips made on behalf of the current request, shared with the
+# worker threads it runs on through copied contexts (anyio.to_thread and the
+# news backfill executor both copy the caller's context)
+_round_trips: contextvars.ContextVar[Optional[List[int]]] = (
+    contextvars.ContextVar("redis_round_trips", default=None)
+)
+
+
+def increment(name: str, value: float = 1) -> None:
+    """Add value to the named counter"""
+    with _lock:
+        _counters[name] += value
+
+
+def set_gauge(name: str, value: float) -> None:
+    """Set the named gauge"""
+    with _lock:
+        _gauges[name] = value
+
+
+def observe(
+    name: str, value: float, buckets: Sequence[float] = LATENCY_BUCKETS
+) -> None:
+    """Record a value in the named histogram"""
+    with _lock:
+        histogram = _histograms.get(name)
+        if histogram is None:
+            histogram = _histograms[name] = [0.0] * (len(buckets) + 2)
+            _buckets[name] = buckets
+        histogram[bisect.bisect_left(_buckets[name], value)] += 1
+        histogram[-1] += value
+
+
+@contextmanager
+def timer(name: str):
+    """Record the time spent in the block in the named histogram"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start)
+
+
+def get_counters() -> Dict[str, float]:
+    """Return a snapshot of all counters"""
+    with _lock:
+        return dict(_counters)
+
+
+def get_histograms() -> Dict[str, Tuple[float, float]]:
+    """Return the (count, sum) of every histogram"""
+    with _lock:
+        return {
+            name: (sum(histogram[:-1]), histogram[-1])
+            for name, histogram in _histograms.items()
+        }
+
+
+def reset() -> None:
+    """Clear all counters, gauges and histograms"""
+    with _lock:
+        _counters.clear()
+        _gauges.clear()
+        _histograms.clear()
+        _buckets.clear()
+
+
+class RequestMetricsMiddleware:
+    """Record latency and Redis round trips of each request by route"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        trips = [0]
+        token = _round_trips.set(trips)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _round_trips.reset(token)
+            # The route template, so /jobs/{job_id} is one series
+            route = scope.get("route")
+            endpoint = getattr(route, "path", "unmatched")
+            observe(
+                f"request_latency_seconds:{endpoint}",
+                time.perf_counter() - start,
+            )
+            observe(
+                f"redis_round_trips_per_request:{endpoint}",
+                trips[0],
+                buckets=COUNT_BUCKETS,
+            )
+
+
+def _record_round_trip():
+    trips = _round_trips.get()
+    if trips is not None:
+        # Threads of one request may race here; a rare lost increment is
+        # cheaper than a lock on every Redis call
+        trips[0] += 1
+
+
+def instrument_redis(client):
+    """Count each command and each pipeline execute of a client as a trip"""
+    execute_command = client.execute_command
+    pipeline = client.pipeline
+
+    def counted_execute_command(*args, **kwargs):
+        _record_round_trip()
+        return execute_command(*args, **kwargs)
+
+    def counted_pipeline(*args, **kwargs):
+        pipe = pipeline(*args, **kwargs)
+        execute = pipe.execute
+
+        def counted_execute(*args, **kwargs):
+            _record_round_trip()
+            return execute(*args, **kwargs)
+
+        pipe.execute = counted_execute
+        return pipe
+
+    client.execute_command = counted_execute_command
+    client.pipeline = counted_pipeline
+    return client
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"')
+
+
+def _split(name: str) -> Tuple[str, str]:
+    """Split a "<metric>:<label value>:..." name into name and label text"""
+    metric, *values = name.split(":")
+    if not values:
+        return metric, ""
+    names = LABELS.get(metric, ())
+    if len(names) != len(values):
+        names = [f"label{i}" for i in range(len(values))]
+    labels = ",".join(
+        f'{label}="{_escape(value)}"' for label, value in zip(names, values)
+    )
+    return metric, labels
+
+
+def _format(metric: str, labels: str, value: float, extra: str = "") -> str:
+    labels = ",".join(part for part in (labels, extra) if part)
+    value = repr(float(value))
+    return f"{metric}{{{labels}}} {value}" if labels else f"{metric} {value}"
+
+
+def render_prometheus() -> str:
+    """Render every metric in the Prometheus text exposition format"""
+    with _lock:
+        counters = dict(_counters)
+        gauges = dict(_gauges)
+        histograms = {name: list(h) for name, h in _histograms.items()}
+        buckets = dict(_buckets)
+
+    lines = []
+
+    def samples(values: Dict[str, object], kind: str):
+        # Sorted on the split name so each metric's samples stay together
+        # under a single TYPE line
+        last = None
+        for metric, labels, name in sorted(
+            (*_split(name), name) for name in values
+        ):
+            if kind == "counter":
+                metric += "_total"
+            if metric != last:
+                lines.append(f"# TYPE {metric} {kind}")
+                last = metric
+            yield metric, labels, values[name], name
+
+    for metric, labels, value, _ in samples(counters, "counter"):
+        lines.append(_format(metric, labels, value))
+    for metric, labels, value, _ in samples(gauges, "gauge"):
+        lines.append(_format(metric, labels, value))
+    for metric, labels, histogram, name in samples(histograms, "histogram"):
+        cumulative = 0
+        for bound, count in zip(
+            [f"{bound:g}" for bound in buckets[name]] + ["+Inf"],
+            histogram[:-1],
+        ):
+            cumulative += count
+            lines.append(
+                _format(f"{metric}_bucket", labels, cumulative, f'le="{bound}"')
+            )
+        lines.append(_format(f"{metric}_sum", labels, histogram[-1]))
+        lines.append(_format(f"{metric}_count", labels, cumulative))
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,98 @@
+import json
+import threading
+from typing import Any, Dict, List, Optional, Sequence
+
+try:
+    import msgpack
+except ImportError:  # optional: news is stored as JSON without it
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:  # optional: columns are stored uncompressed without it
+    zstandard = None
+
+# Columnar encoding for a day of cached news: a msgpack map holding the
+# article count and one separately packed column per field, zstd-compressed
+# when zstandard is available and the column is large enough to gain from
+# it. A reader asking for some fields only decompresses and unpacks those
+# columns, so plot_graph never touches the long summary strings. Payloads
+# without the magic are the plain JSON lists written before, and still
+# decode.
+MAGIC = b"NWC1"
+ZSTD_LEVEL = 3
+# Columns smaller than this are stored as is: zstd frames of a few short
+# strings cost more to decode than they save
+ZSTD_MIN_BYTES = 512
+
+# zstd contexts are reusable but not thread-safe, so keep one per thread
+_contexts = threading.local()
+
+
+def _compressor():
+    if not hasattr(_contexts, "compressor"):
+        _contexts.compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL)
+    return _contexts.compressor
+
+
+def _decompressor():
+    if not hasattr(_contexts, "decompressor"):
+        _contexts.decompressor = zstandard.ZstdDecompressor()
+    return _contexts.decompressor
+
+
+def available() -> bool:
+    """Whether the binary news encoding can be used"""
+    return msgpack is not None
+
+
+def encode_news(items: List[Dict[str, Any]], compress: bool = True) -> bytes:
+    """Encode a list of articles, falling back to JSON without msgpack"""
+    if msgpack is None:
+        return json.dumps(items).encode()
+
+    fields = list(dict.fromkeys(key for item in items for key in item))
+    compress = compress and zstandard is not None
+    columns, compressed = {}, []
+    for field in fields:
+        column = msgpack.packb([item.get(field) for item in items])
+        if compress and len(column) >= ZSTD_MIN_BYTES:
+            packed = _compressor().compress(column)
+            if len(packed) < len(column):
+                column = packed
+                compressed.append(field)
+        columns[field] = column
+    return MAGIC + msgpack.packb(
+        {
+            "count": len(items),
+            "fields": fields,
+            "zstd": compressed,
+            "columns": columns,
+        }
+    )
+
+
+def decode_news(
+    payload: bytes, fields: Optional[Sequence[str]] = None
+) -> List[Dict[str, Any]]:
+    """Decode articles written by encode_news, keeping only fields if given"""
+    if not payload:
+        return []
+    if payload[: len(MAGIC)] != MAGIC:
+        items = json.loads(payload)
+        if fields is None:
+            return items
+        return [{field: item.get(field) for field in fields} for item in items]
+
+    day = msgpack.unpackb(memoryview(payload)[len(MAGIC) :])
+    wanted = day["fields"] if fields is None else fields
+    columns = []
+    for field in wanted:
+        column = day["columns"].get(field)
+        if column is None:
+            columns.append([None] * day["count"])
+            continue
+        if field in day["zstd"]:
+            column = _decompressor().decompress(column)
+        columns.append(msgpack.unpackb(column))
+    return [dict(zip(wanted, values)) for values in zip(*columns)]
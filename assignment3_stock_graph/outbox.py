@@ -0,0 +1,346 @@
+import logging
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional, Union
+
+import metrics
+from gmail_utilities import get_gmail_service
+from storage_backends import register_script
+
+QUEUED = "queued"
+SENT = "sent"
+FAILED = "failed"
+
+# Move the retries due by ARGV[1] from the retry sorted set to the queue in
+# one step, so a crash cannot drop them from both
+_REQUEUE_DUE = """
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1])
+for _, message_id in ipairs(due) do
+    redis.call('ZREM', KEYS[1], message_id)
+    redis.call('RPUSH', KEYS[2], message_id)
+end
+return #due
+"""
+
+# Move message ARGV[1] from the processing list back to the queue, unless
+# another worker moved or finished it first
+_REQUEUE_STALE = """
+if redis.call('LREM', KEYS[1], 1, ARGV[1]) == 0 then
+    return 0
+end
+redis.call('RPUSH', KEYS[2], ARGV[1])
+return 1
+"""
+
+
+def _requeue_due_local(client, keys, args) -> int:
+    """_REQUEUE_DUE on a local backend"""
+    due = client.zrangebyscore(keys[0], "-inf", args[0])
+    for message_id in due:
+        client.zrem(keys[0], message_id)
+        client.rpush(keys[1], message_id)
+    return len(due)
+
+
+def _requeue_stale_local(client, keys, args) -> int:
+    """_REQUEUE_STALE on a local backend"""
+    if not client.lrem(keys[0], 1, args[0]):
+        return 0
+    client.rpush(keys[1], args[0])
+    return 1
+
+
+class GmailTransport:
+    """Sends raw RFC 2822 messages through the Gmail API"""
+
+    def send_batch(self, raws: List[str]) -> List[Union[str, Exception]]:
+        """Send messages in one batch request, returning ids or errors"""
+        service = get_gmail_service()
+        results: Dict[str, Union[str, Exception]] = {}
+
+        def on_response(request_id, response, exception):
+            results[request_id] = exception or response["id"]
+
+        batch = service.new_batch_http_request(callback=on_response)
+        for i, raw in enumerate(raws):
+            batch.add(
+                service.users().messages().send(userId="me", body={"raw": raw}),
+                request_id=str(i),
+            )
+        batch.execute()
+        return [
+            results.get(str(i), RuntimeError("No response from Gmail"))
+            for i in range(len(raws))
+        ]
+
+
+class StubTransport:
+    """Records messages in memory instead of sending them, for tests"""
+
+    def __init__(self, latency: float = 0.0, failures: int = 0):
+        self.latency = latency
+        # Number of upcoming sends that fail, to exercise retries
+        self.failures = failures
+        self.sent: List[str] = []
+        self._lock = threading.Lock()
+
+    def send_batch(self, raws: List[str]) -> List[Union[str, Exception]]:
+        time.sleep(self.latency)
+        results = []
+        with self._lock:
+            for raw in raws:
+                if self.failures > 0:
+                    self.failures -= 1
+                    results.append(RuntimeError("Stub send failure"))
+                else:
+                    self.sent.append(raw)
+                    results.append(f"stub-{len(self.sent)}")
+        return results
+
+
+class Outbox:
+    """Redis-backed outbox drained by a background sender thread
+
+    Each message is a hash outbox:message:<id> holding the raw message and
+    its status, and its id waits in the outbox:queue list. The sender moves
+    up to batch_size ids at a time onto the outbox:processing list and sends
+    them in one batch, removing each id once its result is recorded, so a
+    sender that dies mid-batch leaves its ids there; ids claimed more than
+    processing_timeout seconds ago are put back on the queue at startup and
+    on every drain. Failed messages are retried with exponential backoff
+    through the outbox:retry sorted set until max_attempts. Finished
+    messages expire after result_ttl seconds.
+    """
+
+    def __init__(
+        self,
+        redis_client,
+        transport,
+        batch_size: int = 10,
+        max_attempts: int = 5,
+        result_ttl: int = 24 * 60 * 60,
+        poll_interval: float = 1.0,
+        processing_timeout: float = 5 * 60,
+    ):
+        self.redis = redis_client
+        self.transport = transport
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.result_ttl = result_ttl
+        self.poll_interval = poll_interval
+        self.processing_timeout = processing_timeout
+        self.prefix = "outbox:"
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._requeue_due = register_script(
+            self.redis, _REQUEUE_DUE, _requeue_due_local
+        )
+        self._requeue_stale = register_script(
+            self.redis, _REQUEUE_STALE, _requeue_stale_local
+        )
+
+    def _get_message_key(self, message_id: str) -> str:
+        """Generate the key of an outbox message"""
+        return f"{self.prefix}message:{message_id}"
+
+    def _get_queue_key(self) -> str:
+        return f"{self.prefix}queue"
+
+    def _get_retry_key(self) -> str:
+        return f"{self.prefix}retry"
+
+    def _get_processing_key(self) -> str:
+        return f"{self.prefix}processing"
+
+    def enqueue(self, raw: str) -> str:
+        """Queue a base64url-encoded message and return its id"""
+        message_id = uuid.uuid4().hex
+        pipeline = self.redis.pipeline()
+        pipeline.hset(
+            self._get_message_key(message_id),
+            mapping={"raw": raw, "status": QUEUED, "attempts": 0},
+        )
+        pipeline.rpush(self._get_queue_key(), message_id)
+        pipeline.execute()
+        metrics.increment("outbox_queued")
+        return message_id
+
+    def get_status(self, message_id: str) -> Optional[Dict[str, str]]:
+        """Return status, attempts, Gmail id and last error of a message"""
+        fields = ["status", "attempts", "gmail_id", "error"]
+        values = self.redis.hmget(self._get_message_key(message_id), fields)
+        if values[0] is None:
+            return None
+        return {
+            field: value.decode() if isinstance(value, bytes) else value
+            for field, value in zip(fields, values)
+            if value is not None
+        }
+
+    def start(self):
+        """Start the background sender thread"""
+        if self._thread is None or not self._thread.is_alive():
+            self.requeue_stale()
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run, name="outbox-sender", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self):
+        """Stop the background sender thread"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                if not self.drain_once():
+                    self._stop.wait(self.poll_interval)
+            except Exception as e:
+                logging.error(f"Error draining email outbox: {str(e)}")
+                self._stop.wait(self.poll_interval)
+
+    def _requeue_due_retries(self):
+        """Move retries whose backoff has passed back onto the queue"""
+        self._requeue_due(
+            keys=[self._get_retry_key(), self._get_queue_key()],
+            args=[time.time()],
+        )
+
+    def requeue_stale(self) -> int:
+        """Requeue ids a dead sender left on the processing list"""
+        processing_key = self._get_processing_key()
+        message_ids = [
+            mid.decode() if isinstance(mid, bytes) else mid
+            for mid in self.redis.lrange(processing_key, 0, -1)
+        ]
+        if not message_ids:
+            return 0
+        pipeline = self.redis.pipeline(transaction=False)
+        for message_id in message_ids:
+            pipeline.hget(self._get_message_key(message_id), "claimed")
+        claims = pipeline.execute()
+
+        requeued = 0
+        now = time.time()
+        for message_id, claimed in zip(message_ids, claims):
+            if claimed is None:
+                # Claimed a moment ago or by a sender that died right after:
+                # time it from now rather than race the claiming sender
+                self.redis.hset(
+                    self._get_message_key(message_id), "claimed", now
+                )
+                continue
+            if now - float(claimed) < self.processing_timeout:
+                continue
+            requeued += int(
+                self._requeue_stale(
+                    keys=[processing_key, self._get_queue_key()],
+                    args=[message_id],
+                )
+            )
+        if requeued:
+            logging.warning(f"Requeued {requeued} unfinished outbox messages")
+            metrics.increment("outbox_requeued", requeued)
+        return requeued
+
+    def _claim(self) -> List[str]:
+        """Move up to batch_size ids from the queue to the processing list"""
+        pipeline = self.redis.pipeline(transaction=False)
+        for _ in range(self.batch_size):
+            pipeline.lmove(
+                self._get_queue_key(),
+                self._get_processing_key(),
+                "LEFT",
+                "RIGHT",
+            )
+        message_ids = [
+            mid.decode() if isinstance(mid, bytes) else mid
+            for mid in pipeline.execute()
+            if mid is not None
+        ]
+        if message_ids:
+            now = time.time()
+            pipeline = self.redis.pipeline(transaction=False)
+            for message_id in message_ids:
+                pipeline.hset(self._get_message_key(message_id), "claimed", now)
+            pipeline.execute()
+        return message_ids
+
+    def drain_once(self) -> int:
+        """Send one batch of queued messages, returning how many were sent"""
+        self._requeue_due_retries()
+        self.requeue_stale()
+        message_ids = self._claim()
+        if not message_ids:
+            return 0
+
+        processing_key = self._get_processing_key()
+        pipeline = self.redis.pipeline(transaction=False)
+        for message_id in message_ids:
+            pipeline.hmget(self._get_message_key(message_id), "raw", "attempts")
+        messages = pipeline.execute()
+        pending = []
+        for message_id, (raw, attempts) in zip(message_ids, messages):
+            if raw is None:
+                # Finished and expired already: nothing left to send
+                pipeline = self.redis.pipeline()
+                pipeline.lrem(processing_key, 1, message_id)
+                pipeline.hdel(self._get_message_key(message_id), "claimed")
+                pipeline.execute()
+                continue
+            raw = raw.decode() if isinstance(raw, bytes) else raw
+            pending.append((message_id, raw, int(attempts or 0)))
+        if not pending:
+            return 0
+
+        try:
+            with metrics.timer("upstream_latency_seconds:gmail"):
+                results = self.transport.send_batch(
+                    [raw for _, raw, _ in pending]
+                )
+        except Exception as e:
+            results = [e] * len(pending)
+
+        sent = 0
+        # One transaction, so each id leaves the processing list together
+        # with the status and attempt count recorded for it. This sender
+        # owns the claimed messages, so their attempts cannot change
+        # between reading and writing them
+        pipeline = self.redis.pipeline()
+        for (message_id, _, attempts), result in zip(pending, results):
+            key = self._get_message_key(message_id)
+            pipeline.lrem(processing_key, 1, message_id)
+            pipeline.hdel(key, "claimed")
+            if not isinstance(result, Exception):
+                sent += 1
+                pipeline.hset(key, mapping={"status": SENT, "gmail_id": result})
+                pipeline.hdel(key, "raw", "error")
+                pipeline.expire(key, self.result_ttl)
+                metrics.increment("outbox_sent")
+                continue
+
+            attempts += 1
+            pipeline.hset(
+                key, mapping={"attempts": attempts, "error": str(result)}
+            )
+            if attempts >= self.max_attempts:
+                logging.error(
+                    f"Giving up on email {message_id} after {attempts} "
+                    f"attempts: {str(result)}"
+                )
+                pipeline.hset(key, "status", FAILED)
+                pipeline.hdel(key, "raw")
+                pipeline.expire(key, self.result_ttl)
+                metrics.increment("outbox_failed")
+            else:
+                pipeline.zadd(
+                    self._get_retry_key(),
+                    {message_id: time.time() + 2**attempts},
+                )
+                metrics.increment("outbox_retries")
+        pipeline.execute()
+        return sent
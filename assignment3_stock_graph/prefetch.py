@@ -0,0 +1,190 @@
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from datetime import time as dt_time
+from datetime import timedelta
+from typing import Any, Callable, Dict, List, Optional
+from zoneinfo import ZoneInfo
+
+import metrics
+
+STATUS_KEY = "prefetch:status"
+RUN_KEY_PREFIX = "prefetch:run:"
+
+
+class Prefetcher:
+    """Refreshes a watchlist once per trading day after market close
+
+    plan(symbol) returns the upstream calls per provider that refreshing the
+    symbol would make, and refresh(symbol) does the refresh and returns what
+    it warmed. Symbols are refreshed stalest first, and a symbol is skipped
+    when its plan would exceed what is left of a provider's per-run budget.
+    Each symbol's outcome is kept in the prefetch:status hash.
+    """
+
+    def __init__(
+        self,
+        redis_client,
+        watchlist: List[str],
+        plan: Callable[[str], Dict[str, int]],
+        refresh: Callable[[str], Dict[str, Any]],
+        budgets: Dict[str, int],
+        run_at: dt_time,
+        timezone: str = "America/New_York",
+        poll_interval: float = 60,
+    ):
+        self.redis = redis_client
+        self.watchlist = watchlist
+        self.plan = plan
+        self.refresh = refresh
+        self.budgets = budgets
+        self.run_at = run_at
+        self.timezone = ZoneInfo(timezone)
+        self.poll_interval = poll_interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start the scheduler thread"""
+        if not self.watchlist:
+            return
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run, name="prefetch-scheduler", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self):
+        """Stop the scheduler thread"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def now(self) -> datetime:
+        return datetime.now(self.timezone)
+
+    def is_due(self, now: datetime) -> bool:
+        """Whether now is a weekday at or after the daily run time"""
+        return now.weekday() < 5 and now.time() >= self.run_at
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                now = self.now()
+                # The first server worker to claim the day runs the cycle
+                if self.is_due(now) and self.redis.set(
+                    f"{RUN_KEY_PREFIX}{now:%Y-%m-%d}",
+                    now.isoformat(),
+                    nx=True,
+                    ex=2 * 24 * 60 * 60,
+                ):
+                    self.run_once()
+            except Exception as e:
+                logging.error(f"Error running watchlist prefetch: {str(e)}")
+            self._stop.wait(self.poll_interval)
+
+    def get_status(self) -> Dict[str, Dict[str, Any]]:
+        """Return the last prefetch outcome of each watchlist symbol"""
+        return {
+            symbol.decode(): json.loads(status)
+            for symbol, status in self.redis.hgetall(STATUS_KEY).items()
+        }
+
+    def next_run(self) -> Optional[str]:
+        """Return when the scheduler will next consider running"""
+        if not self.watchlist:
+            return None
+        now = self.now()
+        claimed = self.redis.exists(f"{RUN_KEY_PREFIX}{now:%Y-%m-%d}")
+        day = now.date()
+        if claimed or now.time() >= self.run_at:
+            day += timedelta(days=1)
+        while day.weekday() >= 5:
+            day += timedelta(days=1)
+        return datetime.combine(day, self.run_at, self.timezone).isoformat()
+
+    def run_once(self) -> Dict[str, Dict[str, Any]]:
+        """Refresh the watchlist now, within the upstream budgets"""
+        status = self.get_status()
+        remaining = dict(self.budgets)
+        # Stalest first, so a tight budget rotates through the watchlist
+        symbols = sorted(
+            self.watchlist,
+            key=lambda symbol: status.get(symbol, {}).get("refreshed_at", ""),
+        )
+        results = {}
+        for symbol in symbols:
+            started = time.time()
+            # Keep the last successful refresh, drop the last run's outcome
+            result = dict(status.get(symbol, {}))
+            result.pop("skipped", None)
+            result.pop("error", None)
+            try:
+                needed = self.plan(symbol)
+                over = [
+                    provider
+                    for provider, calls in needed.items()
+                    if calls > remaining.get(provider, 0)
+                ]
+                if over:
+                    result["skipped"] = f"upstream budget spent: {over}"
+                    metrics.increment("prefetch_skipped")
+                else:
+                    for provider, calls in needed.items():
+                        remaining[provider] -= calls
+                    result.update(self.refresh(symbol))
+                    result["refreshed_at"] = self.now().isoformat()
+                    result["upstream_calls"] = needed
+                    metrics.increment("prefetch_refreshed")
+            except Exception as e:
+                logging.error(f"Error prefetching {symbol}: {str(e)}")
+                result["error"] = str(e)
+                metrics.increment("prefetch_errors")
+            result["seconds"] = round(time.time() - started, 3)
+            self.redis.hset(STATUS_KEY, symbol, json.dumps(result))
+            results[symbol] = result
+        return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Run one watchlist prefetch cycle now"
+    )
+    parser.add_argument(
+        "symbols", nargs="*", help="Symbols to refresh (default: watchlist)"
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help=(
+            "Use stub upstream clients, stub email and in-memory storage "
+            "instead of the APIs and Redis"
+        ),
+    )
+    args = parser.parse_args()
+    if args.dry_run:
+        # Stub data and the run's claim must not reach the real Redis
+        os.environ["STORAGE_BACKEND"] = "memory"
+        os.environ["UPSTREAM_CLIENTS"] = "stub"
+        os.environ["GMAIL_TRANSPORT"] = "stub"
+        for name in (
+            "ALPHA_VANTAGE_KEY",
+            "FINNHUB_KEY",
+            "GMAIL_USER",
+            "GMAIL_APP_PASSWORD",
+        ):
+            os.environ.setdefault(name, "dry-run")
+
+    import server
+
+    if args.symbols:
+        server.prefetcher.watchlist = [s.upper() for s in args.symbols]
+    try:
+        print(json.dumps(server.prefetcher.run_once(), indent=2))
+    finally:
+        server.render_pool.shutdown()
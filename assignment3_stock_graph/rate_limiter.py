@@ -0,0 +1,144 @@
+import contextvars
+import math
+import time
+from contextlib import contextmanager
+
+import metrics
+from storage_backends import register_script
+
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+
+# Priority of the upstream calls made by the current request or job
+current_priority = contextvars.ContextVar("priority", default=INTERACTIVE)
+
+# Refill the bucket for the time elapsed since the last call, then take one
+# token if that leaves at least `reserve` tokens behind. Returns 0 when a
+# token was taken, else the seconds until one will be available. Numbers
+# are returned as strings because Redis truncates Lua numbers to integers.
+_TAKE_TOKEN = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local reserve = tonumber(ARGV[4])
+local tokens = tonumber(redis.call('HGET', KEYS[1], 'tokens'))
+local updated = tonumber(redis.call('HGET', KEYS[1], 'updated'))
+if tokens == nil or updated == nil then
+    tokens = capacity
+    updated = now
+end
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+local wait = 0
+if tokens - 1 >= reserve then
+    tokens = tokens - 1
+else
+    wait = (reserve + 1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000) + 1000)
+return tostring(wait)
+"""
+
+
+def _take_token_local(client, keys, args) -> str:
+    """_TAKE_TOKEN on a local backend"""
+    capacity, rate, now, reserve = (float(arg) for arg in args)
+    tokens = client.hget(keys[0], "tokens")
+    updated = client.hget(keys[0], "updated")
+    if tokens is None or updated is None:
+        tokens, updated = capacity, now
+    tokens = min(capacity, float(tokens) + max(0, now - float(updated)) * rate)
+    wait = 0
+    if tokens - 1 >= reserve:
+        tokens -= 1
+    else:
+        wait = (reserve + 1 - tokens) / rate
+    client.hset(keys[0], mapping={"tokens": tokens, "updated": now})
+    client.pexpire(keys[0], math.ceil(capacity / rate * 1000) + 1000)
+    return str(wait)
+
+
+class RateLimitExceeded(Exception):
+    """Raised when a call would wait longer than the limiter allows"""
+
+
+class TokenBucket:
+    """Redis-backed token bucket shared by every worker calling a provider
+
+    Interactive calls may take any token. Background calls leave
+    `background_reserve` of the capacity untouched, so a refresh job never
+    drains the quota a user request is about to need.
+    """
+
+    def __init__(
+        self,
+        redis_client,
+        provider: str,
+        rate_per_minute: float,
+        capacity: float = None,
+        background_reserve: float = 0.5,
+        max_wait: float = 60,
+    ):
+        self.redis = redis_client
+        self.provider = provider
+        self.key = f"ratelimit:{provider}"
+        self.rate = rate_per_minute / 60
+        self.capacity = capacity or rate_per_minute
+        self.background_reserve = background_reserve
+        self.max_wait = max_wait
+        self._take_token = register_script(
+            self.redis, _TAKE_TOKEN, _take_token_local
+        )
+
+    def _reserve_for(self, priority: str) -> float:
+        """Tokens a call of this priority must leave in the bucket"""
+        if priority == BACKGROUND:
+            return self.capacity * self.background_reserve
+        return 0
+
+    def acquire(self, priority: str = None) -> float:
+        """Block until a token is available, returning the seconds waited"""
+        priority = priority or current_priority.get()
+        reserve = self._reserve_for(priority)
+        start = time.monotonic()
+        throttled = False
+        while True:
+            wait = float(
+                self._take_token(
+                    keys=[self.key],
+                    args=[self.capacity, self.rate, time.time(), reserve],
+                )
+            )
+            if wait <= 0:
+                break
+
+            waited = time.monotonic() - start
+            if waited + wait > self.max_wait:
+                metrics.increment(f"rate_limit_rejected_calls:{self.provider}")
+                raise RateLimitExceeded(
+                    f"{self.provider} quota exhausted, next token in "
+                    f"{wait:.1f}s"
+                )
+            if not throttled:
+                throttled = True
+                metrics.increment(
+                    f"rate_limit_throttled_calls:{self.provider}:{priority}"
+                )
+            time.sleep(wait)
+
+        waited = time.monotonic() - start
+        metrics.increment(f"rate_limit_calls:{self.provider}:{priority}")
+        metrics.increment(
+            f"rate_limit_wait_seconds:{self.provider}:{priority}", waited
+        )
+        return waited
+
+
+@contextmanager
+def priority_class(priority: str):
+    """Run the upstream calls made inside the block at the given priority"""
+    token = current_priority.set(priority)
+    try:
+        yield
+    finally:
+        current_priority.reset(token)
@@ -0,0 +1,171 @@
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+import plotly.graph_objects as go
+import plotly.io as pio
+
+
+class RenderQueueFull(Exception):
+    """Raised when no render slot frees up within the timeout"""
+
+
+def _warm_up_figure() -> str:
+    """A small line chart, serialized like the figures sent to workers"""
+    figure = go.Figure(go.Scatter(x=[0, 1], y=[0, 1], mode="lines+markers"))
+    return figure.to_json()
+
+
+def _warm_up():
+    """Start kaleido in a new worker by rendering a small line chart"""
+    # Plotly loads its validators on first use, so go through the same
+    # from_json and trace rendering as a real plot rather than a blank one
+    _render(_warm_up_figure(), 10, 10, 1)
+
+
+def _worker_pid() -> int:
+    """No-op task, run once a worker has finished _warm_up"""
+    return os.getpid()
+
+
+def _terminate(executor: ProcessPoolExecutor):
+    """Shut an executor down, killing workers that are still rendering"""
+    processes = list((executor._processes or {}).values())
+    executor.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        process.terminate()
+
+
+def _render(figure_json: str, width: int, height: int, scale: float) -> bytes:
+    """Render a figure serialized with Figure.to_json to PNG bytes"""
+    figure = pio.from_json(figure_json, skip_invalid=True)
+    return pio.to_image(
+        figure, format="png", width=width, height=height, scale=scale
+    )
+
+
+class RenderPool:
+    """Bounded pool of pre-warmed kaleido worker processes
+
+    Rendering a PNG costs hundreds of milliseconds to seconds of CPU, so it
+    runs in separate processes, one render per worker at a time. At most
+    `queue_size` renders wait for a free worker; callers beyond that, or
+    whose render does not finish within `timeout`, get an error instead of
+    piling up; a timed-out render's workers are killed and replaced, since
+    a hung kaleido process would otherwise keep its slot. Workers that fail
+    to start leave the pool to start again on the next render.
+    """
+
+    def __init__(self, workers: int, queue_size: int, timeout: float):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pending = 0
+
+    @property
+    def queue_depth(self) -> int:
+        """Renders submitted and not finished yet"""
+        return self._pending
+
+    def start(self):
+        """Start the worker processes and warm kaleido in each of them"""
+        with self._lock:
+            if self._executor is not None:
+                return
+            # spawn, as forking a server that already runs threads is unsafe
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_warm_up,
+            )
+            # The server builds and serializes figures in this process,
+            # which loads the same validators on the first plot
+            _warm_up_figure()
+            try:
+                self._wait_for_workers()
+            except Exception as e:
+                # Plotting is optional: serve everything else and retry on
+                # the next render
+                logging.error(f"Error starting render workers: {str(e)}")
+                _terminate(self._executor)
+                self._executor = None
+
+    def _wait_for_workers(self):
+        """Block until every worker has started and warmed up
+
+        The executor only spawns workers for submitted tasks, and a worker
+        takes tasks once _warm_up returns, so no-op tasks are submitted
+        until each worker has answered one.
+        """
+        deadline = time.monotonic() + self.timeout
+        ready = set()
+        while len(ready) < self.workers and time.monotonic() < deadline:
+            futures = [
+                self._executor.submit(_worker_pid)
+                for _ in range(self.workers - len(ready))
+            ]
+            for future in futures:
+                ready.add(
+                    future.result(timeout=max(0, deadline - time.monotonic()))
+                )
+
+    def _recycle(self, executor: ProcessPoolExecutor):
+        """Replace an executor whose worker did not finish a render"""
+        with self._lock:
+            if self._executor is not executor:
+                # Another timed-out render replaced it already
+                return
+            logging.warning("Render timed out, restarting render workers")
+            _terminate(executor)
+            self._executor = None
+        self.start()
+
+    def shutdown(self):
+        """Stop the worker processes"""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def render(
+        self,
+        figure: go.Figure,
+        width: int = 1200,
+        height: int = 800,
+        scale: float = 2,
+    ) -> bytes:
+        """Render a figure to PNG bytes on a worker process"""
+        if not self._slots.acquire(timeout=self.timeout):
+            raise RenderQueueFull(
+                f"{self._pending} renders already queued or running"
+            )
+        with self._lock:
+            self._pending += 1
+        try:
+            self.start()
+            executor = self._executor
+            if executor is None:
+                raise RuntimeError("Render workers are not running")
+            future = executor.submit(
+                _render, figure.to_json(), width, height, scale
+            )
+            try:
+                return future.result(timeout=self.timeout)
+            except FutureTimeoutError:
+                # cancel() cannot stop a render that is running, so free the
+                # worker before the slot
+                self._recycle(executor)
+                raise TimeoutError(
+                    f"Plot render took longer than {self.timeout}s"
+                )
+        finally:
+            with self._lock:
+                self._pending -= 1
+            self._slots.release()
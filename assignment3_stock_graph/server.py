@@ -1,32 +1,62 @@
+import asyncio
 import base64
-import io
+import contextvars
+import hashlib
 import json
 import logging
 import os
-import pickle
-import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
 from email.mime.image import MIMEImage
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
 
+import anyio
+import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
-import plotly.io as pio
 import redis
-from alpha_vantage.timeseries import TimeSeries
 from dotenv import load_dotenv
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from finnhub import Client as FinnhubClient
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 
-from gmail_utilities import get_gmail_service
+import metrics
+import news_codec
+from cache_policy import CachePolicy
+from http_encoding import (
+    PRICE_ENCODINGS,
+    CompressionMiddleware,
+    FastJSONResponse,
+    encode_price_array,
+)
+from indicators import compute_indicator, parse_specs
+from jobs import JobQueue
+from local_cache import MISS, LocalCache
+from outbox import GmailTransport, Outbox, StubTransport
+from prefetch import Prefetcher
+from price_codec import decode_frame, encode_frame
+from rate_limiter import BACKGROUND, TokenBucket, priority_class
+from render_pool import RenderPool
+from singleflight import SingleFlight
+from storage_backends import MEMORY, REDIS, MemoryBackend, open_backend
+from stub_clients import StubFinnhubClient, StubTimeSeries
+from upstream_http import (
+    ALPHA_VANTAGE_URL,
+    FINNHUB_URL,
+    AlphaVantageClient,
+    FinnhubClient,
+    RetryBudget,
+    UpstreamClient,
+    finnhub_headers,
+)
 
 load_dotenv()
 
-app = FastAPI()
+app = FastAPI(default_response_class=FastJSONResponse)
 
 # Configure CORS
 app.add_middleware(
@@ -43,6 +73,106 @@ finnhub_key = os.getenv("FINNHUB_KEY")
 gmail_user = os.getenv("GMAIL_USER")
 gmail_password = os.getenv("GMAIL_APP_PASSWORD")
 redis_url = os.getenv("REDIS_URL", "redis://127.0.0.1:6379")
+call_function_threads = int(os.getenv("CALL_FUNCTION_THREADS", "32"))
+# How long a "fetched, no articles" marker keeps a day counted as covered
+news_empty_ttl = int(os.getenv("NEWS_EMPTY_TTL_SECONDS", str(24 * 60 * 60)))
+# How long a worker may hold the lease on an upstream fetch for a key
+singleflight_lease = float(os.getenv("SINGLEFLIGHT_LEASE_SECONDS", "30"))
+# Days per Finnhub request when backfilling news, and requests in flight
+news_window_days = int(os.getenv("NEWS_WINDOW_DAYS", "30"))
+news_backfill_concurrency = int(os.getenv("NEWS_BACKFILL_CONCURRENCY", "4"))
+# Price series fetched at once for a multi-symbol call, still within the
+# Alpha Vantage rate limit
+price_fetch_concurrency = int(os.getenv("PRICE_FETCH_CONCURRENCY", "4"))
+# Upstream quotas shared by all workers (free tiers: 5 and 60 calls/minute)
+alpha_vantage_rate = float(os.getenv("ALPHA_VANTAGE_RATE_PER_MINUTE", "5"))
+finnhub_rate = float(os.getenv("FINNHUB_RATE_PER_MINUTE", "60"))
+# Longest a call waits for quota; keep below the single-flight lease
+upstream_max_wait = float(os.getenv("UPSTREAM_MAX_WAIT_SECONDS", "20"))
+# Plot rendering worker processes, renders allowed to wait for one, and
+# how long a render may take
+render_workers = int(os.getenv("RENDER_WORKERS", str(os.cpu_count() or 1)))
+render_queue_size = int(os.getenv("RENDER_QUEUE_SIZE", "16"))
+render_timeout = float(os.getenv("RENDER_TIMEOUT_SECONDS", "60"))
+# Rendered plots kept before the least recently used are evicted
+plot_cache_max_entries = int(os.getenv("PLOT_CACHE_MAX_ENTRIES", "100"))
+# Memory budget across the cached stores, and which values to evict
+# first when it is exceeded ("lru" or "lfu")
+cache_memory_budget = int(
+    os.getenv("CACHE_MEMORY_BUDGET_BYTES", str(256 * 1024 * 1024))
+)
+cache_eviction_policy = os.getenv("CACHE_EVICTION_POLICY", "lru")
+# Per-store TTLs in seconds (0: never expire). Data for the last
+# CACHE_RECENT_DAYS days may still change and expires after
+# CACHE_RECENT_TTL_SECONDS at most
+news_ttl = int(os.getenv("NEWS_TTL_SECONDS", "0"))
+prices_ttl = int(os.getenv("PRICES_TTL_SECONDS", str(7 * 24 * 60 * 60)))
+plots_ttl = int(os.getenv("PLOTS_TTL_SECONDS", str(24 * 60 * 60)))
+cache_recent_days = int(os.getenv("CACHE_RECENT_DAYS", "7"))
+cache_recent_ttl = int(os.getenv("CACHE_RECENT_TTL_SECONDS", "3600"))
+# "gmail" sends through the Gmail API, "stub" only records messages locally
+gmail_transport = os.getenv("GMAIL_TRANSPORT", "gmail")
+outbox_batch_size = int(os.getenv("OUTBOX_BATCH_SIZE", "10"))
+outbox_max_attempts = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "5"))
+# Worker processes for background jobs, how long a finished job's result
+# stays readable and how long an unfinished job is kept
+job_workers = int(os.getenv("JOB_WORKERS", "2"))
+job_result_ttl = int(os.getenv("JOB_RESULT_TTL_SECONDS", "3600"))
+job_ttl = int(os.getenv("JOB_TTL_SECONDS", "86400"))
+# Symbols refreshed after market close (comma-separated, empty disables),
+# when in market time, how many days of news and the default plot to warm,
+# and the most upstream calls one run may make per provider (Alpha Vantage
+# free tier: 25 calls a day)
+prefetch_watchlist = [
+    symbol.strip().upper()
+    for symbol in os.getenv("PREFETCH_WATCHLIST", "").split(",")
+    if symbol.strip()
+]
+prefetch_time = os.getenv("PREFETCH_TIME", "16:30")
+prefetch_timezone = os.getenv("PREFETCH_TIMEZONE", "America/New_York")
+prefetch_range_days = int(os.getenv("PREFETCH_RANGE_DAYS", "5"))
+prefetch_max_price_calls = int(os.getenv("PREFETCH_MAX_PRICE_CALLS", "20"))
+prefetch_max_news_calls = int(os.getenv("PREFETCH_MAX_NEWS_CALLS", "300"))
+# "live" calls Alpha Vantage and Finnhub, "stub" serves synthetic data
+upstream_clients = os.getenv("UPSTREAM_CLIENTS", "live")
+# Upstream HTTP: connect and read timeouts, keep-alive connections pooled
+# per provider, retries per call, and the share of recent calls that may be
+# retried on top of one retry a second
+upstream_connect_timeout = float(
+    os.getenv("UPSTREAM_CONNECT_TIMEOUT_SECONDS", "5")
+)
+upstream_read_timeout = float(os.getenv("UPSTREAM_READ_TIMEOUT_SECONDS", "30"))
+upstream_max_connections = int(os.getenv("UPSTREAM_MAX_CONNECTIONS", "20"))
+upstream_max_retries = int(os.getenv("UPSTREAM_MAX_RETRIES", "2"))
+upstream_retry_ratio = float(os.getenv("UPSTREAM_RETRY_RATIO", "0.1"))
+# "msgpack" stores cached news as columnar msgpack, zstd-compressed when
+# zstandard is installed, so readers can skip fields; "json" keeps JSON
+news_encoding = os.getenv("NEWS_ENCODING", "json")
+# Responses at least this large are sent brotli or gzip compressed when
+# the client accepts it
+response_compression_min_bytes = int(
+    os.getenv("RESPONSE_COMPRESSION_MIN_BYTES", "1024")
+)
+# Memory for decoded prices and news kept in each server process in front
+# of Redis (0 disables it), and the longest an entry is served from there
+l1_cache_bytes = int(os.getenv("L1_CACHE_BYTES", str(64 * 1024 * 1024)))
+l1_cache_ttl = float(os.getenv("L1_CACHE_TTL_SECONDS", "300"))
+# Store cached price columns as float32, halving their size in Redis
+price_float32 = os.getenv("PRICE_FLOAT32", "false").lower() == "true"
+# Where the news, price and plot stores keep their data: "redis",
+# "memory" (this process only, lost on restart) or "sqlite" (a file shared
+# by the workers on one host). Without Redis, background jobs and the
+# in-process cache are disabled
+storage_backend = os.getenv("STORAGE_BACKEND", REDIS)
+# Backend used instead of Redis when it is unreachable at startup
+storage_fallback = os.getenv("STORAGE_FALLBACK", MEMORY)
+sqlite_path = os.getenv("SQLITE_PATH", "stock_cache.db")
+sqlite_mmap_bytes = int(os.getenv("SQLITE_MMAP_BYTES", str(256 * 1024 * 1024)))
+
+app.add_middleware(
+    CompressionMiddleware, minimum_size=response_compression_min_bytes
+)
+app.add_middleware(metrics.RequestMetricsMiddleware)
 
 if not all([alpha_vantage_key, finnhub_key, gmail_user, gmail_password]):
     raise ValueError(
@@ -51,7 +181,7 @@ if not all([alpha_vantage_key, finnhub_key, gmail_user, gmail_password]):
 
 
 def check_redis_connection():
-    """Check if Redis server is up and running"""
+    """Check if Redis server is up and running, None if it is not"""
     try:
         redis_client = redis.from_url(redis_url)
         redis_client.ping()
@@ -59,34 +189,146 @@ def check_redis_connection():
         return redis_client
     except redis.ConnectionError as e:
         logging.error(f"Failed to connect to Redis: {str(e)}")
-        print(
-            "Error: Redis server is not running. Please start Redis server and try again."
-        )
-        sys.exit(1)
     except Exception as e:
         logging.error(f"Unexpected error connecting to Redis: {str(e)}")
-        print("Error: Unexpected error connecting to Redis server.")
-        sys.exit(1)
+    return None
 
 
-# Initialize Redis with connection check
-redis_client = check_redis_connection()
+# Initialize Redis with connection check. When it is down the server runs
+# degraded on the fallback backend instead of exiting
+redis_client = None
+storage_degraded = False
+if storage_backend == REDIS:
+    redis_client = check_redis_connection()
+    if redis_client is None:
+        print(
+            f"Warning: Redis server is not running, caching in "
+            f"{storage_fallback} until the server is restarted with Redis."
+        )
+        storage_backend = storage_fallback
+        storage_degraded = True
+redis_available = redis_client is not None
+if redis_available:
+    redis_client = metrics.instrument_redis(redis_client)
+    storage_client = redis_client
+elif storage_backend == MEMORY:
+    # Rate limits, single-flight leases, the email outbox and the
+    # prefetcher's state are then kept in this process
+    redis_client = storage_client = MemoryBackend()
+else:
+    # A SQLite file coordinates the workers on its host as Redis would
+    redis_client = storage_client = open_backend(
+        storage_backend, sqlite_path, sqlite_mmap_bytes
+    )
+
+alpha_vantage_limiter = TokenBucket(
+    redis_client,
+    "alpha_vantage",
+    alpha_vantage_rate,
+    max_wait=upstream_max_wait,
+)
+finnhub_limiter = TokenBucket(
+    redis_client, "finnhub", finnhub_rate, max_wait=upstream_max_wait
+)
 
-ts = TimeSeries(key=alpha_vantage_key, output_format="pandas")
-finnhub_client = FinnhubClient(api_key=finnhub_key)
+if upstream_clients == "stub":
+    ts = StubTimeSeries()
+    finnhub_client = StubFinnhubClient()
+else:
+    upstream_options = {
+        "connect_timeout": upstream_connect_timeout,
+        "read_timeout": upstream_read_timeout,
+        "max_connections": upstream_max_connections,
+        "max_retries": upstream_max_retries,
+    }
+    ts = AlphaVantageClient(
+        UpstreamClient(
+            "alpha_vantage",
+            ALPHA_VANTAGE_URL,
+            retry_budget=RetryBudget(upstream_retry_ratio),
+            limiter=alpha_vantage_limiter,
+            **upstream_options,
+        ),
+        alpha_vantage_key,
+    )
+    finnhub_client = FinnhubClient(
+        UpstreamClient(
+            "finnhub",
+            FINNHUB_URL,
+            retry_budget=RetryBudget(upstream_retry_ratio),
+            headers=finnhub_headers(finnhub_key),
+            limiter=finnhub_limiter,
+            **upstream_options,
+        )
+    )
+NEWS_COVERAGE_EPOCH = datetime(1970, 1, 1)
 
 
 class NewsStorage:
-    """Redis-backed storage for stock news data with day-wise storage"""
+    """Storage for stock news data with day-wise storage on a backend"""
 
-    def __init__(self, redis_client):
-        self.redis = redis_client
+    def __init__(
+        self,
+        backend,
+        policy: CachePolicy = None,
+        encoding: str = "json",
+        l1: LocalCache = None,
+    ):
+        self.backend = backend
+        self.policy = policy
+        self.l1 = l1
+        self.binary = encoding == "msgpack"
+        if self.binary and not news_codec.available():
+            logging.warning("msgpack is not installed, storing news as JSON")
+            self.binary = False
         self.prefix = "news:"
+        self.coverage_prefix = "news_coverage:"
+        self.fetched_prefix = "news_fetched:"
+        if policy is not None:
+            policy.register_store("news", on_evict=self._uncover)
 
     def _get_key(self, stock_name: str, date: str) -> str:
         """Generate a unique key for the news data for a specific date"""
         return f"{self.prefix}{stock_name}:{date}"
 
+    def _get_coverage_key(self, stock_name: str) -> str:
+        """Generate the key of the per-symbol coverage bitmap"""
+        return f"{self.coverage_prefix}{stock_name}"
+
+    def _get_fetched_key(self, stock_name: str) -> str:
+        """Generate the key of the per-symbol days covered until an expiry"""
+        return f"{self.fetched_prefix}{stock_name}"
+
+    def _uncover(self, keys: List[str]):
+        """Mark evicted days as not covered so they are refetched"""
+        pipeline = self.backend.pipeline(transaction=False)
+        for key in keys:
+            stock_name, date = key[len(self.prefix) :].rsplit(":", 1)
+            pipeline.setbit(
+                self._get_coverage_key(stock_name),
+                self._get_day_offset(date),
+                0,
+            )
+            pipeline.zrem(self._get_fetched_key(stock_name), date)
+        pipeline.execute()
+        if self.l1 is not None:
+            self.l1.invalidate(keys)
+
+    @staticmethod
+    def _get_day_offset(date: str) -> int:
+        """Bit offset of a date in the coverage bitmap (days since epoch)"""
+        return (datetime.strptime(date, "%Y-%m-%d") - NEWS_COVERAGE_EPOCH).days
+
+    @staticmethod
+    def _get_date_range(from_date: str, to_date: str) -> List[str]:
+        """Generate all dates in the range"""
+        from_dt = datetime.strptime(from_date, "%Y-%m-%d")
+        to_dt = datetime.strptime(to_date, "%Y-%m-%d")
+        return [
+            (from_dt + timedelta(days=i)).strftime("%Y-%m-%d")
+            for i in range((to_dt - from_dt).days + 1)
+        ]
+
     def _get_date_range_keys(
         self, stock_name: str, from_date: str, to_date: str
     ) -> List[str]:
@@ -111,7 +353,14 @@ class NewsStorage:
         to_date: str,
         news: List[Dict[str, Any]],
     ):
-        """Store news data in Redis, organized by date"""
+        """Store news data in the backend, organized by date
+
+        news must be the complete upstream result for from_date..to_date:
+        days in the range without articles are recorded as fetched-empty
+        so they are not requested again until the marker expires. Days
+        whose news expires (recent days, under a cache policy) are covered
+        by an expiring marker instead of the coverage bitmap.
+        """
         # Group news by date
         news_by_date = {}
         for item in news:
@@ -120,29 +369,98 @@ class NewsStorage:
                 news_by_date[date] = []
             news_by_date[date].append(item)
 
-        # Store each day's news separately
+        # Store each day's news separately and flag the day in the coverage
+        # bitmap, all in one round trip
+        now = time.time()
+        pipeline = self.backend.pipeline(transaction=False)
+        coverage_key = self._get_coverage_key(stock_name)
+        fetched_days = {}
         for date, day_news in news_by_date.items():
             key = self._get_key(stock_name, date)
-            self.redis.set(key, json.dumps(day_news))
+            payload = (
+                news_codec.encode_news(day_news)
+                if self.binary
+                else json.dumps(day_news)
+            )
+            ttl = self.policy.ttl_for("news", date) if self.policy else None
+            pipeline.set(key, payload, ex=ttl)
+            if self.policy:
+                self.policy.track(pipeline, "news", key, len(payload), ttl)
+            if ttl:
+                fetched_days[date] = now + ttl
+            else:
+                pipeline.setbit(coverage_key, self._get_day_offset(date), 1)
+
+        # Days without articles get an expiring marker instead of a bit, as
+        # a quiet day may still get news published later
+        for date in self._get_date_range(from_date, to_date):
+            if date not in news_by_date:
+                ttl = self.policy.ttl_for("news", date) if self.policy else None
+                fetched_days[date] = now + min(
+                    ttl or news_empty_ttl, news_empty_ttl
+                )
+
+        fetched_key = self._get_fetched_key(stock_name)
+        if fetched_days:
+            pipeline.zadd(fetched_key, fetched_days)
+        pipeline.zremrangebyscore(fetched_key, "-inf", now)
+        pipeline.execute()
+        # Days without articles may be cached as empty, so drop the range
+        if self.l1 is not None:
+            self.l1.invalidate(
+                self._get_date_range_keys(stock_name, from_date, to_date)
+            )
+        if self.policy:
+            self.policy.enforce()
 
     def get_news(
-        self, stock_name: str, from_date: str, to_date: str
+        self,
+        stock_name: str,
+        from_date: str,
+        to_date: str,
+        fields: Optional[Sequence[str]] = None,
     ) -> List[Dict[str, Any]]:
-        """Retrieve news data from Redis for a date range"""
+        """Retrieve news data from the backend for a date range
+
+        Only the given fields of each article are returned if fields is set,
+        which skips decoding the others in the binary encoding. Articles may
+        be shared with the in-process cache and must not be modified.
+        """
         # Get all keys in the date range
         keys = self._get_date_range_keys(stock_name, from_date, to_date)
-
-        # Use pipeline to get all data in one network round trip
-        pipeline = self.redis.pipeline()
-        for key in keys:
-            pipeline.get(key)
-        results = pipeline.execute()
+        variant = tuple(fields) if fields else None
+
+        # Days decoded recently in this process are served from memory
+        days = {}
+        use_l1 = self.l1 is not None and self.l1.enabled
+        if use_l1:
+            generation = self.l1.generation
+            for key in keys:
+                cached = self.l1.get(key, variant)
+                if cached is not MISS:
+                    days[key] = cached
+            metrics.increment("l1_hits:news", len(days))
+        missing = [key for key in keys if key not in days]
+
+        if missing:
+            # Use pipeline to get all data in one network round trip
+            pipeline = self.backend.pipeline()
+            for key in missing:
+                pipeline.get(key)
+            if self.policy:
+                self.policy.touch(pipeline, missing)
+            results = pipeline.execute()[: len(missing)]
+            for key, data in zip(missing, results):
+                days[key] = news_codec.decode_news(data, fields)
+                if use_l1:
+                    self.l1.put(key, days[key], generation, variant=variant)
+            if use_l1:
+                metrics.increment("l1_misses:news", len(missing))
 
         # Combine all news items
         all_news = []
-        for data in results:
-            if data:
-                all_news.extend(json.loads(data))
+        for key in keys:
+            all_news.extend(days[key])
 
         return all_news
 
@@ -151,82 +469,474 @@ class NewsStorage:
     ) -> List[Dict[str, Any]]:
         """Retrieve news data for a specific date"""
         key = self._get_key(stock_name, date)
-        data = self.redis.get(key)
-        return json.loads(data) if data else []
+        return news_codec.decode_news(self.backend.get(key))
 
     def has_news_for_date(self, stock_name: str, date: str) -> bool:
         """Check if we have news data for a specific date"""
         key = self._get_key(stock_name, date)
-        return bool(self.redis.exists(key))
+        return bool(self.backend.exists(key))
 
     def get_missing_dates(
         self, stock_name: str, from_date: str, to_date: str
     ) -> List[str]:
         """Get list of dates in range that don't have news data"""
         from_dt = datetime.strptime(from_date, "%Y-%m-%d")
-        to_dt = datetime.strptime(to_date, "%Y-%m-%d")
-        missing_dates = []
+        first_offset = self._get_day_offset(from_date)
+        last_offset = self._get_day_offset(to_date)
+        if last_offset < first_offset:
+            return []
+
+        # Fetch only the bytes of the bitmap that cover the range, in a
+        # single GETRANGE instead of one EXISTS per day, together with the
+        # days whose fetched marker has not expired yet
+        first_byte = first_offset // 8
+        pipeline = self.backend.pipeline(transaction=False)
+        pipeline.getrange(
+            self._get_coverage_key(stock_name), first_byte, last_offset // 8
+        )
+        pipeline.zrangebyscore(
+            self._get_fetched_key(stock_name), time.time(), "+inf"
+        )
+        bitmap, fetched_days = pipeline.execute()
+        fetched_days = {
+            day.decode() if isinstance(day, bytes) else day
+            for day in fetched_days
+        }
 
+        missing_dates = []
         current_dt = from_dt
-        while current_dt <= to_dt:
+        for offset in range(first_offset, last_offset + 1):
+            index = offset // 8 - first_byte
+            covered = index < len(bitmap) and (
+                bitmap[index] >> (7 - offset % 8) & 1
+            )
             current_date = current_dt.strftime("%Y-%m-%d")
-            if not self.has_news_for_date(stock_name, current_date):
+            if not covered and current_date not in fetched_days:
                 missing_dates.append(current_date)
             current_dt += timedelta(days=1)
 
+        if self.policy:
+            self.policy.record_lookup("news", not missing_dates)
         return missing_dates
 
+    def get_missing_spans(
+        self, stock_name: str, from_date: str, to_date: str
+    ) -> List[Tuple[str, str]]:
+        """Collapse the missing dates in range into contiguous (from, to) spans"""
+        spans = []
+        for date in self.get_missing_dates(stock_name, from_date, to_date):
+            if spans and self._get_day_offset(date) == (
+                self._get_day_offset(spans[-1][1]) + 1
+            ):
+                spans[-1] = (spans[-1][0], date)
+            else:
+                spans.append((date, date))
+        return spans
 
-class StockPriceStorage:
-    """Redis-backed storage for stock price data"""
 
-    def __init__(self, redis_client):
-        self.redis = redis_client
-        self.prefix = "prices:"
+class StockPriceStorage:
+    """Storage for stock price data on a backend
 
-    def _get_key(self, stock_name: str, from_date: str, to_date: str) -> str:
-        """Generate a unique key for the stock price data"""
-        return f"{self.prefix}{stock_name}_{from_date}_{to_date}"
+    Each stock has one canonical, date-sorted daily series that every range
+    query slices, alongside the date it was last fetched so ranges up to that
+    day are served without going back to Alpha Vantage.
+    """
 
-    def store_prices(
-        self, stock_name: str, from_date: str, to_date: str, data: pd.DataFrame
+    def __init__(
+        self, backend, policy: CachePolicy = None, l1: LocalCache = None
     ):
-        """Store stock price data in Redis"""
-        key = self._get_key(stock_name, from_date, to_date)
-        self.redis.set(key, pickle.dumps(data))
+        self.backend = backend
+        self.policy = policy
+        self.l1 = l1
+        self.prefix = "prices:"
+        self.meta_prefix = "prices_meta:"
+        if policy is not None and l1 is not None:
+            policy.register_store("prices", on_evict=l1.invalidate)
+
+    def _get_key(self, stock_name: str) -> str:
+        """Generate the key of the canonical price series for a stock"""
+        return f"{self.prefix}{stock_name}"
+
+    def _get_meta_key(self, stock_name: str) -> str:
+        """Generate the key of the price series metadata for a stock"""
+        return f"{self.meta_prefix}{stock_name}"
+
+    def store_prices(self, stock_name: str, data: pd.DataFrame):
+        """Replace the canonical price series of a stock in the backend"""
+        data = data.copy()
+        data.index = pd.to_datetime(data.index)
+        data = data.sort_index()
+
+        key = self._get_key(stock_name)
+        payload = encode_frame(data, float32=price_float32)
+        ttl = self.policy.ttl_for("prices") if self.policy else None
+        pipeline = self.backend.pipeline(transaction=False)
+        pipeline.set(key, payload, ex=ttl)
+        pipeline.hset(
+            self._get_meta_key(stock_name),
+            "fetched_on",
+            datetime.now().strftime("%Y-%m-%d"),
+        )
+        if self.policy:
+            self.policy.track(pipeline, "prices", key, len(payload), ttl)
+        pipeline.execute()
+        if self.l1 is not None:
+            self.l1.invalidate([key])
+        if self.policy:
+            self.policy.enforce()
+        return data
+
+    def get_series(self, stock_name: str):
+        """Retrieve the canonical price series and the day it was fetched
+
+        The series may be shared with the in-process cache and must not be
+        modified.
+        """
+        key = self._get_key(stock_name)
+        if self.l1 is not None and self.l1.enabled:
+            cached = self.l1.get(key)
+            if cached is not MISS:
+                metrics.increment("l1_hits:prices")
+                return cached
+            metrics.increment("l1_misses:prices")
+            generation = self.l1.generation
+            series = self._read_series(stock_name)
+            self.l1.put(key, series, generation)
+            return series
+        return self._read_series(stock_name)
+
+    def _read_series(self, stock_name: str):
+        """Read and decode the canonical series and fetch date"""
+        key = self._get_key(stock_name)
+        pipeline = self.backend.pipeline(transaction=False)
+        pipeline.get(key)
+        pipeline.hget(self._get_meta_key(stock_name), "fetched_on")
+        if self.policy:
+            self.policy.touch(pipeline, [key])
+        data, fetched_on = pipeline.execute()[:2]
+        # Series in an unknown format are treated as missing and refetched
+        data = decode_frame(data)
+        if data is None or not fetched_on:
+            return None, None
+        if isinstance(fetched_on, bytes):
+            fetched_on = fetched_on.decode()
+        return data, fetched_on
+
+    @staticmethod
+    def covers(fetched_on: str, to_date: str) -> bool:
+        """Check if a series fetched on fetched_on has every day to to_date"""
+        # Days after the last fetch may have new prices, except days that
+        # have not happened yet
+        today = datetime.now().strftime("%Y-%m-%d")
+        return min(to_date, today) <= fetched_on
+
+    def get_covering_series(
+        self, stock_name: str, to_date: str
+    ) -> pd.DataFrame:
+        """Retrieve the canonical series if it covers to_date, else None"""
+        data, fetched_on = self.get_series(stock_name)
+        if data is None or not self.covers(fetched_on, to_date):
+            return None
+        return data
+
+    def lookup_series(self, stock_name: str, to_date: str) -> pd.DataFrame:
+        """get_covering_series, counted as a hit or miss of the prices store"""
+        data = self.get_covering_series(stock_name, to_date)
+        if self.policy:
+            self.policy.record_lookup("prices", data is not None)
+        return data
 
     def get_prices(
         self, stock_name: str, from_date: str, to_date: str
     ) -> pd.DataFrame:
-        """Retrieve stock price data from Redis"""
-        key = self._get_key(stock_name, from_date, to_date)
-        data = self.redis.get(key)
-        return pickle.loads(data) if data else None
+        """Retrieve stock price data from the backend for a date range
+
+        Returns None when the stored series does not cover the range yet.
+        """
+        data = self.lookup_series(stock_name, to_date)
+        if data is None:
+            return None
+
+        # Label slicing on the sorted index is a binary search, not a mask
+        # over the whole history
+        return data.loc[from_date:to_date]
+
+
+class IndicatorStorage:
+    """Storage for technical indicators computed over cached price series
+
+    Each (stock, indicator, parameters) keeps its values over the stock's
+    whole canonical series, alongside the rows they cover and the state to
+    extend them. When a refetch appends days to the series only those days
+    are computed; when the history itself changed everything is recomputed.
+    A value's state is counted in its size and dropped when the cache
+    policy evicts or expires the value.
+    """
+
+    def __init__(self, backend, policy: CachePolicy = None):
+        self.backend = backend
+        self.policy = policy
+        self.prefix = "indicators:"
+        self.meta_prefix = "indicators_meta:"
+        if policy is not None:
+            policy.register_store("indicators", on_evict=self._forget_states)
+
+    def _get_key(self, stock_name: str, spec: str) -> str:
+        """Generate the key of an indicator's values for a stock"""
+        return f"{self.prefix}{stock_name}:{spec}"
+
+    def _get_meta_key(self, stock_name: str) -> str:
+        """Generate the key of the indicator states of a stock"""
+        return f"{self.meta_prefix}{stock_name}"
+
+    def _forget_states(self, keys: List[str]):
+        """Drop the states of values the cache policy evicted or expired"""
+        pipeline = self.backend.pipeline(transaction=False)
+        for key in keys:
+            stock_name, spec = key[len(self.prefix) :].split(":", 1)
+            pipeline.hdel(self._get_meta_key(stock_name), spec)
+        pipeline.execute()
+
+    @staticmethod
+    def _extends(
+        cached: pd.DataFrame, state: Dict[str, Any], prices: pd.DataFrame
+    ) -> bool:
+        """Check if prices start with the rows the cached values cover"""
+        rows = state["rows"]
+        return (
+            len(cached) == rows
+            and 0 < rows <= len(prices)
+            and prices.index[0] == cached.index[0]
+            and prices.index[rows - 1] == cached.index[-1]
+            and prices["4. close"].iat[rows - 1] == state["last_close"]
+        )
+
+    def get_indicator(
+        self, stock_name: str, spec: str, prices: pd.DataFrame
+    ) -> np.ndarray:
+        """Values of an indicator for every row of a stock's price series"""
+        key = self._get_key(stock_name, spec)
+        meta_key = self._get_meta_key(stock_name)
+        pipeline = self.backend.pipeline(transaction=False)
+        pipeline.get(key)
+        pipeline.hget(meta_key, spec)
+        if self.policy:
+            self.policy.touch(pipeline, [key])
+        payload, state = pipeline.execute()[:2]
+        cached = decode_frame(payload)
+        state = json.loads(state) if state else None
+
+        start = 0
+        if (
+            cached is not None
+            and state
+            and self._extends(cached, state, prices)
+        ):
+            start = state["rows"]
+        if self.policy:
+            self.policy.record_lookup("indicators", start == len(prices))
+        if start == len(prices):
+            return cached["value"].to_numpy()
+
+        closes = prices["4. close"].to_numpy(dtype="f8")
+        values, indicator_state = compute_indicator(
+            spec, closes, start, state["indicator"] if start else None
+        )
+        metrics.increment("indicator_rows_computed", len(values))
+        if start:
+            values = np.concatenate((cached["value"].to_numpy(), values))
+
+        payload = encode_frame(
+            pd.DataFrame({"value": values}, index=prices.index)
+        )
+        state = json.dumps(
+            {
+                "rows": len(values),
+                "last_close": float(closes[-1]),
+                "indicator": indicator_state,
+            }
+        )
+        ttl = self.policy.ttl_for("indicators") if self.policy else None
+        pipeline = self.backend.pipeline(transaction=False)
+        pipeline.set(key, payload, ex=ttl)
+        pipeline.hset(meta_key, spec, state)
+        if ttl:
+            # Outlives every value of the stock, whose states it holds
+            pipeline.expire(meta_key, ttl)
+        if self.policy:
+            self.policy.track(
+                pipeline, "indicators", key, len(payload) + len(state), ttl
+            )
+        pipeline.execute()
+        if self.policy:
+            self.policy.enforce()
+        return values
 
 
 class PlotStorage:
-    """Redis-backed storage for stock plot data"""
+    """Storage for stock plot data on a backend
 
-    def __init__(self, redis_client):
-        self.redis = redis_client
-        self.prefix = "plot:"
+    Plots are stored once under a fingerprint of everything that affects the
+    rendered image, so an identical plot is never rendered twice. Each stock
+    and each (stock, range) points at the fingerprint of its latest plot,
+    and the least recently used plots beyond max_plots are evicted.
+    """
 
-    def store_plot(self, stock_name: str, plot_data: Dict[str, Any]):
-        """Store plot data in Redis"""
-        key = f"{self.prefix}{stock_name}"
-        self.redis.set(key, json.dumps(plot_data))
+    def __init__(
+        self, backend, max_plots: int = 100, policy: CachePolicy = None
+    ):
+        self.backend = backend
+        self.policy = policy
+        self.prefix = "plot:"
+        self.max_plots = max_plots
+        if policy is not None:
+            policy.register_store("plots", on_evict=self._forget_plots)
+
+    def _get_plot_key(self, fingerprint: str) -> str:
+        """Generate the key of the plot data for a fingerprint"""
+        return f"{self.prefix}fp:{fingerprint}"
+
+    def _get_pointer_key(
+        self, stock_name: str, from_date: str = None, to_date: str = None
+    ) -> str:
+        """Generate the key pointing at the latest plot of a stock or range"""
+        if from_date and to_date:
+            return f"{self.prefix}{stock_name}:{from_date}:{to_date}"
+        return f"{self.prefix}{stock_name}"
+
+    def _get_lru_key(self) -> str:
+        """Generate the key of the sorted set of plots by last use"""
+        return f"{self.prefix}lru"
+
+    def _forget_plots(self, keys: List[str]):
+        """Drop plots the cache policy evicted from the LRU index"""
+        prefix = self._get_plot_key("")
+        fingerprints = [key[len(prefix) :] for key in keys]
+        if fingerprints:
+            self.backend.zrem(self._get_lru_key(), *fingerprints)
+
+    def has_plot(self, fingerprint: str) -> bool:
+        """Check if a plot with this fingerprint is stored"""
+        found = bool(self.backend.exists(self._get_plot_key(fingerprint)))
+        if self.policy:
+            self.policy.record_lookup("plots", found)
+        return found
+
+    def link_plot(
+        self, stock_name: str, from_date: str, to_date: str, fingerprint: str
+    ):
+        """Make a stored plot the latest one for the stock and range"""
+        pipeline = self.backend.pipeline(transaction=False)
+        pipeline.set(self._get_pointer_key(stock_name), fingerprint)
+        pipeline.set(
+            self._get_pointer_key(stock_name, from_date, to_date), fingerprint
+        )
+        pipeline.zadd(self._get_lru_key(), {fingerprint: time.time()})
+        pipeline.execute()
 
-    def get_plot(self, stock_name: str) -> Dict[str, Any]:
-        """Retrieve plot data from Redis"""
-        key = f"{self.prefix}{stock_name}"
-        data = self.redis.get(key)
+    def store_plot(
+        self,
+        stock_name: str,
+        from_date: str,
+        to_date: str,
+        fingerprint: str,
+        plot_data: str,
+    ):
+        """Store plot data and evict the least recently used"""
+        key = self._get_plot_key(fingerprint)
+        payload = json.dumps(plot_data)
+        ttl = self.policy.ttl_for("plots") if self.policy else None
+        pipeline = self.backend.pipeline(transaction=False)
+        pipeline.set(key, payload, ex=ttl)
+        if self.policy:
+            self.policy.track(pipeline, "plots", key, len(payload), ttl)
+        pipeline.execute()
+        self.link_plot(stock_name, from_date, to_date, fingerprint)
+        if self.policy:
+            # Drops expired plots from the LRU index before it is counted
+            self.policy.enforce()
+
+        lru_key = self._get_lru_key()
+        excess = self.backend.zcard(lru_key) - self.max_plots
+        if excess > 0:
+            evicted = [
+                fp.decode() if isinstance(fp, bytes) else fp
+                for fp, _ in self.backend.zpopmin(lru_key, excess)
+            ]
+            keys = [self._get_plot_key(fp) for fp in evicted]
+            self.backend.delete(*keys)
+            if self.policy:
+                self.policy.forget(keys)
+
+    def get_plot(
+        self, stock_name: str, from_date: str = None, to_date: str = None
+    ) -> str:
+        """Retrieve the latest plot of a stock, or of a range if given"""
+        fingerprint = self.backend.get(
+            self._get_pointer_key(stock_name, from_date, to_date)
+        )
+        if not fingerprint:
+            return None
+        if isinstance(fingerprint, bytes):
+            fingerprint = fingerprint.decode()
+
+        key = self._get_plot_key(fingerprint)
+        pipeline = self.backend.pipeline(transaction=False)
+        pipeline.get(key)
+        pipeline.zadd(self._get_lru_key(), {fingerprint: time.time()}, xx=True)
+        if self.policy:
+            self.policy.touch(pipeline, [key])
+        data = pipeline.execute()[0]
         return json.loads(data) if data else None
 
 
-# Initialize storage instances with Redis client
-news_storage = NewsStorage(redis_client)
-price_storage = StockPriceStorage(redis_client)
-plot_storage = PlotStorage(redis_client)
+# Initialize storage instances with the storage backend and a shared cache
+# policy
+cache_policy = CachePolicy(
+    storage_client,
+    budget_bytes=cache_memory_budget,
+    eviction=cache_eviction_policy,
+    store_ttls={
+        "news": news_ttl,
+        "prices": prices_ttl,
+        "plots": plots_ttl,
+        # Indicators are extended from the prices they are computed over
+        "indicators": prices_ttl,
+    },
+    recent_days=cache_recent_days,
+    recent_ttl=cache_recent_ttl,
+)
+# Invalidations between workers go through Redis pub/sub, so the in-process
+# cache is off without it
+l1_cache = LocalCache(
+    redis_client,
+    l1_cache_bytes if redis_available else 0,
+    ttl=l1_cache_ttl,
+)
+news_storage = NewsStorage(
+    storage_client, policy=cache_policy, encoding=news_encoding, l1=l1_cache
+)
+price_storage = StockPriceStorage(
+    storage_client, policy=cache_policy, l1=l1_cache
+)
+indicator_storage = IndicatorStorage(storage_client, policy=cache_policy)
+plot_storage = PlotStorage(
+    storage_client, max_plots=plot_cache_max_entries, policy=cache_policy
+)
+upstream_flight = SingleFlight(redis_client, lease_seconds=singleflight_lease)
+render_pool = RenderPool(render_workers, render_queue_size, render_timeout)
+email_outbox = Outbox(
+    redis_client,
+    StubTransport() if gmail_transport == "stub" else GmailTransport(),
+    batch_size=outbox_batch_size,
+    max_attempts=outbox_max_attempts,
+)
+news_backfill_executor = ThreadPoolExecutor(
+    max_workers=news_backfill_concurrency, thread_name_prefix="news-backfill"
+)
+price_fetch_executor = ThreadPoolExecutor(
+    max_workers=price_fetch_concurrency, thread_name_prefix="price-fetch"
+)
 
 
 class StockRequest(BaseModel):
@@ -240,43 +950,123 @@ class FunctionCall(BaseModel):
     params: Dict[str, Any]
 
 
-def get_stock_news(stock_name: str, from_date: str, to_date: str) -> str:
-    """Get news for a stock using Finnhub and store it in Redis"""
-    try:
-        # Check which dates we already have news for
-        missing_dates = news_storage.get_missing_dates(
-            stock_name, from_date, to_date
-        )
+class BatchFunctionCall(FunctionCall):
+    # Defaults to the call's position in the batch
+    id: Optional[str] = None
+    # Ids of calls that must succeed before this one starts
+    depends_on: List[str] = []
 
-        if not missing_dates:
-            # We already have all the news data
-            return news_storage.get_news(stock_name, from_date, to_date)
 
-        # Convert dates to timestamps for API call
-        from_timestamp = int(
-            datetime.strptime(from_date, "%Y-%m-%d").timestamp()
-        )
-        to_timestamp = int(datetime.strptime(to_date, "%Y-%m-%d").timestamp())
+class BatchRequest(BaseModel):
+    calls: List[BatchFunctionCall]
+
 
-        # Get company news from Finnhub
+def fetch_stock_news(stock_name: str, from_date: str, to_date: str) -> bool:
+    """Fetch news for a date range from Finnhub and store it in Redis"""
+    # Convert dates to timestamps for API call, to_date inclusive
+    from_timestamp = int(datetime.strptime(from_date, "%Y-%m-%d").timestamp())
+    to_timestamp = int(
+        (datetime.strptime(to_date, "%Y-%m-%d") + timedelta(days=1)).timestamp()
+    )
+
+    # Get company news from Finnhub
+    finnhub_limiter.acquire()
+    metrics.increment("news_upstream_calls")
+    with metrics.timer("upstream_latency_seconds:finnhub"):
         news = finnhub_client.company_news(
             stock_name, _from=from_date, to=to_date
         )
 
-        filtered_news = [
-            {
-                "date": datetime.fromtimestamp(n["datetime"]).strftime(
-                    "%Y-%m-%d"
-                ),
-                "title": n["headline"],
-                "summary": n.get("summary", "No summary available"),
-            }
-            for n in news
-            if from_timestamp <= n["datetime"] <= to_timestamp
-        ]
+    filtered_news = [
+        {
+            "date": datetime.fromtimestamp(n["datetime"]).strftime("%Y-%m-%d"),
+            "title": n["headline"],
+            "summary": n.get("summary", "No summary available"),
+        }
+        for n in news
+        if from_timestamp <= n["datetime"] < to_timestamp
+    ]
+
+    # Store news in Redis, organized by date
+    news_storage.store_news(stock_name, from_date, to_date, filtered_news)
+    return True
+
+
+def split_into_windows(
+    from_date: str, to_date: str, window_days: int
+) -> List[Tuple[str, str]]:
+    """Split a date range at fixed window_days boundaries since the epoch
+
+    Fixed boundaries make overlapping requests produce the same windows, so
+    their fetches can be coalesced.
+    """
+    from_dt = datetime.strptime(from_date, "%Y-%m-%d")
+    to_dt = datetime.strptime(to_date, "%Y-%m-%d")
+    windows = []
+    while from_dt <= to_dt:
+        offset = (from_dt - NEWS_COVERAGE_EPOCH).days
+        window_end = NEWS_COVERAGE_EPOCH + timedelta(
+            days=(offset // window_days + 1) * window_days - 1
+        )
+        end_dt = min(window_end, to_dt)
+        windows.append(
+            (from_dt.strftime("%Y-%m-%d"), end_dt.strftime("%Y-%m-%d"))
+        )
+        from_dt = end_dt + timedelta(days=1)
+    return windows
+
+
+def fetch_news_window(stock_name: str, from_date: str, to_date: str) -> bool:
+    """Fetch one news window, sharing the call with concurrent requests"""
+    return upstream_flight.do(
+        f"news:{stock_name}:{from_date}:{to_date}",
+        lambda: fetch_stock_news(stock_name, from_date, to_date),
+        lambda: (
+            not news_storage.get_missing_dates(stock_name, from_date, to_date)
+            or None
+        ),
+    )
+
+
+def get_stock_news(stock_name: str, from_date: str, to_date: str) -> str:
+    """Get news for a stock using Finnhub and store it in Redis"""
+    try:
+        metrics.increment("news_requests")
 
-        # Store news in Redis, organized by date
-        news_storage.store_news(stock_name, from_date, to_date, filtered_news)
+        # Check which dates we already have news for
+        missing_spans = news_storage.get_missing_spans(
+            stock_name, from_date, to_date
+        )
+
+        if not missing_spans:
+            # We already have all the news data
+            metrics.increment("news_cache_hits")
+        else:
+            # One per call, however many windows it fetches
+            metrics.increment("news_upstream_requests")
+            # Fetch only the missing days, in bounded windows fetched
+            # concurrently; each window is stored as soon as it arrives
+            windows = [
+                window
+                for span_from, span_to in missing_spans
+                for window in split_into_windows(
+                    span_from, span_to, news_window_days
+                )
+            ]
+            # Each window runs in a copy of this context so it keeps the
+            # caller's rate-limit priority
+            futures = [
+                news_backfill_executor.submit(
+                    contextvars.copy_context().run,
+                    fetch_news_window,
+                    stock_name,
+                    window_from,
+                    window_to,
+                )
+                for window_from, window_to in windows
+            ]
+            for future in as_completed(futures):
+                future.result()
 
         # Return combined news for the requested date range
         return news_storage.get_news(stock_name, from_date, to_date)
@@ -285,37 +1075,133 @@ def get_stock_news(stock_name: str, from_date: str, to_date: str) -> str:
         return False
 
 
+def fetch_stock_prices(stock_name: str) -> pd.DataFrame:
+    """Fetch the full daily history from Alpha Vantage and store it"""
+    alpha_vantage_limiter.acquire()
+    metrics.increment("price_upstream_calls")
+    with metrics.timer("upstream_latency_seconds:alpha_vantage"):
+        data, meta_data = ts.get_daily(symbol=stock_name, outputsize="full")
+    return price_storage.store_prices(stock_name, data)
+
+
+def fetch_price_series(stock_name: str, to_date: str) -> pd.DataFrame:
+    """Get the full daily history of a stock from Alpha Vantage
+
+    The history is kept as the stock's canonical series; concurrent misses
+    for the same stock share one download.
+    """
+    return upstream_flight.do(
+        f"prices:{stock_name}",
+        lambda: fetch_stock_prices(stock_name),
+        lambda: price_storage.get_covering_series(stock_name, to_date),
+    )
+
+
+def get_cached_price_series(stock_name: str, to_date: str) -> pd.DataFrame:
+    """Get the stored price series of a stock if it covers to_date"""
+    return price_storage.lookup_series(stock_name, to_date)
+
+
+def load_price_series(stock_name: str, to_date: str) -> pd.DataFrame:
+    """Get the canonical price series of a stock covering to_date"""
+    data = get_cached_price_series(stock_name, to_date)
+    if data is None:
+        data = fetch_price_series(stock_name, to_date)
+    return data
+
+
+def load_price_series_batch(
+    stock_names: List[str], to_date: str
+) -> Tuple[Dict[str, pd.DataFrame], List[str]]:
+    """Get the price series of several stocks covering to_date
+
+    Stocks missing from storage are fetched concurrently, each through the
+    shared rate limiter. Returns the series by stock and the stocks that
+    could not be fetched.
+    """
+    series = {}
+    for stock_name in stock_names:
+        data = get_cached_price_series(stock_name, to_date)
+        if data is not None:
+            series[stock_name] = data
+
+    # Each fetch runs in a copy of this context so it keeps the caller's
+    # rate-limit priority
+    futures = {
+        price_fetch_executor.submit(
+            contextvars.copy_context().run,
+            fetch_price_series,
+            stock_name,
+            to_date,
+        ): stock_name
+        for stock_name in stock_names
+        if stock_name not in series
+    }
+    failed = []
+    for future in as_completed(futures):
+        stock_name = futures[future]
+        try:
+            series[stock_name] = future.result()
+        except Exception as e:
+            logging.error(
+                f"Error getting stock prices of {stock_name} from Alpha "
+                f"Vantage: {str(e)}"
+            )
+            failed.append(stock_name)
+    return series, [name for name in stock_names if name in failed]
+
+
+def parse_stock_names(stock_names: Sequence[str]) -> List[str]:
+    """Stocks of a multi-stock call, in order and without duplicates"""
+    if isinstance(stock_names, str):
+        stock_names = stock_names.split(",")
+    stock_names = [name.strip() for name in stock_names if name.strip()]
+    if not stock_names:
+        raise ValueError("stock_names must name at least one stock")
+    return list(dict.fromkeys(stock_names))
+
+
+def align_closes(
+    series: Dict[str, pd.DataFrame],
+    stock_names: List[str],
+    from_date: str,
+    to_date: str,
+) -> pd.DataFrame:
+    """Closing prices of the stocks in a range, one column per stock
+
+    Rows are the union of the stocks' trading days; a stock without a price
+    on a day (not listed yet, or a market holiday elsewhere) has NaN.
+    """
+    columns = {
+        stock_name: series[stock_name]["4. close"].loc[from_date:to_date]
+        for stock_name in stock_names
+        if stock_name in series
+    }
+    if not columns:
+        return pd.DataFrame(index=pd.DatetimeIndex([], name="date"))
+    return pd.concat(columns, axis=1).sort_index()
+
+
+def get_price_range(
+    stock_name: str, from_date: str, to_date: str
+) -> pd.DataFrame:
+    """Prices of a stock in a date range, fetched if not stored yet"""
+    # Label slicing on the sorted index is a binary search
+    return load_price_series(stock_name, to_date).loc[from_date:to_date]
+
+
 def get_stock_price(
     stock_name: str, from_date: str, to_date: str
 ) -> List[float]:
     """Get historical stock prices for a date range using Alpha Vantage"""
     try:
-        # Check if data is in storage
-        stored_data = price_storage.get_prices(stock_name, from_date, to_date)
-        if stored_data is not None:
-            return [float(price) for price in stored_data["4. close"]]
-
-        # Get daily data from Alpha Vantage
-        data, meta_data = ts.get_daily(symbol=stock_name, outputsize="full")
+        stored_data = get_price_range(stock_name, from_date, to_date)
 
-        # Convert date strings to datetime
-        from_date_dt = pd.to_datetime(from_date)
-        to_date_dt = pd.to_datetime(to_date)
-
-        # Filter data for the date range
-        mask = (data.index >= from_date_dt) & (data.index <= to_date_dt)
-        filtered_data = data.loc[mask]
-
-        if filtered_data.empty:
+        if stored_data.empty:
             return []
 
-        # Store the filtered data
-        price_storage.store_prices(
-            stock_name, from_date, to_date, filtered_data
-        )
-
         # Return list of closing prices
-        return [float(price) for price in filtered_data["4. close"]]
+        return stored_data["4. close"].tolist()
     except Exception as e:
         logging.error(
             f"Error getting stock prices from Alpha Vantage: {str(e)}"
@@ -323,10 +1209,114 @@ def get_stock_price(
         return []
 
 
-def send_email(recipient_email: str, stock_name: str, body: str) -> bool:
-    """Send email with stock plot attachment"""
+def get_stock_prices(
+    stock_names: List[str], from_date: str, to_date: str
+) -> Dict[str, Any]:
+    """Get the closing prices of several stocks on common dates
+
+    Returns the dates in the range that any of the stocks traded, each
+    stock's closes on them (None where it has no price), and the stocks
+    whose prices could not be fetched.
+    """
+    stock_names = parse_stock_names(stock_names)
+    series, failed = load_price_series_batch(stock_names, to_date)
+    closes = align_closes(series, stock_names, from_date, to_date)
+    if closes.empty:
+        return {
+            "message": "No price data available for the specified date "
+            "range",
+            "missing": failed,
+        }
+
+    values = closes.astype(object).where(closes.notna(), None)
+    return {
+        "dates": closes.index.strftime("%Y-%m-%d").tolist(),
+        "prices": {
+            stock_name: values[stock_name].tolist()
+            for stock_name in closes.columns
+        },
+        "missing": failed,
+    }
+
+
+def summarize_indicator(values: np.ndarray, series: bool) -> Dict[str, Any]:
+    """First, last, lowest and highest value of an indicator in a range"""
+    values = np.round(values, 4)
+    valid = values[~np.isnan(values)]
+    summary = {
+        "first": float(valid[0]) if valid.size else None,
+        "last": float(valid[-1]) if valid.size else None,
+        "min": float(valid.min()) if valid.size else None,
+        "max": float(valid.max()) if valid.size else None,
+    }
+    if series:
+        # Days before the indicator's first window have no value
+        summary["values"] = [
+            None if np.isnan(value) else value for value in values.tolist()
+        ]
+    return summary
+
+
+def get_indicators(
+    stock_name: str,
+    from_date: str,
+    to_date: str,
+    indicators: Union[str, List[str]] = None,
+    series: bool = False,
+) -> Dict[str, Any]:
+    """Summarize technical indicators of a stock over a date range
+
+    indicators are specs like "sma:50" or "rsi" (default parameters), as a
+    list or a comma-separated string, see indicators.INDICATORS. They are
+    computed over the stock's whole cached history, so windows reach back
+    before from_date. series adds the daily values and their dates.
+    """
+    specs = parse_specs(indicators)
+    prices = load_price_series(stock_name, to_date)
+    in_range = prices.index.slice_indexer(from_date, to_date)
+    dates = prices.index[in_range]
+    if dates.empty:
+        return {
+            "message": "No price data available for the specified date range"
+        }
+
+    closes = prices["4. close"].to_numpy()[in_range]
+    result = {
+        "stock_name": stock_name,
+        "from_date": dates[0].strftime("%Y-%m-%d"),
+        "to_date": dates[-1].strftime("%Y-%m-%d"),
+        "days": len(dates),
+        "close": {
+            "first": float(closes[0]),
+            "last": float(closes[-1]),
+            "change": round(float(closes[-1] / closes[0] - 1), 4),
+        },
+        "indicators": {},
+    }
+    if series:
+        result["dates"] = dates.strftime("%Y-%m-%d").tolist()
+    for spec in specs:
+        values = indicator_storage.get_indicator(stock_name, spec, prices)
+        result["indicators"][spec] = summarize_indicator(
+            values[in_range], series
+        )
+    return result
+
+
+def send_email(
+    recipient_email: str,
+    stock_name: str,
+    body: str,
+    from_date: str = None,
+    to_date: str = None,
+) -> Dict[str, Any]:
+    """Queue an email with stock plot attachment for the outbox to send
+
+    Attaches the plot for from_date..to_date when given, else the latest
+    plot of the stock. Returns the outbox message id without waiting for
+    Gmail.
+    """
     try:
-        service = get_gmail_service()
         message = MIMEMultipart()
         message["from"] = os.getenv("GMAIL_USER")
         message["to"] = recipient_email
@@ -336,7 +1326,7 @@ def send_email(recipient_email: str, stock_name: str, body: str) -> bool:
         message.attach(MIMEText(body, "plain"))
 
         # Attach the plot
-        stored_plot = plot_storage.get_plot(stock_name)
+        stored_plot = plot_storage.get_plot(stock_name, from_date, to_date)
         if stored_plot is None:
             logging.info(
                 f"No plot data found for stock {stock_name}, mail will be sent without plot attachment"
@@ -353,44 +1343,110 @@ def send_email(recipient_email: str, stock_name: str, body: str) -> bool:
             )
             message.attach(image)
 
-        # Send email
+        # Queue the email for the background sender
         raw = base64.urlsafe_b64encode(message.as_bytes()).decode()
-        message_body = {"raw": raw}
-        send_message = (
-            service.users()
-            .messages()
-            .send(userId="me", body=message_body)
-            .execute()
-        )
-        print(f'Email sent! Message Id: {send_message["id"]}')
-        return True
+        message_id = email_outbox.enqueue(raw)
+        logging.info(f"Email queued! Message Id: {message_id}")
+        return {"message": "Email queued for sending", "message_id": message_id}
     except Exception as e:
         logging.error(f"Error sending email: {str(e)}")
         return False
 
 
-def plot_graph(stock_name: str, from_date: str, to_date: str) -> Dict[str, Any]:
-    """Create a plot of stock prices with news markers using Plotly"""
-    # Get prices and dates from storage or API
-    prices = get_stock_price(stock_name, from_date, to_date)
-
-    # Get the stored data
-    stored_data = price_storage.get_prices(stock_name, from_date, to_date)
-    if stored_data is None:
-        return {
-            "message": "No data available for the specified date range, advise you to call get_stock_price function first"
+# Rendered image size, and a version to bump whenever plot_graph changes how
+# a figure looks so previously cached plots stop matching
+PLOT_WIDTH = 1200
+PLOT_HEIGHT = 800
+PLOT_SCALE = 2
+PLOT_LAYOUT_VERSION = 2
+# News headlines listed in a marker's hover text, and news days annotated
+NEWS_HOVER_TITLES = 5
+MAX_NEWS_ANNOTATIONS = 20
+
+
+def get_plot_fingerprint(
+    stock_name: str,
+    from_date: str,
+    to_date: str,
+    prices: pd.DataFrame,
+    news: List[Dict[str, Any]],
+) -> str:
+    """Hash everything that affects a rendered plot"""
+    digest = hashlib.sha256()
+    digest.update(
+        json.dumps(
+            [
+                stock_name,
+                from_date,
+                to_date,
+                PLOT_LAYOUT_VERSION,
+                PLOT_WIDTH,
+                PLOT_HEIGHT,
+                PLOT_SCALE,
+            ]
+        ).encode()
+    )
+    # Price data version: the exact dates and closes being plotted
+    digest.update(prices.index.values.tobytes())
+    digest.update(prices["4. close"].to_numpy(dtype="f8").tobytes())
+    # News version: the headlines shown as markers
+    digest.update(
+        json.dumps([(item["date"], item["title"]) for item in news]).encode()
+    )
+    return digest.hexdigest()
+
+
+def get_news_markers(
+    prices: pd.Series, news: List[Dict[str, Any]]
+) -> pd.DataFrame:
+    """Align news with trading days, one row per day that has articles
+
+    Returns the close price, article count, first headline and hover text
+    (first NEWS_HOVER_TITLES headlines) of each day, indexed by date.
+    """
+    columns = ["price", "count", "title", "hover"]
+    empty = pd.DataFrame(
+        {
+            "price": [],
+            "count": pd.Series([], dtype="int64"),
+            "title": [],
+            "hover": [],
+        },
+        index=pd.DatetimeIndex([], name="date"),
+    )
+    if not news:
+        return empty
+
+    frame = pd.DataFrame(news, columns=["date", "title"])
+    frame["date"] = pd.to_datetime(frame["date"])
+    # Join on the price index: drops news on days without a price
+    frame = frame[frame["date"].isin(prices.index)]
+    if frame.empty:
+        return empty
+
+    by_day = frame.groupby("date", sort=True)["title"]
+    shown = frame[by_day.cumcount() < NEWS_HOVER_TITLES]
+    markers = pd.DataFrame(
+        {
+            "count": by_day.size(),
+            "title": by_day.first(),
+            "hover": shown.groupby("date")["title"].agg("<br>".join),
         }
+    )
+    markers["price"] = prices.reindex(markers.index).to_numpy()
+    extra = markers["count"] - NEWS_HOVER_TITLES
+    markers.loc[extra > 0, "hover"] += (
+        "<br>+" + extra[extra > 0].astype(str) + " more"
+    )
+    return markers[columns]
 
-    # Convert index to datetime and sort
-    stored_data.index = pd.to_datetime(stored_data.index)
-    stored_data = stored_data.sort_index()
-
-    # Get the actual dates where we have price data
-    dates = stored_data.index.strftime("%Y-%m-%d").tolist()
-    prices = stored_data["4. close"].tolist()
 
-    # Get news from storage
-    news = news_storage.get_news(stock_name, from_date, to_date)
+def build_plot_figure(
+    stock_name: str, stored_data: pd.DataFrame, news: List[Dict[str, Any]]
+) -> go.Figure:
+    """Build the price chart with news markers for plot_graph"""
+    prices = stored_data["4. close"]
+    markers = get_news_markers(prices, news)
 
     # Create the main price line
     fig = go.Figure()
@@ -398,8 +1454,8 @@ def plot_graph(stock_name: str, from_date: str, to_date: str) -> Dict[str, Any]:
     # Add the main price line
     fig.add_trace(
         go.Scatter(
-            x=dates,
-            y=prices,
+            x=prices.index,
+            y=prices.to_numpy(),
             mode="lines+markers",
             name="Stock Price",
             line=dict(color="#1f77b4", width=2),
@@ -407,48 +1463,48 @@ def plot_graph(stock_name: str, from_date: str, to_date: str) -> Dict[str, Any]:
         )
     )
 
-    # Add news markers and annotations
-    for i, news_item in enumerate(news):
-        date = news_item["date"]
-        if date in dates:
-            idx = dates.index(date)
-            price = prices[idx]
-
-            # Add news marker
-            fig.add_trace(
-                go.Scatter(
-                    x=[date],
-                    y=[price],
-                    mode="markers",
-                    name=news_item["title"][:30],
-                    marker=dict(
-                        size=12,
-                        color="red",
-                        symbol="star",
-                        line=dict(width=2, color="DarkSlateGrey"),
-                    ),
-                    showlegend=False,
-                )
-            )
+    # Add all news markers as a single trace, one point per day
+    fig.add_trace(
+        go.Scatter(
+            x=markers.index,
+            y=markers["price"].to_numpy(),
+            mode="markers",
+            name="News",
+            hovertext=markers["hover"].to_numpy(),
+            hoverinfo="text",
+            marker=dict(
+                size=12,
+                color="red",
+                symbol="star",
+                line=dict(width=2, color="DarkSlateGrey"),
+            ),
+            showlegend=False,
+        )
+    )
 
-            # Add news annotation
-            fig.add_annotation(
-                x=date,
-                y=price,
-                text=news_item["title"][:30] + "...",
-                showarrow=True,
-                arrowhead=2,
-                arrowsize=1,
-                arrowwidth=2,
-                arrowcolor="#636363",
-                ax=0,
-                ay=-40 if i % 2 == 0 else 40,
-                bgcolor="rgba(255, 255, 255, 0.8)",
-                bordercolor="rgba(0, 0, 0, 0.2)",
-                borderwidth=1,
-                borderpad=4,
-                font=dict(size=10),
-            )
+    # Annotate the busiest news days only, in date order
+    annotated = markers.nlargest(MAX_NEWS_ANNOTATIONS, "count").sort_index()
+    for i, (date, day) in enumerate(annotated.iterrows()):
+        text = day["title"][:30] + "..."
+        if day["count"] > 1:
+            text += f" (+{day['count'] - 1})"
+        fig.add_annotation(
+            x=date,
+            y=day["price"],
+            text=text,
+            showarrow=True,
+            arrowhead=2,
+            arrowsize=1,
+            arrowwidth=2,
+            arrowcolor="#636363",
+            ax=0,
+            ay=-40 if i % 2 == 0 else 40,
+            bgcolor="rgba(255, 255, 255, 0.8)",
+            bordercolor="rgba(0, 0, 0, 0.2)",
+            borderwidth=1,
+            borderpad=4,
+            font=dict(size=10),
+        )
 
     # Update layout
     fig.update_layout(
@@ -473,16 +1529,175 @@ def plot_graph(stock_name: str, from_date: str, to_date: str) -> Dict[str, Any]:
     # Add range slider
     fig.update_xaxes(rangeslider_visible=True)
 
-    # Convert plot to base64 string
-    buf = io.BytesIO()
-    pio.write_image(fig, buf, format="png", width=1200, height=800, scale=2)
-    buf.seek(0)
-    plot_base64 = base64.b64encode(buf.getvalue()).decode()
+    return fig
+
+
+def plot_graph(stock_name: str, from_date: str, to_date: str) -> Dict[str, Any]:
+    """Create a plot of stock prices with news markers using Plotly"""
+    # Prices for the range, fetched first if they are not in storage
+    try:
+        stored_data = get_price_range(stock_name, from_date, to_date)
+    except Exception as e:
+        logging.error(
+            f"Error getting stock prices from Alpha Vantage: {str(e)}"
+        )
+        stored_data = None
+    if stored_data is None or stored_data.empty:
+        return {
+            "message": "No data available for the specified date range, advise you to call get_stock_price function first"
+        }
+
+    # Get news from storage; markers only use dates and headlines
+    news = news_storage.get_news(
+        stock_name, from_date, to_date, fields=("date", "title")
+    )
+
+    # Skip rendering when an identical plot is already stored
+    fingerprint = get_plot_fingerprint(
+        stock_name, from_date, to_date, stored_data, news
+    )
+    if plot_storage.has_plot(fingerprint):
+        plot_storage.link_plot(stock_name, from_date, to_date, fingerprint)
+        return {"message": "Plot saved successfully in memory."}
+
+    fig = build_plot_figure(stock_name, stored_data, news)
+
+    # Render on the plot worker pool and convert to base64 string
+    image = render_pool.render(
+        fig, width=PLOT_WIDTH, height=PLOT_HEIGHT, scale=PLOT_SCALE
+    )
+    plot_base64 = base64.b64encode(image).decode()
 
     response = {"message": "Plot saved successfully in memory."}
 
     # Store the plot data
-    plot_storage.store_plot(stock_name, plot_base64)
+    plot_storage.store_plot(
+        stock_name, from_date, to_date, fingerprint, plot_base64
+    )
+    return response
+
+
+def normalize_closes(closes: pd.DataFrame) -> pd.DataFrame:
+    """Rebase each stock's closes to 100 at its first price in the range"""
+    return closes / closes.bfill().iloc[0] * 100
+
+
+def get_comparison_fingerprint(
+    plot_name: str, from_date: str, to_date: str, normalized: pd.DataFrame
+) -> str:
+    """Hash everything that affects a rendered comparison plot"""
+    digest = hashlib.sha256()
+    digest.update(
+        json.dumps(
+            [
+                "comparison",
+                plot_name,
+                from_date,
+                to_date,
+                PLOT_LAYOUT_VERSION,
+                PLOT_WIDTH,
+                PLOT_HEIGHT,
+                PLOT_SCALE,
+            ]
+        ).encode()
+    )
+    digest.update(normalized.index.values.tobytes())
+    digest.update(normalized.to_numpy(dtype="f8").tobytes())
+    return digest.hexdigest()
+
+
+def build_comparison_figure(normalized: pd.DataFrame) -> go.Figure:
+    """Build the chart of rebased closes for plot_comparison"""
+    fig = go.Figure()
+
+    # One line per stock; days a stock did not trade are bridged
+    for stock_name in normalized.columns:
+        fig.add_trace(
+            go.Scatter(
+                x=normalized.index,
+                y=normalized[stock_name].to_numpy(),
+                mode="lines",
+                name=stock_name,
+                line=dict(width=2),
+                connectgaps=True,
+            )
+        )
+
+    # The common starting value
+    fig.add_hline(y=100, line=dict(color="grey", width=1, dash="dot"))
+
+    fig.update_layout(
+        title=dict(
+            text=f"Stock Price Comparison - {', '.join(normalized.columns)}",
+            x=0.5,
+            y=0.95,
+            xanchor="center",
+            yanchor="top",
+            font=dict(size=20),
+        ),
+        xaxis=dict(
+            title="Date", tickangle=45, gridcolor="lightgrey", showgrid=True
+        ),
+        yaxis=dict(
+            title="Price (first day = 100)",
+            gridcolor="lightgrey",
+            showgrid=True,
+        ),
+        plot_bgcolor="white",
+        hovermode="x unified",
+        hoverlabel=dict(bgcolor="white", font_size=12, font_family="Rockwell"),
+        margin=dict(t=100, b=100),
+    )
+    return fig
+
+
+def plot_comparison(
+    stock_names: List[str], from_date: str, to_date: str
+) -> Dict[str, Any]:
+    """Create one chart comparing the price moves of several stocks
+
+    Each stock's closes are rebased to 100 at its first day in the range.
+    The plot is stored under the stocks joined by commas (the returned
+    stock_name), which send_email accepts to attach it.
+    """
+    stock_names = parse_stock_names(stock_names)
+    series, failed = load_price_series_batch(stock_names, to_date)
+    closes = align_closes(series, stock_names, from_date, to_date)
+    if closes.empty:
+        return {
+            "message": "No data available for the specified date range",
+            "missing": failed,
+        }
+
+    normalized = normalize_closes(closes)
+    plot_name = ",".join(closes.columns)
+    response = {
+        "message": "Plot saved successfully in memory.",
+        "stock_name": plot_name,
+        "missing": failed,
+    }
+
+    # Skip rendering when an identical plot is already stored
+    fingerprint = get_comparison_fingerprint(
+        plot_name, from_date, to_date, normalized
+    )
+    if plot_storage.has_plot(fingerprint):
+        plot_storage.link_plot(plot_name, from_date, to_date, fingerprint)
+        return response
+
+    fig = build_comparison_figure(normalized)
+
+    # Render on the plot worker pool and convert to base64 string
+    image = render_pool.render(
+        fig, width=PLOT_WIDTH, height=PLOT_HEIGHT, scale=PLOT_SCALE
+    )
+    plot_storage.store_plot(
+        plot_name,
+        from_date,
+        to_date,
+        fingerprint,
+        base64.b64encode(image).decode(),
+    )
     return response
 
 
@@ -491,30 +1706,392 @@ def function_caller(func_name: str, params: Dict[str, Any]) -> Any:
     function_map = {
         "get_stock_news": get_stock_news,
         "get_stock_price": get_stock_price,
+        "get_stock_prices": get_stock_prices,
+        "get_indicators": get_indicators,
         "plot_graph": plot_graph,
+        "plot_comparison": plot_comparison,
         "send_email": send_email,
     }
 
     if func_name in function_map:
-        return function_map[func_name](**params)
+        with metrics.timer(f"function_latency_seconds:{func_name}"):
+            return function_map[func_name](**params)
     else:
         raise ValueError(f"Function {func_name} not found")
 
 
+def get_prefetch_range() -> Tuple[str, str]:
+    """Date range of the default plot, ending today in market time"""
+    to_date = prefetcher.now().date()
+    from_date = to_date - timedelta(days=prefetch_range_days)
+    return from_date.strftime("%Y-%m-%d"), to_date.strftime("%Y-%m-%d")
+
+
+def plan_prefetch(stock_name: str) -> Dict[str, int]:
+    """Count the upstream calls refreshing a symbol would make"""
+    from_date, to_date = get_prefetch_range()
+    covering = price_storage.get_covering_series(stock_name, to_date)
+    price_calls = 0 if covering is not None else 1
+    news_calls = sum(
+        len(split_into_windows(span_from, span_to, news_window_days))
+        for span_from, span_to in news_storage.get_missing_spans(
+            stock_name, from_date, to_date
+        )
+    )
+    return {"alpha_vantage": price_calls, "finnhub": news_calls}
+
+
+def prefetch_symbol(stock_name: str) -> Dict[str, Any]:
+    """Warm a symbol's prices, news and default plot"""
+    from_date, to_date = get_prefetch_range()
+    # Background priority leaves part of each quota to interactive calls
+    with priority_class(BACKGROUND):
+        if not get_stock_price(stock_name, from_date, to_date):
+            raise RuntimeError("No prices returned")
+        if get_stock_news(stock_name, from_date, to_date) is False:
+            raise RuntimeError("Fetching news failed")
+        plot_graph(stock_name, from_date, to_date)
+    _, fetched_on = price_storage.get_series(stock_name)
+    return {
+        "prices_fetched_on": fetched_on,
+        "news_through": to_date,
+        "plot": plot_storage.get_plot(stock_name, from_date, to_date)
+        is not None,
+        "range": [from_date, to_date],
+    }
+
+
+prefetcher = Prefetcher(
+    redis_client,
+    prefetch_watchlist,
+    plan_prefetch,
+    prefetch_symbol,
+    budgets={
+        "alpha_vantage": prefetch_max_price_calls,
+        "finnhub": prefetch_max_news_calls,
+    },
+    run_at=datetime.strptime(prefetch_time, "%H:%M").time(),
+    timezone=prefetch_timezone,
+)
+
+
+# Every function in function_map does blocking Redis, HTTP, kaleido or
+# Gmail I/O, so calls are dispatched to a bounded worker thread pool to keep
+# the event loop free to accept other clients while one call is in flight.
+call_function_limiter = anyio.CapacityLimiter(call_function_threads)
+
+
+# Jobs run function_caller in their own processes; each renders plots
+# on a single kaleido worker rather than a full pool per job process, and
+# job status streams poll Redis on the same thread pool
+job_queue = JobQueue(
+    redis_client,
+    redis_url,
+    function_caller,
+    job_workers,
+    result_ttl=job_result_ttl,
+    job_ttl=job_ttl,
+    worker_env={"RENDER_WORKERS": "1"},
+    limiter=call_function_limiter,
+)
+
+
+async def call_function_async(func_name: str, params: Dict[str, Any]) -> Any:
+    """Run function_caller off the event loop"""
+    return await anyio.to_thread.run_sync(
+        lambda: function_caller(func_name, params),
+        limiter=call_function_limiter,
+    )
+
+
+@app.on_event("startup")
+def start_l1_cache():
+    # Decoded values are only served from memory once invalidations from
+    # other workers are being received
+    l1_cache.start()
+
+
+@app.on_event("shutdown")
+def stop_l1_cache():
+    l1_cache.stop()
+
+
+@app.on_event("startup")
+def start_render_pool():
+    # Warm the kaleido workers before the first plot_graph call
+    render_pool.start()
+
+
+@app.on_event("shutdown")
+def stop_render_pool():
+    render_pool.shutdown()
+
+
+@app.on_event("startup")
+def start_email_outbox():
+    email_outbox.start()
+
+
+@app.on_event("shutdown")
+def stop_email_outbox():
+    email_outbox.stop()
+
+
+@app.on_event("shutdown")
+def stop_job_queue():
+    job_queue.shutdown()
+
+
+@app.on_event("shutdown")
+def close_upstream_clients():
+    for client in (ts, finnhub_client):
+        upstream = getattr(client, "upstream", None)
+        if upstream is not None:
+            upstream.close()
+
+
+@app.on_event("startup")
+def start_prefetcher():
+    prefetcher.start()
+
+
+@app.on_event("shutdown")
+def stop_prefetcher():
+    prefetcher.stop()
+
+
+def check_price_encoding(price_encoding: str):
+    if price_encoding != "list" and price_encoding not in PRICE_ENCODINGS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown price encoding {price_encoding}",
+        )
+
+
+def encode_result(func_name: str, result: Any, price_encoding: str) -> Any:
+    """Pack get_stock_price results when a compact encoding was asked for"""
+    if func_name == "get_stock_price" and price_encoding in PRICE_ENCODINGS:
+        return encode_price_array(result, price_encoding)
+    return result
+
+
 @app.post("/call_function")
-async def call_function(request: FunctionCall):
+async def call_function(request: FunctionCall, price_encoding: str = "list"):
+    """Call a function; price_encoding "delta" or "f32" packs price lists"""
+    check_price_encoding(price_encoding)
     try:
-        result = function_caller(request.func_name, request.params)
+        result = await call_function_async(request.func_name, request.params)
         if result is None or result == "" or result == []:
             raise HTTPException(
                 status_code=500,
                 detail=f"No result from function {request.func_name}",
             )
-        return {"status": "success", "result": result}
+        return FastJSONResponse(
+            {
+                "status": "success",
+                "result": encode_result(
+                    request.func_name, result, price_encoding
+                ),
+            }
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def get_batch_order(calls: List[BatchFunctionCall]) -> List[str]:
+    """Validate batch dependencies and return call ids in a runnable order"""
+    ids = [call.id for call in calls]
+    if len(set(ids)) != len(ids):
+        raise ValueError("Call ids in a batch must be unique")
+    depends_on = {call.id: call.depends_on for call in calls}
+    for call_id, dependencies in depends_on.items():
+        unknown = set(dependencies) - depends_on.keys()
+        if unknown:
+            raise ValueError(
+                f"Call {call_id} depends on unknown calls {sorted(unknown)}"
+            )
+
+    order, visiting, done = [], set(), set()
+
+    def visit(call_id: str):
+        if call_id in done:
+            return
+        if call_id in visiting:
+            raise ValueError(f"Dependency cycle through call {call_id}")
+        visiting.add(call_id)
+        for dependency in depends_on[call_id]:
+            visit(dependency)
+        visiting.discard(call_id)
+        done.add(call_id)
+        order.append(call_id)
+
+    for call_id in ids:
+        visit(call_id)
+    return order
+
+
+@app.post("/call_functions")
+async def call_functions(request: BatchRequest, price_encoding: str = "list"):
+    """Run a batch of calls, independent ones concurrently
+
+    Each call starts as soon as the calls it depends on have succeeded.
+    Results come back in request order, with per-call errors instead of
+    failing the whole batch.
+    """
+    check_price_encoding(price_encoding)
+    calls = request.calls
+    for index, call in enumerate(calls):
+        if call.id is None:
+            call.id = str(index)
+    try:
+        order = get_batch_order(calls)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    by_id = {call.id: call for call in calls}
+    tasks: Dict[str, asyncio.Task] = {}
+
+    async def run(call: BatchFunctionCall) -> Any:
+        for dependency in call.depends_on:
+            try:
+                await tasks[dependency]
+            except Exception:
+                raise RuntimeError(f"Dependency {dependency} failed")
+        result = await call_function_async(call.func_name, call.params)
+        if result is None or result == "" or result == []:
+            raise RuntimeError(f"No result from function {call.func_name}")
+        return result
+
+    # Dependencies are created first so every call can await their tasks
+    for call_id in order:
+        tasks[call_id] = asyncio.create_task(run(by_id[call_id]))
+    await asyncio.gather(*tasks.values(), return_exceptions=True)
+
+    results = []
+    for call in calls:
+        task = tasks[call.id]
+        if task.exception() is None:
+            results.append(
+                {
+                    "id": call.id,
+                    "status": "success",
+                    "result": encode_result(
+                        call.func_name, task.result(), price_encoding
+                    ),
+                }
+            )
+        else:
+            results.append(
+                {
+                    "id": call.id,
+                    "status": "error",
+                    "error": str(task.exception()),
+                }
+            )
+    return FastJSONResponse({"status": "success", "results": results})
+
+
+@app.post("/jobs")
+async def submit_job(request: FunctionCall):
+    """Queue a long-running call and return its job id right away"""
+    # Job worker processes share state with the server through Redis
+    if not redis_available:
+        raise HTTPException(
+            status_code=503, detail="Background jobs need Redis"
+        )
+    try:
+        job_id = await anyio.to_thread.run_sync(
+            job_queue.submit, request.func_name, request.params
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return {"status": "queued", "job_id": job_id}
+
+
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    job = await anyio.to_thread.run_sync(job_queue.get_status, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job id")
+    return job
+
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """Stream a job's status changes as server-sent events"""
+
+    async def events():
+        async for job in job_queue.watch(job_id):
+            yield f"event: {job['status']}\ndata: {json.dumps(job)}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@app.get("/outbox/{message_id}")
+async def outbox_status(message_id: str):
+    status = await anyio.to_thread.run_sync(email_outbox.get_status, message_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Unknown message id")
+    return status
+
+
+@app.get("/prefetch")
+async def prefetch_status():
+    """Watchlist freshness and when the next prefetch run is due"""
+    return {
+        "watchlist": prefetcher.watchlist,
+        "next_run": await anyio.to_thread.run_sync(prefetcher.next_run),
+        "symbols": await anyio.to_thread.run_sync(prefetcher.get_status),
+    }
+
+
+def render_metrics() -> str:
+    """Update the gauges read from storage and render every metric"""
+    counters = metrics.get_counters()
+    for store, size in cache_policy.get_bytes().items():
+        metrics.set_gauge(f"cache_bytes:{store}", size)
+    for store in ("news", "prices", "indicators", "plots"):
+        hits = counters.get(f"cache_hits:{store}", 0)
+        lookups = hits + counters.get(f"cache_misses:{store}", 0)
+        metrics.set_gauge(
+            f"cache_hit_ratio:{store}", hits / lookups if lookups else 0.0
+        )
+    metrics.set_gauge("render_queue_depth", render_pool.queue_depth)
+    metrics.set_gauge("l1_bytes", l1_cache.get_bytes())
+    metrics.set_gauge(f"storage_backend:{storage_backend}", 1)
+    metrics.set_gauge("storage_degraded", int(storage_degraded))
+    return metrics.render_prometheus()
+
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Metrics of this server process in the Prometheus text format"""
+    # Cache sizes are read from Redis, off the event loop
+    body = await anyio.to_thread.run_sync(render_metrics)
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4")
+
+
+def get_stats() -> Dict[str, float]:
+    """Counters of this server process with cache sizes and news savings"""
+    counters = metrics.get_counters()
+    for store, size in cache_policy.get_bytes().items():
+        counters[f"cache_bytes:{store}"] = size
+    news_requests = counters.get("news_requests", 0)
+    # Share of get_stock_news calls that did not need a Finnhub request
+    # (news_upstream_calls counts the windows fetched, several per call)
+    counters["news_upstream_call_reduction"] = (
+        1 - counters.get("news_upstream_requests", 0) / news_requests
+        if news_requests
+        else 0.0
+    )
+    return counters
+
+
+@app.get("/stats")
+async def stats():
+    return await anyio.to_thread.run_sync(get_stats)
+
+
 if __name__ == "__main__":
     import uvicorn
 
@@ -0,0 +1,141 @@
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from redis.exceptions import LockError
+
+import metrics
+
+
+class _Call:
+    """An in-flight fetch that local waiters block on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Coalesce concurrent upstream fetches of the same key
+
+    Inside a process, callers that miss on a key while a fetch for it is in
+    flight wait for that fetch and receive its result. Across processes, the
+    fetching caller holds a Redis lease on the key; callers in other workers
+    wait for the lease to be released and then read the fetched value back
+    from the cache instead of calling the upstream API themselves. The lease
+    is extended every third of lease_seconds while the fetch runs, since a
+    fetch may wait for rate-limit tokens and retry slow upstream calls.
+    """
+
+    def __init__(
+        self,
+        redis_client,
+        lease_seconds: float = 30,
+        poll_interval: float = 0.05,
+    ):
+        self.redis = redis_client
+        self.prefix = "singleflight:"
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+
+    def do(
+        self,
+        key: str,
+        fetch: Callable[[], Any],
+        load: Callable[[], Any],
+    ) -> Any:
+        """Return fetch() for key, running it at most once at a time
+
+        fetch must write its result to the cache; load reads it back and
+        returns None while it is not there.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            metrics.increment("singleflight_local_waits")
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = self._fetch_with_lease(key, fetch, load)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def _fetch_with_lease(
+        self,
+        key: str,
+        fetch: Callable[[], Any],
+        load: Callable[[], Any],
+    ) -> Any:
+        """Fetch under a Redis lease, or wait for the worker holding it"""
+        name = f"{self.prefix}{key}"
+        while True:
+            # Not thread-local: the keep-alive thread extends it
+            lease = self.redis.lock(
+                name,
+                timeout=self.lease_seconds,
+                blocking=False,
+                thread_local=False,
+            )
+            if lease.acquire():
+                stop = self._keep_alive(lease)
+                try:
+                    return fetch()
+                finally:
+                    stop.set()
+                    self._release(lease)
+
+            # Another worker is fetching: wait until its lease is released
+            # or expires, then use what it stored
+            metrics.increment("singleflight_remote_waits")
+            deadline = time.monotonic() + self.lease_seconds
+            while self.redis.exists(name) and time.monotonic() < deadline:
+                time.sleep(self.poll_interval)
+
+            result = load()
+            if result is not None:
+                return result
+
+    def _keep_alive(self, lease) -> threading.Event:
+        """Extend the lease until the returned event is set"""
+        stop = threading.Event()
+
+        def renew():
+            while not stop.wait(self.lease_seconds / 3):
+                try:
+                    lease.reacquire()
+                except LockError:
+                    # Lost, e.g. the worker stalled past the expiry: others
+                    # may fetch too, which only costs a duplicate call
+                    metrics.increment("singleflight_leases_lost")
+                    return
+
+        threading.Thread(
+            target=renew, name="singleflight-lease", daemon=True
+        ).start()
+        return stop
+
+    def _release(self, lease):
+        """Release the lease, which may already have expired"""
+        try:
+            lease.release()
+        except LockError as e:
+            # The value is stored already, so the call still succeeded
+            metrics.increment("singleflight_leases_lost")
+            logging.warning(f"Single-flight lease lost: {str(e)}")
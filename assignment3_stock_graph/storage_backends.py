@@ -0,0 +1,998 @@
+import abc
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from redis.exceptions import LockNotOwnedError
+
+REDIS = "redis"
+MEMORY = "memory"
+SQLITE = "sqlite"
+BACKENDS = (REDIS, MEMORY, SQLITE)
+
+# Commands that only read, so a pipeline made of them needs no write lock
+READ_COMMANDS = frozenset(
+    {
+        "get",
+        "exists",
+        "getrange",
+        "hget",
+        "hmget",
+        "hgetall",
+        "zscore",
+        "zrange",
+        "zrangebyscore",
+        "zcard",
+        "lrange",
+    }
+)
+
+
+def _key(key) -> str:
+    return key.decode() if isinstance(key, bytes) else str(key)
+
+
+def _bytes(value) -> bytes:
+    """Encode a value the way redis-py sends it to the server"""
+    if isinstance(value, bytes):
+        return value
+    if isinstance(value, (bytearray, memoryview)):
+        return bytes(value)
+    if isinstance(value, float):
+        return repr(value).encode()
+    return str(value).encode()
+
+
+def _score(value) -> float:
+    """Parse a score or bound such as 1.5, "-inf" or "+inf" """
+    return float(value.decode() if isinstance(value, bytes) else value)
+
+
+def _stop_index(end: int, length: int) -> int:
+    """Exclusive slice end of an inclusive Redis index (-1 is the last)"""
+    return length + end + 1 if end < 0 else end + 1
+
+
+class Pipeline:
+    """Commands queued on a local backend and run together by execute"""
+
+    def __init__(self, backend: "LocalBackend"):
+        self.backend = backend
+        self._commands: List[Tuple[Callable, tuple, dict]] = []
+
+    def __getattr__(self, name: str):
+        command = getattr(self.backend, name)
+
+        def queue(*args, **kwargs):
+            self._commands.append((command, args, kwargs))
+            return self
+
+        return queue
+
+    def queue(self, function: Callable, *args):
+        self._commands.append((function, args, {}))
+
+    def execute(self) -> List[Any]:
+        commands, self._commands = self._commands, []
+        write = any(
+            command.__name__ not in READ_COMMANDS for command, _, _ in commands
+        )
+        with self.backend.transaction(write=write):
+            return [
+                command(*args, **kwargs) for command, args, kwargs in commands
+            ]
+
+
+class LocalScript:
+    """Python stand-in for a Lua script, run atomically on a local backend"""
+
+    def __init__(self, backend: "LocalBackend", function: Callable):
+        self.backend = backend
+        self.function = function
+
+    def __call__(self, keys=(), args=(), client=None):
+        if isinstance(client, Pipeline):
+            client.queue(self.run, keys, args)
+            return client
+        return self.run(keys, args)
+
+    def run(self, keys, args):
+        with self.backend.transaction(write=True):
+            return self.function(self.backend, list(keys), list(args))
+
+
+class LocalBackend(abc.ABC):
+    """Redis commands used by the stores, served without a Redis server
+
+    Implements the subset of the redis-py client API that the news, price
+    and plot stores and the cache policy call, returning values the way
+    redis-py does without decode_responses. Pipelines run their commands in
+    one transaction, and Lua scripts are replaced by Python functions (see
+    register_script).
+    """
+
+    name = ""
+
+    def ping(self) -> bool:
+        return True
+
+    def pipeline(self, transaction: bool = True) -> Pipeline:
+        return Pipeline(self)
+
+    @abc.abstractmethod
+    def transaction(self, write: bool = True):
+        """Context manager running the block's commands atomically"""
+
+    def close(self):
+        pass
+
+    def lock(self, name, timeout: float = None, blocking: bool = True, **_):
+        return _Lease(self, _key(name), timeout)
+
+
+def register_script(client, script: str, function: Callable):
+    """Register a Lua script, or its Python version on a local backend
+
+    function(client, keys, args) must do what the script does through the
+    client's commands; local backends run it as one transaction.
+    """
+    if isinstance(client, LocalBackend):
+        return LocalScript(client, function)
+    return client.register_script(script)
+
+
+class _Lease:
+    """Lease on a key of a local backend, like redis-py's Lock"""
+
+    def __init__(self, backend: "LocalBackend", name: str, timeout: float):
+        self.backend = backend
+        self.name = name
+        self.timeout = timeout
+        self.token = uuid.uuid4().hex.encode()
+
+    def acquire(self, blocking: bool = None) -> bool:
+        px = int(self.timeout * 1000) if self.timeout else None
+        return bool(self.backend.set(self.name, self.token, px=px, nx=True))
+
+    def _owned(self) -> bool:
+        return self.backend.get(self.name) == self.token
+
+    def reacquire(self):
+        """Reset the lease's expiry to timeout, if it is still held"""
+        with self.backend.transaction():
+            if not self._owned():
+                raise LockNotOwnedError(f"Lease {self.name} is not owned")
+            if self.timeout:
+                self.backend.pexpire(self.name, int(self.timeout * 1000))
+
+    def release(self):
+        with self.backend.transaction():
+            if not self._owned():
+                raise LockNotOwnedError(f"Lease {self.name} is not owned")
+            self.backend.delete(self.name)
+
+
+class MemoryBackend(LocalBackend):
+    """Keys held in this process's memory and lost when it exits
+
+    Also serves the lists, expiries and leases the rate limiter,
+    single-flight, outbox and prefetcher use, so a single process runs
+    without Redis at all.
+    """
+
+    name = MEMORY
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._data: Dict[str, Any] = {}
+        self._expires: Dict[str, float] = {}
+
+    @contextmanager
+    def transaction(self, write: bool = True):
+        with self._lock:
+            yield self
+
+    def _get(self, key, kind: type = None):
+        """The live value of a key, None if missing or expired"""
+        key = _key(key)
+        expires_at = self._expires.get(key)
+        if expires_at is not None and expires_at <= time.time():
+            del self._expires[key]
+            self._data.pop(key, None)
+        value = self._data.get(key)
+        if (
+            value is not None
+            and kind is not None
+            and not isinstance(value, kind)
+        ):
+            raise TypeError(
+                f"WRONGTYPE Operation against a key holding the wrong kind "
+                f"of value: {key}"
+            )
+        return value
+
+    def _container(self, key, kind: type):
+        """The value of a key, created empty if missing"""
+        value = self._get(key, kind)
+        if value is None:
+            value = self._data[_key(key)] = kind()
+        return value
+
+    def _drop_empty(self, key):
+        """Remove a key whose hash, sorted set or list became empty"""
+        key = _key(key)
+        if not self._data.get(key, True):
+            del self._data[key]
+            self._expires.pop(key, None)
+
+    # Strings and bitmaps
+
+    def get(self, key) -> Optional[bytes]:
+        with self._lock:
+            value = self._get(key, (bytes, bytearray))
+            return bytes(value) if value is not None else None
+
+    def set(self, key, value, ex=None, px=None, nx=False, xx=False):
+        with self._lock:
+            exists = self._get(key) is not None
+            if (nx and exists) or (xx and not exists):
+                return None
+            key = _key(key)
+            self._data[key] = _bytes(value)
+            if ex or px:
+                self._expires[key] = time.time() + (ex or px / 1000)
+            else:
+                self._expires.pop(key, None)
+            return True
+
+    def getrange(self, key, start: int, end: int) -> bytes:
+        with self._lock:
+            value = self._get(key, (bytes, bytearray)) or b""
+            return bytes(value[start : _stop_index(end, len(value))])
+
+    def setbit(self, key, offset: int, value: int) -> int:
+        with self._lock:
+            bitmap = self._get(key, (bytes, bytearray))
+            bitmap = bytearray(bitmap or b"")
+            index, bit = divmod(offset, 8)
+            if index >= len(bitmap):
+                bitmap.extend(b"\0" * (index + 1 - len(bitmap)))
+            mask = 0x80 >> bit
+            old = 1 if bitmap[index] & mask else 0
+            if value:
+                bitmap[index] |= mask
+            else:
+                bitmap[index] &= ~mask
+            self._data[_key(key)] = bitmap
+            return old
+
+    # Keys
+
+    def exists(self, *keys) -> int:
+        with self._lock:
+            return sum(self._get(key) is not None for key in keys)
+
+    def delete(self, *keys) -> int:
+        with self._lock:
+            deleted = 0
+            for key in keys:
+                if self._get(key) is not None:
+                    del self._data[_key(key)]
+                    self._expires.pop(_key(key), None)
+                    deleted += 1
+            return deleted
+
+    def expire(self, key, seconds: float) -> bool:
+        return self.pexpire(key, seconds * 1000)
+
+    def pexpire(self, key, milliseconds: float) -> bool:
+        with self._lock:
+            if self._get(key) is None:
+                return False
+            self._expires[_key(key)] = time.time() + milliseconds / 1000
+            return True
+
+    # Hashes
+
+    def hget(self, key, field) -> Optional[bytes]:
+        with self._lock:
+            return (self._get(key, dict) or {}).get(_bytes(field))
+
+    def hmget(self, key, keys, *args) -> List[Optional[bytes]]:
+        fields = [keys, *args] if isinstance(keys, (str, bytes)) else keys
+        with self._lock:
+            value = self._get(key, dict) or {}
+            return [value.get(_bytes(field)) for field in fields]
+
+    def hgetall(self, key) -> Dict[bytes, bytes]:
+        with self._lock:
+            return dict(self._get(key, dict) or {})
+
+    def hset(self, key, field=None, value=None, mapping=None) -> int:
+        items = dict(mapping or {})
+        if field is not None:
+            items[field] = value
+        with self._lock:
+            fields = self._container(key, dict)
+            added = 0
+            for name, item in items.items():
+                name = _bytes(name)
+                added += name not in fields
+                fields[name] = _bytes(item)
+            return added
+
+    def hdel(self, key, *fields) -> int:
+        with self._lock:
+            value = self._get(key, dict) or {}
+            deleted = sum(
+                value.pop(_bytes(field), None) is not None for field in fields
+            )
+            self._drop_empty(key)
+            return deleted
+
+    def hincrby(self, key, field, amount: int = 1) -> int:
+        with self._lock:
+            fields = self._container(key, dict)
+            total = int(fields.get(_bytes(field), 0)) + int(amount)
+            fields[_bytes(field)] = _bytes(total)
+            return total
+
+    # Sorted sets
+
+    def _sorted(self, key) -> List[Tuple[bytes, float]]:
+        members = self._get(key, dict) or {}
+        return sorted(members.items(), key=lambda item: (item[1], item[0]))
+
+    def _zset(self, key) -> Dict[bytes, float]:
+        return self._get(key, dict) or {}
+
+    def zadd(self, key, mapping, nx=False, xx=False) -> int:
+        with self._lock:
+            members = self._container(key, dict)
+            added = 0
+            for member, score in mapping.items():
+                member = _bytes(member)
+                exists = member in members
+                if (nx and exists) or (xx and not exists):
+                    continue
+                added += not exists
+                members[member] = _score(score)
+            self._drop_empty(key)
+            return added
+
+    def zincrby(self, key, amount: float, member) -> float:
+        with self._lock:
+            members = self._container(key, dict)
+            member = _bytes(member)
+            members[member] = members.get(member, 0.0) + _score(amount)
+            return members[member]
+
+    def zscore(self, key, member) -> Optional[float]:
+        with self._lock:
+            return self._zset(key).get(_bytes(member))
+
+    def zrem(self, key, *members) -> int:
+        with self._lock:
+            value = self._zset(key)
+            removed = sum(
+                value.pop(_bytes(member), None) is not None
+                for member in members
+            )
+            self._drop_empty(key)
+            return removed
+
+    def zcard(self, key) -> int:
+        with self._lock:
+            return len(self._zset(key))
+
+    def zrange(self, key, start: int, end: int, withscores=False) -> List:
+        with self._lock:
+            items = self._sorted(key)
+            items = items[start : _stop_index(end, len(items))]
+        return items if withscores else [member for member, _ in items]
+
+    def zrangebyscore(self, key, min, max, withscores=False) -> List:
+        low, high = _score(min), _score(max)
+        with self._lock:
+            items = [
+                (member, score)
+                for member, score in self._sorted(key)
+                if low <= score <= high
+            ]
+        return items if withscores else [member for member, _ in items]
+
+    def zremrangebyscore(self, key, min, max) -> int:
+        with self._lock:
+            members = self.zrangebyscore(key, min, max)
+            return self.zrem(key, *members) if members else 0
+
+    def zpopmin(self, key, count: int = 1) -> List[Tuple[bytes, float]]:
+        with self._lock:
+            items = self._sorted(key)[:count]
+            if items:
+                self.zrem(key, *(member for member, _ in items))
+            return items
+
+    # Lists
+
+    def rpush(self, key, *values) -> int:
+        with self._lock:
+            items = self._container(key, list)
+            items.extend(_bytes(value) for value in values)
+            return len(items)
+
+    def lpop(self, key, count: int = None):
+        with self._lock:
+            items = self._get(key, list)
+            if not items:
+                return None
+            popped = items[: count or 1]
+            del items[: count or 1]
+            self._drop_empty(key)
+            return popped if count is not None else popped[0]
+
+    def lmove(self, first_list, second_list, src="LEFT", dest="RIGHT"):
+        with self._lock:
+            items = self._get(first_list, list)
+            if not items:
+                return None
+            value = items.pop(0 if src.upper() == "LEFT" else -1)
+            self._drop_empty(first_list)
+            target = self._container(second_list, list)
+            if dest.upper() == "LEFT":
+                target.insert(0, value)
+            else:
+                target.append(value)
+            return value
+
+    def lrange(self, key, start: int, end: int) -> List[bytes]:
+        with self._lock:
+            items = self._get(key, list) or []
+            return list(items[start : _stop_index(end, len(items))])
+
+    def lrem(self, key, count: int, value) -> int:
+        with self._lock:
+            items = self._get(key, list)
+            if not items:
+                return 0
+            value = _bytes(value)
+            # A negative count removes from the tail, zero removes all
+            indexes = [i for i, item in enumerate(items) if item == value]
+            if count < 0:
+                indexes = indexes[count:]
+            elif count > 0:
+                indexes = indexes[:count]
+            for i in reversed(indexes):
+                del items[i]
+            self._drop_empty(key)
+            return len(indexes)
+
+
+_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS strings (
+        key TEXT PRIMARY KEY,
+        value BLOB NOT NULL,
+        expires_at REAL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS hashes (
+        key TEXT,
+        field BLOB,
+        value BLOB NOT NULL,
+        PRIMARY KEY (key, field)
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS zsets (
+        key TEXT,
+        member BLOB,
+        score REAL NOT NULL,
+        PRIMARY KEY (key, member)
+    ) WITHOUT ROWID
+    """,
+    "CREATE INDEX IF NOT EXISTS zsets_by_score ON zsets (key, score, member)",
+    """
+    CREATE TABLE IF NOT EXISTS lists (
+        key TEXT,
+        position INTEGER,
+        value BLOB NOT NULL,
+        PRIMARY KEY (key, position)
+    ) WITHOUT ROWID
+    """,
+    # Expiry of hashes, sorted sets and lists; strings keep their own
+    """
+    CREATE TABLE IF NOT EXISTS expiries (
+        key TEXT PRIMARY KEY,
+        expires_at REAL NOT NULL
+    )
+    """,
+)
+# Tables holding keys of the types that expire through the expiries table
+_EXPIRING_TABLES = ("hashes", "zsets", "lists")
+
+
+class SQLiteBackend(LocalBackend):
+    """Keys in a SQLite database file shared by the workers on one host
+
+    The database runs in WAL mode, so readers never wait for the writer,
+    and is memory-mapped so cached values are read straight from the page
+    cache. Writers lock the database with BEGIN IMMEDIATE, so the rate
+    limiter, leases, outbox and prefetch claim are shared by the workers as
+    they are on Redis. Expired strings are never returned; expired hashes,
+    sorted sets and lists are only deleted by the purge every
+    purge_interval seconds, which is soon enough for the cleanup TTLs set on
+    them. Each thread has its own connection.
+    """
+
+    name = SQLITE
+
+    def __init__(
+        self,
+        path: str,
+        mmap_bytes: int = 256 * 1024 * 1024,
+        busy_timeout: float = 5,
+        purge_interval: float = 60,
+    ):
+        self.path = path
+        self.mmap_bytes = mmap_bytes
+        self.busy_timeout = busy_timeout
+        self.purge_interval = purge_interval
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        self._last_purge = time.time()
+        with self.transaction() as connection:
+            for statement in _SCHEMA:
+                connection.execute(statement)
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            # Transactions are started explicitly, see transaction
+            connection = sqlite3.connect(
+                self.path,
+                timeout=self.busy_timeout,
+                isolation_level=None,
+                check_same_thread=False,
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            # Durable at checkpoints rather than every commit: a crash may
+            # lose the last writes, which are refetched as cache misses
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(f"PRAGMA mmap_size={int(self.mmap_bytes)}")
+            self._local.connection = connection
+            self._local.depth = 0
+            with self._connections_lock:
+                self._connections.append(connection)
+        return connection
+
+    @contextmanager
+    def transaction(self, write: bool = True):
+        """Run the block in one transaction, or in the enclosing one"""
+        connection = self._connection()
+        if self._local.depth:
+            self._local.depth += 1
+            try:
+                yield connection
+            finally:
+                self._local.depth -= 1
+            return
+        # Writers take the lock up front: upgrading a read transaction
+        # fails outright if another worker wrote in the meantime
+        connection.execute("BEGIN IMMEDIATE" if write else "BEGIN")
+        self._local.depth = 1
+        try:
+            yield connection
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        else:
+            connection.execute("COMMIT")
+        finally:
+            self._local.depth = 0
+
+    def close(self):
+        with self._connections_lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+    def _purge_expired(self, connection: sqlite3.Connection, now: float):
+        """Delete expired keys every purge_interval seconds"""
+        if now - self._last_purge >= self.purge_interval:
+            self._last_purge = now
+            connection.execute(
+                "DELETE FROM strings WHERE expires_at <= ?", (now,)
+            )
+            for table in _EXPIRING_TABLES:
+                connection.execute(
+                    f"DELETE FROM {table} WHERE key IN "
+                    "(SELECT key FROM expiries WHERE expires_at <= ?)",
+                    (now,),
+                )
+            connection.execute(
+                "DELETE FROM expiries WHERE expires_at <= ?", (now,)
+            )
+
+    # Strings and bitmaps
+
+    def get(self, key) -> Optional[bytes]:
+        row = (
+            self._connection()
+            .execute(
+                "SELECT value FROM strings WHERE key = ? "
+                "AND (expires_at IS NULL OR expires_at > ?)",
+                (_key(key), time.time()),
+            )
+            .fetchone()
+        )
+        return bytes(row[0]) if row else None
+
+    def set(self, key, value, ex=None, px=None, nx=False, xx=False):
+        now = time.time()
+        expires_at = now + (ex or px / 1000) if ex or px else None
+        with self.transaction() as connection:
+            if nx or xx:
+                exists = self.get(key) is not None
+                if (nx and exists) or (xx and not exists):
+                    return None
+            connection.execute(
+                "INSERT INTO strings (key, value, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET "
+                "value = excluded.value, expires_at = excluded.expires_at",
+                (_key(key), _bytes(value), expires_at),
+            )
+            self._purge_expired(connection, now)
+        return True
+
+    def getrange(self, key, start: int, end: int) -> bytes:
+        value = self.get(key) or b""
+        return value[start : _stop_index(end, len(value))]
+
+    def setbit(self, key, offset: int, value: int) -> int:
+        with self.transaction() as connection:
+            bitmap = bytearray(self.get(key) or b"")
+            index, bit = divmod(offset, 8)
+            if index >= len(bitmap):
+                bitmap.extend(b"\0" * (index + 1 - len(bitmap)))
+            mask = 0x80 >> bit
+            old = 1 if bitmap[index] & mask else 0
+            if value:
+                bitmap[index] |= mask
+            else:
+                bitmap[index] &= ~mask
+            connection.execute(
+                "INSERT INTO strings (key, value) VALUES (?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET value = excluded.value",
+                (_key(key), bytes(bitmap)),
+            )
+            return old
+
+    # Keys
+
+    def _exists(self, connection: sqlite3.Connection, key: str) -> bool:
+        return bool(
+            connection.execute(
+                "SELECT EXISTS (SELECT 1 FROM strings WHERE key = ? "
+                "AND (expires_at IS NULL OR expires_at > ?)) "
+                "OR EXISTS (SELECT 1 FROM hashes WHERE key = ?) "
+                "OR EXISTS (SELECT 1 FROM zsets WHERE key = ?) "
+                "OR EXISTS (SELECT 1 FROM lists WHERE key = ?)",
+                (key, time.time(), key, key, key),
+            ).fetchone()[0]
+        )
+
+    def exists(self, *keys) -> int:
+        connection = self._connection()
+        return sum(self._exists(connection, _key(key)) for key in keys)
+
+    def delete(self, *keys) -> int:
+        deleted = 0
+        with self.transaction() as connection:
+            for key in map(_key, keys):
+                deleted += self._exists(connection, key)
+                for table in ("strings", *_EXPIRING_TABLES, "expiries"):
+                    connection.execute(
+                        f"DELETE FROM {table} WHERE key = ?", (key,)
+                    )
+        return deleted
+
+    def expire(self, key, seconds: float) -> bool:
+        return self.pexpire(key, seconds * 1000)
+
+    def pexpire(self, key, milliseconds: float) -> bool:
+        now = time.time()
+        expires_at = now + milliseconds / 1000
+        key = _key(key)
+        with self.transaction() as connection:
+            if not self._exists(connection, key):
+                return False
+            updated = connection.execute(
+                "UPDATE strings SET expires_at = ? WHERE key = ?",
+                (expires_at, key),
+            ).rowcount
+            if not updated:
+                connection.execute(
+                    "INSERT INTO expiries (key, expires_at) VALUES (?, ?) "
+                    "ON CONFLICT (key) DO UPDATE SET "
+                    "expires_at = excluded.expires_at",
+                    (key, expires_at),
+                )
+            self._purge_expired(connection, now)
+            return True
+
+    # Hashes
+
+    def hget(self, key, field) -> Optional[bytes]:
+        row = (
+            self._connection()
+            .execute(
+                "SELECT value FROM hashes WHERE key = ? AND field = ?",
+                (_key(key), _bytes(field)),
+            )
+            .fetchone()
+        )
+        return bytes(row[0]) if row else None
+
+    def hmget(self, key, keys, *args) -> List[Optional[bytes]]:
+        fields = [keys, *args] if isinstance(keys, (str, bytes)) else keys
+        return [self.hget(key, field) for field in fields]
+
+    def hgetall(self, key) -> Dict[bytes, bytes]:
+        rows = (
+            self._connection()
+            .execute(
+                "SELECT field, value FROM hashes WHERE key = ?", (_key(key),)
+            )
+            .fetchall()
+        )
+        return {bytes(field): bytes(value) for field, value in rows}
+
+    def hset(self, key, field=None, value=None, mapping=None) -> int:
+        items = dict(mapping or {})
+        if field is not None:
+            items[field] = value
+        added = 0
+        with self.transaction() as connection:
+            for name, item in items.items():
+                added += self.hget(key, name) is None
+                connection.execute(
+                    "INSERT INTO hashes (key, field, value) VALUES (?, ?, ?) "
+                    "ON CONFLICT (key, field) DO UPDATE SET "
+                    "value = excluded.value",
+                    (_key(key), _bytes(name), _bytes(item)),
+                )
+        return added
+
+    def hdel(self, key, *fields) -> int:
+        with self.transaction() as connection:
+            return sum(
+                connection.execute(
+                    "DELETE FROM hashes WHERE key = ? AND field = ?",
+                    (_key(key), _bytes(field)),
+                ).rowcount
+                for field in fields
+            )
+
+    def hincrby(self, key, field, amount: int = 1) -> int:
+        with self.transaction():
+            total = int(self.hget(key, field) or 0) + int(amount)
+            self.hset(key, field, total)
+            return total
+
+    # Sorted sets
+
+    def zadd(self, key, mapping, nx=False, xx=False) -> int:
+        added = 0
+        with self.transaction() as connection:
+            for member, score in mapping.items():
+                exists = self.zscore(key, member) is not None
+                if (nx and exists) or (xx and not exists):
+                    continue
+                added += not exists
+                connection.execute(
+                    "INSERT INTO zsets (key, member, score) VALUES (?, ?, ?) "
+                    "ON CONFLICT (key, member) DO UPDATE SET "
+                    "score = excluded.score",
+                    (_key(key), _bytes(member), _score(score)),
+                )
+        return added
+
+    def zincrby(self, key, amount: float, member) -> float:
+        with self.transaction():
+            score = (self.zscore(key, member) or 0.0) + _score(amount)
+            self.zadd(key, {member: score})
+            return score
+
+    def zscore(self, key, member) -> Optional[float]:
+        row = (
+            self._connection()
+            .execute(
+                "SELECT score FROM zsets WHERE key = ? AND member = ?",
+                (_key(key), _bytes(member)),
+            )
+            .fetchone()
+        )
+        return row[0] if row else None
+
+    def zrem(self, key, *members) -> int:
+        with self.transaction() as connection:
+            return sum(
+                connection.execute(
+                    "DELETE FROM zsets WHERE key = ? AND member = ?",
+                    (_key(key), _bytes(member)),
+                ).rowcount
+                for member in members
+            )
+
+    def zcard(self, key) -> int:
+        return (
+            self._connection()
+            .execute("SELECT COUNT(*) FROM zsets WHERE key = ?", (_key(key),))
+            .fetchone()[0]
+        )
+
+    def _rows(self, rows, withscores: bool) -> List:
+        if withscores:
+            return [(bytes(member), score) for member, score in rows]
+        return [bytes(member) for member, _ in rows]
+
+    def zrange(self, key, start: int, end: int, withscores=False) -> List:
+        if start >= 0 and end >= 0:
+            limit, offset = end - start + 1, start
+        else:
+            # Negative indexes count from the end: slice the whole set
+            limit, offset = -1, 0
+        rows = (
+            self._connection()
+            .execute(
+                "SELECT member, score FROM zsets WHERE key = ? "
+                "ORDER BY score, member LIMIT ? OFFSET ?",
+                (_key(key), limit, offset),
+            )
+            .fetchall()
+        )
+        if limit < 0:
+            rows = rows[start : _stop_index(end, len(rows))]
+        return self._rows(rows, withscores)
+
+    def zrangebyscore(self, key, min, max, withscores=False) -> List:
+        rows = (
+            self._connection()
+            .execute(
+                "SELECT member, score FROM zsets WHERE key = ? "
+                "AND score BETWEEN ? AND ? ORDER BY score, member",
+                (_key(key), _score(min), _score(max)),
+            )
+            .fetchall()
+        )
+        return self._rows(rows, withscores)
+
+    def zremrangebyscore(self, key, min, max) -> int:
+        with self.transaction() as connection:
+            return connection.execute(
+                "DELETE FROM zsets WHERE key = ? AND score BETWEEN ? AND ?",
+                (_key(key), _score(min), _score(max)),
+            ).rowcount
+
+    def zpopmin(self, key, count: int = 1) -> List[Tuple[bytes, float]]:
+        with self.transaction():
+            items = self.zrange(key, 0, count - 1, withscores=True)
+            if items:
+                self.zrem(key, *(member for member, _ in items))
+            return items
+
+    # Lists, kept in order of position; pushing on the left takes a
+    # position below the first
+
+    def _end(self, key: str, left: bool) -> Optional[Tuple[int, bytes]]:
+        """Position and value at the head or tail of a list"""
+        row = (
+            self._connection()
+            .execute(
+                "SELECT position, value FROM lists WHERE key = ? "
+                f"ORDER BY position {'ASC' if left else 'DESC'} LIMIT 1",
+                (key,),
+            )
+            .fetchone()
+        )
+        return (row[0], bytes(row[1])) if row else None
+
+    def _push(self, key: str, value: bytes, left: bool):
+        end = self._end(key, left)
+        position = 0 if end is None else end[0] + (-1 if left else 1)
+        self._connection().execute(
+            "INSERT INTO lists (key, position, value) VALUES (?, ?, ?)",
+            (key, position, value),
+        )
+
+    def _pop(self, key: str, left: bool) -> Optional[bytes]:
+        end = self._end(key, left)
+        if end is None:
+            return None
+        self._connection().execute(
+            "DELETE FROM lists WHERE key = ? AND position = ?", (key, end[0])
+        )
+        return end[1]
+
+    def rpush(self, key, *values) -> int:
+        key = _key(key)
+        with self.transaction() as connection:
+            for value in values:
+                self._push(key, _bytes(value), left=False)
+            return connection.execute(
+                "SELECT COUNT(*) FROM lists WHERE key = ?", (key,)
+            ).fetchone()[0]
+
+    def lpop(self, key, count: int = None):
+        key = _key(key)
+        with self.transaction():
+            popped = []
+            for _ in range(count or 1):
+                value = self._pop(key, left=True)
+                if value is None:
+                    break
+                popped.append(value)
+        if not popped:
+            return None
+        return popped if count is not None else popped[0]
+
+    def lmove(self, first_list, second_list, src="LEFT", dest="RIGHT"):
+        with self.transaction():
+            value = self._pop(_key(first_list), src.upper() == "LEFT")
+            if value is not None:
+                self._push(_key(second_list), value, dest.upper() == "LEFT")
+            return value
+
+    def lrange(self, key, start: int, end: int) -> List[bytes]:
+        rows = (
+            self._connection()
+            .execute(
+                "SELECT value FROM lists WHERE key = ? ORDER BY position",
+                (_key(key),),
+            )
+            .fetchall()
+        )
+        return [
+            bytes(value) for value, in rows[start : _stop_index(end, len(rows))]
+        ]
+
+    def lrem(self, key, count: int, value) -> int:
+        key = _key(key)
+        with self.transaction() as connection:
+            # A negative count removes from the tail, zero removes all
+            positions = [
+                position
+                for position, in connection.execute(
+                    "SELECT position FROM lists WHERE key = ? AND value = ? "
+                    f"ORDER BY position {'DESC' if count < 0 else 'ASC'}",
+                    (key, _bytes(value)),
+                ).fetchall()
+            ]
+            if count:
+                positions = positions[: abs(count)]
+            for position in positions:
+                connection.execute(
+                    "DELETE FROM lists WHERE key = ? AND position = ?",
+                    (key, position),
+                )
+            return len(positions)
+
+
+def open_backend(
+    kind: str,
+    sqlite_path: str = "stock_cache.db",
+    sqlite_mmap_bytes: int = 256 * 1024 * 1024,
+) -> LocalBackend:
+    """Open a local storage backend by name"""
+    if kind == MEMORY:
+        return MemoryBackend()
+    if kind == SQLITE:
+        return SQLiteBackend(sqlite_path, mmap_bytes=sqlite_mmap_bytes)
+    raise ValueError(f"Unknown storage backend {kind}")
@@ -0,0 +1,78 @@
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+
+import numpy as np
+import pandas as pd
+
+
+class StubTimeSeries:
+    """Stand-in for alpha_vantage.timeseries.TimeSeries"""
+
+    def __init__(self, latency: float = 0.0, years: int = 20):
+        self.latency = latency
+        self.years = years
+        self.calls = 0
+
+    def get_daily(self, symbol: str, outputsize: str = "compact"):
+        """Return a synthetic daily series shaped like Alpha Vantage output"""
+        self.calls += 1
+        time.sleep(self.latency)
+        end = pd.Timestamp(datetime.now().date())
+        index = pd.bdate_range(end=end, periods=self.years * 252, name="date")
+        rng = np.random.default_rng(abs(hash(symbol)) % (2**32))
+        close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, len(index))))
+        data = pd.DataFrame(
+            {
+                "1. open": close * 0.995,
+                "2. high": close * 1.01,
+                "3. low": close * 0.99,
+                "4. close": close,
+                "5. volume": rng.integers(1e5, 1e7, len(index)).astype(float),
+            },
+            index=index,
+        ).round(2)
+        # Alpha Vantage returns the newest day first
+        return data.iloc[::-1], {"2. Symbol": symbol}
+
+
+class StubFinnhubClient:
+    """Stand-in for finnhub.Client"""
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        per_day: int = 3,
+        latency_per_day: float = 0.0,
+    ):
+        self.latency = latency
+        self.per_day = per_day
+        # Finnhub takes longer the more days a request spans
+        self.latency_per_day = latency_per_day
+        self.calls = 0
+
+    def company_news(
+        self, symbol: str, _from: str, to: str
+    ) -> List[Dict[str, Any]]:
+        """Return synthetic articles on weekdays between _from and to"""
+        self.calls += 1
+        news = []
+        current = datetime.strptime(_from, "%Y-%m-%d")
+        end = datetime.strptime(to, "%Y-%m-%d")
+        days = (end - current).days + 1
+        time.sleep(self.latency + self.latency_per_day * days)
+        while current <= end:
+            if current.weekday() < 5:
+                for i in range(self.per_day):
+                    news.append(
+                        {
+                            "datetime": int(
+                                (current + timedelta(hours=9 + i)).timestamp()
+                            ),
+                            "headline": f"{symbol} headline {i} on "
+                            f"{current:%Y-%m-%d}",
+                            "summary": "Lorem ipsum dolor sit amet. " * 8,
+                        }
+                    )
+            current += timedelta(days=1)
+        return news
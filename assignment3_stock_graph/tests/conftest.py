@@ -0,0 +1,18 @@
+import os
+import sys
+
+import pytest
+
+# The server modules are flat files next to this directory, and the
+# benchmarks' stubs import server.py offline
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+
+@pytest.fixture(scope="session")
+def server():
+    """server.py imported against fakeredis and stub upstream clients"""
+    from stubs import load_server
+
+    return load_server()
@@ -0,0 +1,116 @@
+from datetime import datetime, timedelta
+
+import fakeredis
+import numpy as np
+import pandas as pd
+import pytest
+
+from cache_policy import CachePolicy
+from indicators import (
+    DEFAULT_INDICATORS,
+    TRADING_DAYS,
+    compute_indicator,
+    parse_specs,
+)
+
+
+@pytest.fixture(scope="module")
+def closes():
+    rng = np.random.default_rng(7)
+    return 100 * np.exp(np.cumsum(rng.normal(0, 0.02, 500)))
+
+
+def wilder_rsi(closes: pd.Series, period: int) -> pd.Series:
+    changes = closes.diff()
+    gains = changes.clip(lower=0).to_numpy()
+    losses = (-changes).clip(lower=0).to_numpy()
+    values = np.full(len(closes), np.nan)
+    avg_gain = gains[1 : period + 1].mean()
+    avg_loss = losses[1 : period + 1].mean()
+    for t in range(period, len(closes)):
+        if t > period:
+            avg_gain += (gains[t] - avg_gain) / period
+            avg_loss += (losses[t] - avg_loss) / period
+        values[t] = (
+            100 if avg_loss == 0 else 100 - 100 / (1 + avg_gain / avg_loss)
+        )
+    return pd.Series(values)
+
+
+def reference(spec: str, closes: np.ndarray) -> np.ndarray:
+    """The indicator computed with plain pandas"""
+    series = pd.Series(closes)
+    name, *params = spec.split(":")
+    window = int(params[0]) if params else None
+    if name == "returns":
+        values = series.pct_change()
+    elif name == "sma":
+        values = series.rolling(window).mean()
+    elif name == "ema":
+        values = series.ewm(span=window, adjust=False).mean()
+    elif name == "rsi":
+        values = wilder_rsi(series, window)
+    elif name == "volatility":
+        log_returns = np.log(series).diff()
+        values = log_returns.rolling(window).std() * np.sqrt(TRADING_DAYS)
+    else:
+        values = series / series.cummax() - 1
+    return values.to_numpy()
+
+
+@pytest.mark.parametrize("spec", DEFAULT_INDICATORS + ("sma:50", "rsi:5"))
+def test_matches_pandas(spec, closes):
+    values, _ = compute_indicator(spec, closes)
+    np.testing.assert_allclose(
+        values, reference(spec, closes), rtol=1e-9, equal_nan=True
+    )
+
+
+@pytest.mark.parametrize("spec", DEFAULT_INDICATORS)
+@pytest.mark.parametrize("start", [1, 10, 250, 499])
+def test_appended_rows_match_full_compute(spec, start, closes):
+    full, _ = compute_indicator(spec, closes)
+    _, state = compute_indicator(spec, closes[:start])
+    appended, _ = compute_indicator(spec, closes, start, state)
+    np.testing.assert_allclose(
+        appended, full[start:], rtol=1e-9, equal_nan=True
+    )
+
+
+def test_parses_comma_separated_specs():
+    assert parse_specs("sma20, RSI:14,sma:20") == ["sma:20", "rsi:14"]
+    assert parse_specs(["ema", "drawdown"]) == ["ema:20", "drawdown"]
+    assert parse_specs(None) == list(DEFAULT_INDICATORS)
+    assert parse_specs("") == list(DEFAULT_INDICATORS)
+    with pytest.raises(ValueError):
+        parse_specs("sma,macd")
+
+
+def test_get_indicators_accepts_a_string(server):
+    to_date = datetime.now().date()
+    from_date = to_date - timedelta(days=30)
+    result = server.get_indicators(
+        "IND",
+        from_date.strftime("%Y-%m-%d"),
+        to_date.strftime("%Y-%m-%d"),
+        "sma20,rsi14",
+    )
+    assert list(result["indicators"]) == ["sma:20", "rsi:14"]
+
+
+def test_evicted_indicator_drops_its_state(server):
+    client = fakeredis.FakeRedis()
+    policy = CachePolicy(client, budget_bytes=1024**3, evict_batch=1)
+    storage = server.IndicatorStorage(client, policy=policy)
+    prices = pd.DataFrame({"4. close": np.linspace(100.0, 120.0, 50)})
+    storage.get_indicator("IND", "sma:20", prices)
+    storage.get_indicator("IND", "rsi:14", prices)
+    assert policy.get_bytes()["indicators"] > sum(
+        len(client.get(key)) for key in client.keys("indicators:IND:*")
+    )
+
+    policy.budget_bytes = 1
+    policy.enforce()
+    assert client.keys("indicators:IND:*") == []
+    assert client.hgetall("indicators_meta:IND") == {}
+    assert policy.get_bytes()["indicators"] == 0
@@ -0,0 +1,49 @@
+from concurrent.futures import Future
+
+import anyio
+import fakeredis
+
+from jobs import DONE, QUEUED, RUNNING, JobQueue
+
+
+class IdleExecutor:
+    """Accepts jobs without ever running them"""
+
+    def submit(self, *args):
+        return Future()
+
+
+def make_queue(**kwargs):
+    queue = JobQueue(fakeredis.FakeRedis(), "redis://", None, 1, **kwargs)
+    queue._get_executor = IdleExecutor
+    return queue
+
+
+def test_unfinished_job_expires():
+    queue = make_queue(job_ttl=600)
+    job_id = queue.submit("get_stock_price", {"stock_name": "AAPL"})
+    assert queue.get_status(job_id)["status"] == QUEUED
+    assert 0 < queue.redis.ttl(f"job:{job_id}") <= 600
+
+
+def test_watch_polls_on_the_shared_limiter():
+    limiter = anyio.CapacityLimiter(1)
+    queue = make_queue(limiter=limiter)
+    job_id = queue.submit("get_stock_price", {"stock_name": "AAPL"})
+
+    borrowed = []
+    statuses = iter([RUNNING, DONE])
+    get_status = queue.get_status
+
+    def polled_status(job_id):
+        borrowed.append(limiter.borrowed_tokens)
+        queue.redis.hset(f"job:{job_id}", "status", next(statuses))
+        return get_status(job_id)
+
+    queue.get_status = polled_status
+
+    async def watch():
+        return [job["status"] async for job in queue.watch(job_id, 0)]
+
+    assert anyio.run(watch) == [RUNNING, DONE]
+    assert borrowed == [1, 1]
@@ -0,0 +1,19 @@
+import asyncio
+from datetime import date, timedelta
+
+
+def test_call_reduction_counts_calls_not_windows(server, monkeypatch):
+    monkeypatch.setattr(server, "news_window_days", 10)
+    server.metrics.reset()
+    to_date = date.today() - timedelta(days=400)
+    from_date = (to_date - timedelta(days=45)).isoformat()
+    to_date = to_date.isoformat()
+
+    # The first call fetches several windows, the second is a cache hit
+    server.get_stock_news("STATS", from_date, to_date)
+    assert server.metrics.get_counters()["news_upstream_calls"] > 1
+    server.get_stock_news("STATS", from_date, to_date)
+
+    stats = asyncio.run(server.stats())
+    assert stats["news_upstream_requests"] == 1
+    assert stats["news_upstream_call_reduction"] == 0.5
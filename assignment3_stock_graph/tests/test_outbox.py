@@ -0,0 +1,133 @@
+import time
+
+import fakeredis
+import pytest
+
+from outbox import FAILED, QUEUED, SENT, Outbox, StubTransport
+from storage_backends import MemoryBackend, SQLiteBackend
+
+
+@pytest.fixture(params=["redis", "memory", "sqlite"])
+def client(request, tmp_path):
+    if request.param == "redis":
+        return fakeredis.FakeRedis()
+    if request.param == "sqlite":
+        return SQLiteBackend(str(tmp_path / "outbox.db"))
+    return MemoryBackend()
+
+
+def retry_now(client, message_id):
+    """Make a scheduled retry due without waiting out its backoff"""
+    client.zadd("outbox:retry", {message_id: 0})
+
+
+def test_sends_queued_message(client):
+    transport = StubTransport()
+    outbox = Outbox(client, transport)
+    message_id = outbox.enqueue("raw-1")
+
+    assert outbox.drain_once() == 1
+    assert transport.sent == ["raw-1"]
+    status = outbox.get_status(message_id)
+    assert status["status"] == SENT
+    assert status["gmail_id"] == "stub-1"
+    assert client.lrange("outbox:processing", 0, -1) == []
+
+
+def test_retries_then_sends(client):
+    transport = StubTransport(failures=1)
+    outbox = Outbox(client, transport)
+    message_id = outbox.enqueue("raw-1")
+
+    assert outbox.drain_once() == 0
+    status = outbox.get_status(message_id)
+    assert status["status"] == QUEUED
+    assert status["attempts"] == "1"
+    assert client.zscore("outbox:retry", message_id) is not None
+    assert outbox.drain_once() == 0
+
+    retry_now(client, message_id)
+    assert outbox.drain_once() == 1
+    assert outbox.get_status(message_id)["status"] == SENT
+    assert transport.sent == ["raw-1"]
+
+
+def test_gives_up_after_max_attempts(client):
+    transport = StubTransport(failures=3)
+    outbox = Outbox(client, transport, max_attempts=3)
+    message_id = outbox.enqueue("raw-1")
+
+    assert outbox.drain_once() == 0
+    for _ in range(2):
+        retry_now(client, message_id)
+        assert outbox.drain_once() == 0
+
+    status = outbox.get_status(message_id)
+    assert status["status"] == FAILED
+    assert status["attempts"] == "3"
+    assert status["error"] == "Stub send failure"
+    assert client.zscore("outbox:retry", message_id) is None
+    assert client.lrange("outbox:processing", 0, -1) == []
+    assert transport.sent == []
+
+
+def test_requeues_messages_of_a_crashed_sender(client):
+    class CrashingTransport:
+        def send_batch(self, raws):
+            raise SystemExit("worker killed mid-batch")
+
+    crashed = Outbox(client, CrashingTransport())
+    message_id = crashed.enqueue("raw-1")
+    with pytest.raises(SystemExit):
+        crashed.drain_once()
+    assert client.lrange("outbox:processing", 0, -1) == [message_id.encode()]
+    assert client.lrange("outbox:queue", 0, -1) == []
+
+    # Recently claimed ids may belong to a live sender and are left alone
+    transport = StubTransport()
+    restarted = Outbox(client, transport)
+    assert restarted.requeue_stale() == 0
+
+    restarted.processing_timeout = 0
+    assert restarted.requeue_stale() == 1
+    assert restarted.drain_once() == 1
+    assert transport.sent == ["raw-1"]
+    assert restarted.get_status(message_id)["status"] == SENT
+
+
+def test_attempts_and_status_are_recorded_together(client):
+    transport = StubTransport(failures=1)
+    outbox = Outbox(client, transport)
+    message_id = outbox.enqueue("raw-1")
+
+    class Crash(Exception):
+        pass
+
+    # A sender dying before the outcome is recorded leaves no trace of
+    # the attempt, and the message is still claimed for a retry
+    pipeline = client.pipeline
+
+    def crashing_pipeline(*args, **kwargs):
+        if kwargs.get("transaction", True) and transport.failures == 0:
+            raise Crash()
+        return pipeline(*args, **kwargs)
+
+    client.pipeline = crashing_pipeline
+    try:
+        with pytest.raises(Crash):
+            outbox.drain_once()
+    finally:
+        client.pipeline = pipeline
+    status = outbox.get_status(message_id)
+    assert status["attempts"] == "0"
+    assert status["status"] == QUEUED
+    assert client.lrange("outbox:processing", 0, -1) == [message_id.encode()]
+
+
+def test_due_retries_move_to_the_queue_once(client):
+    outbox = Outbox(client, StubTransport())
+    client.zadd("outbox:retry", {"a": 0, "b": 0, "later": time.time() + 60})
+    outbox._requeue_due_retries()
+    outbox._requeue_due_retries()
+    assert client.lrange("outbox:queue", 0, -1) == [b"a", b"b"]
+    assert client.zrangebyscore("outbox:retry", "-inf", "+inf") == [b"later"]
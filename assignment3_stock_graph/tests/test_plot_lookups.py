@@ -0,0 +1,25 @@
+from datetime import date, timedelta
+
+
+def test_plot_counts_one_prices_lookup(server, monkeypatch):
+    rendered = []
+    monkeypatch.setattr(
+        server.render_pool,
+        "render",
+        lambda figure, **_: rendered.append(figure) or b"png",
+    )
+    server.metrics.reset()
+    to_date = date.today() - timedelta(days=30)
+    from_date = (to_date - timedelta(days=20)).isoformat()
+    to_date = to_date.isoformat()
+
+    server.plot_graph("LOOKUPS", from_date, to_date)
+    counters = server.metrics.get_counters()
+    assert counters.get("cache_misses:prices") == 1
+    assert counters.get("cache_hits:prices", 0) == 0
+    assert len(rendered) == 1
+
+    server.plot_graph("LOOKUPS", from_date, to_date)
+    counters = server.metrics.get_counters()
+    assert counters.get("cache_misses:prices") == 1
+    assert counters.get("cache_hits:prices") == 1
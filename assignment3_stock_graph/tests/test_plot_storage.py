@@ -0,0 +1,55 @@
+import fakeredis
+
+from cache_policy import CachePolicy
+
+
+def make_storage(server, max_plots=2, budget_bytes=1024**3):
+    client = fakeredis.FakeRedis()
+    policy = CachePolicy(client, budget_bytes=budget_bytes, evict_batch=1)
+    return client, policy, server.PlotStorage(client, max_plots, policy=policy)
+
+
+def test_lru_eviction_stops_tracking_plot_bytes(server):
+    client, policy, storage = make_storage(server, max_plots=2)
+    for i in range(5):
+        storage.store_plot(
+            f"S{i}", "2024-01-01", "2024-01-31", f"fp{i}", "x" * 1000
+        )
+
+    live = client.keys("plot:fp:*")
+    assert len(live) == 2
+    assert policy.get_bytes()["plots"] == sum(
+        len(client.get(key)) for key in live
+    )
+    assert client.zcard("cache:access") == 2
+
+
+def test_policy_eviction_drops_plot_from_lru(server):
+    client, policy, storage = make_storage(
+        server, max_plots=10, budget_bytes=2500
+    )
+    for i in range(3):
+        storage.store_plot(
+            f"S{i}", "2024-01-01", "2024-01-31", f"fp{i}", "x" * 1000
+        )
+
+    live = {key.decode()[len("plot:fp:") :] for key in client.keys("plot:fp:*")}
+    indexed = {fp.decode() for fp in client.zrange("plot:lru", 0, -1)}
+    assert len(live) == 2
+    assert indexed == live
+
+
+def test_expired_plots_leave_the_lru(server):
+    client, policy, storage = make_storage(server, max_plots=2)
+    policy.store_ttls = {"plots": 60}
+    for fp in ("fp1", "fp0"):
+        storage.store_plot("S", "2024-01-01", "2024-01-31", fp, "x" * 1000)
+    client.zadd("cache:expiry", {"plot:fp:fp0": 0})
+    client.delete("plot:fp:fp0")
+
+    # The expired plot no longer counts towards max_plots, so storing
+    # another one keeps the older live plot
+    storage.store_plot("S", "2024-02-01", "2024-02-28", "fp2", "x" * 1000)
+    indexed = {fp.decode() for fp in client.zrange("plot:lru", 0, -1)}
+    assert indexed == {"fp1", "fp2"}
+    assert len(client.keys("plot:fp:*")) == 2
@@ -0,0 +1,30 @@
+import plotly.graph_objects as go
+import pytest
+
+from render_pool import RenderPool
+
+
+def test_failed_start_leaves_the_pool_stopped():
+    pool = RenderPool(workers=1, queue_size=0, timeout=0.001)
+    pool.start()
+    assert pool._executor is None
+
+
+def test_timed_out_render_replaces_the_workers():
+    pool = RenderPool(workers=1, queue_size=0, timeout=60)
+    pool.start()
+    try:
+        executor = pool._executor
+        processes = list(executor._processes.values())
+        figure = go.Figure(go.Scatter(x=list(range(5000)), y=list(range(5000))))
+        pool.timeout = 0.001
+        with pytest.raises(TimeoutError):
+            pool.render(figure)
+        for process in processes:
+            process.join(timeout=5)
+            assert not process.is_alive()
+        assert pool._executor is not executor
+        # The slot was released once the hung worker was gone
+        assert pool._slots.acquire(blocking=False)
+    finally:
+        pool.shutdown()
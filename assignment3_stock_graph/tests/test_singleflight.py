@@ -0,0 +1,54 @@
+import threading
+import time
+
+import fakeredis
+
+from singleflight import SingleFlight
+from storage_backends import MemoryBackend
+
+
+def slow_fetch(store, seconds):
+    def fetch():
+        time.sleep(seconds)
+        store["value"] = "fetched"
+        return "fetched"
+
+    return fetch
+
+
+def test_fetch_longer_than_lease_succeeds():
+    client = fakeredis.FakeRedis()
+    flight = SingleFlight(client, lease_seconds=0.3)
+    store = {}
+    result = flight.do(
+        "key", slow_fetch(store, 1.0), lambda: store.get("value")
+    )
+    assert result == "fetched"
+    assert not client.exists("singleflight:key")
+
+
+def test_lease_is_held_while_fetch_runs():
+    client = fakeredis.FakeRedis()
+    flight = SingleFlight(client, lease_seconds=0.3)
+    store = {}
+    fetching = threading.Thread(
+        target=flight.do,
+        args=("key", slow_fetch(store, 1.0), lambda: store.get("value")),
+    )
+    fetching.start()
+    time.sleep(0.7)
+    # Past the lease's first expiry another worker still sees it held
+    assert client.exists("singleflight:key")
+    fetching.join()
+
+
+def test_expired_lease_does_not_fail_the_call():
+    backend = MemoryBackend()
+    flight = SingleFlight(backend, lease_seconds=0.3)
+
+    def fetch():
+        # Lose the lease, as if the worker stalled past its expiry
+        backend.delete("singleflight:key")
+        return "fetched"
+
+    assert flight.do("key", fetch, lambda: None) == "fetched"
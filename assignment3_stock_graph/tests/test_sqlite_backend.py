@@ -0,0 +1,55 @@
+import time
+
+import pytest
+
+from rate_limiter import RateLimitExceeded, TokenBucket
+from storage_backends import SQLiteBackend
+
+
+@pytest.fixture
+def workers(tmp_path):
+    """Two backends on one database file, as two server workers open it"""
+    path = str(tmp_path / "cache.db")
+    return SQLiteBackend(path), SQLiteBackend(path)
+
+
+def test_lists(workers):
+    backend, _ = workers
+    assert backend.rpush("queue", "a", "b", "a", "c") == 4
+    assert backend.lmove("queue", "processing", "LEFT", "RIGHT") == b"a"
+    assert backend.lrange("queue", 0, -1) == [b"b", b"a", b"c"]
+    assert backend.lrange("processing", 0, -1) == [b"a"]
+    assert backend.lrem("queue", 1, "a") == 1
+    assert backend.lpop("queue", 5) == [b"b", b"c"]
+    assert backend.lpop("queue") is None
+    assert not backend.exists("queue")
+
+
+def test_lease_is_shared_between_workers(workers):
+    first, second = workers
+    lease = first.lock("singleflight:AAPL", timeout=30)
+    assert lease.acquire()
+    assert not second.lock("singleflight:AAPL", timeout=30).acquire()
+    lease.release()
+    assert second.lock("singleflight:AAPL", timeout=30).acquire()
+
+
+def test_expired_hash_is_purged(workers):
+    backend, _ = workers
+    backend.purge_interval = 0
+    backend.hset("outbox:message:1", "status", "sent")
+    assert backend.expire("outbox:message:1", 0.01)
+    time.sleep(0.02)
+    backend.set("other", "value")
+    assert backend.hgetall("outbox:message:1") == {}
+
+
+def test_rate_limit_is_shared_between_workers(workers):
+    buckets = [
+        TokenBucket(backend, "test", 60, capacity=2, max_wait=0)
+        for backend in workers
+    ]
+    buckets[0].acquire()
+    buckets[1].acquire()
+    with pytest.raises(RateLimitExceeded):
+        buckets[0].acquire()
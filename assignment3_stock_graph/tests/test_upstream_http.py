@@ -0,0 +1,76 @@
+import asyncio
+
+import httpx
+import pytest
+
+from upstream_http import RetryBudget, UpstreamClient
+
+
+class CountingLimiter:
+    def __init__(self):
+        self.tokens = 0
+
+    def acquire(self):
+        self.tokens += 1
+
+
+def make_client(statuses, limiter, max_retries=2):
+    """An UpstreamClient answered by statuses in turn, without backoff"""
+    responses = iter(statuses)
+
+    def handler(request):
+        return httpx.Response(next(responses), json={"ok": True})
+
+    client = UpstreamClient(
+        "test",
+        "http://upstream.test",
+        max_retries=max_retries,
+        retry_budget=RetryBudget(min_per_second=100),
+        backoff=0,
+        limiter=limiter,
+    )
+    transport = httpx.MockTransport(handler)
+    client._client = httpx.Client(
+        base_url="http://upstream.test", transport=transport
+    )
+    client._async_client = httpx.AsyncClient(
+        base_url="http://upstream.test", transport=transport
+    )
+    return client
+
+
+def test_each_retry_takes_a_token():
+    limiter = CountingLimiter()
+    client = make_client([429, 503, 200], limiter)
+    assert client.get_json("/query") == {"ok": True}
+    assert limiter.tokens == 2
+
+
+def test_no_token_without_retry():
+    limiter = CountingLimiter()
+    client = make_client([200], limiter)
+    client.get_json("/query")
+    assert limiter.tokens == 0
+
+
+def test_gives_up_after_max_retries():
+    limiter = CountingLimiter()
+    client = make_client([429, 429], limiter, max_retries=1)
+    with pytest.raises(httpx.HTTPStatusError):
+        client.get_json("/query")
+    assert limiter.tokens == 1
+
+
+def test_each_async_retry_takes_a_token():
+    limiter = CountingLimiter()
+    client = make_client([429, 503, 200], limiter)
+    assert asyncio.run(client.aget_json("/query")) == {"ok": True}
+    assert limiter.tokens == 2
+
+
+def test_async_gives_up_after_max_retries():
+    limiter = CountingLimiter()
+    client = make_client([503, 503], limiter, max_retries=1)
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(client.aget_json("/query"))
+    assert limiter.tokens == 1
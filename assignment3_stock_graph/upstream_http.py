@@ -0,0 +1,318 @@
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Optional, Tuple
+
+import anyio
+import httpx
+import pandas as pd
+
+import metrics
+
+ALPHA_VANTAGE_URL = "https://www.alphavantage.co"
+FINNHUB_URL = "https://finnhub.io/api/v1"
+# Responses worth retrying: the provider is overloaded or restarting
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class UpstreamError(Exception):
+    """Raised when a provider answers with an error instead of data"""
+
+
+class RetryBudget:
+    """Share of recent requests that may be retried
+
+    Each request deposits ratio of a retry and each retry withdraws one,
+    over a sliding window of ttl seconds, on top of min_per_second retries
+    that are always allowed. When a provider fails outright the retries add
+    about ratio to its load, instead of multiplying it by the retry count.
+    """
+
+    def __init__(
+        self, ratio: float = 0.1, min_per_second: float = 1, ttl: float = 10
+    ):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._requests: deque = deque()
+        self._retries: deque = deque()
+
+    def _prune(self, now: float):
+        for times in (self._requests, self._retries):
+            while times and times[0] <= now - self.ttl:
+                times.popleft()
+
+    def record_request(self):
+        with self._lock:
+            now = time.monotonic()
+            self._prune(now)
+            self._requests.append(now)
+
+    def try_retry(self) -> bool:
+        """Withdraw a retry, False when the budget is spent"""
+        with self._lock:
+            now = time.monotonic()
+            self._prune(now)
+            available = (
+                self.min_per_second * self.ttl
+                + self.ratio * len(self._requests)
+                - len(self._retries)
+            )
+            if available < 1:
+                return False
+            self._retries.append(now)
+            return True
+
+
+class UpstreamClient:
+    """Pooled HTTP client for one upstream provider
+
+    Connections are kept alive and reused across calls and threads, so
+    fetching symbols back to back pays for the TCP and TLS handshakes once
+    per pooled connection rather than once per call. Every request has
+    connect and read timeouts. Transport errors and overload responses are
+    retried with jittered exponential backoff, up to max_retries per call
+    and within the provider's retry budget. Each retry also takes a token
+    from limiter, the provider's rate limiter; callers take the token for
+    the first attempt themselves. The async methods share the configuration
+    on their own pool, bound to the event loop that first uses it.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        base_url: str,
+        connect_timeout: float = 5,
+        read_timeout: float = 30,
+        max_connections: int = 20,
+        keepalive_expiry: float = 60,
+        max_retries: int = 2,
+        retry_budget: RetryBudget = None,
+        backoff: float = 0.5,
+        max_backoff: float = 8,
+        headers: Dict[str, str] = None,
+        verify: Any = True,
+        limiter=None,
+    ):
+        self.name = name
+        self.base_url = base_url
+        self.max_retries = max_retries
+        self.retry_budget = retry_budget or RetryBudget()
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.limiter = limiter
+        self._tls = base_url.startswith("https:")
+        self._options = {
+            "base_url": base_url,
+            "timeout": httpx.Timeout(read_timeout, connect=connect_timeout),
+            "limits": httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+                keepalive_expiry=keepalive_expiry,
+            ),
+            "headers": headers or {},
+            "verify": verify,
+        }
+        self._client = httpx.Client(**self._options)
+        self._async_client: Optional[httpx.AsyncClient] = None
+
+    def _trace(self):
+        """Trace hook counting new connections and timing their handshakes"""
+        started = {}
+
+        def trace(event: str, info: Dict):
+            if event == "connection.connect_tcp.started":
+                started["connect"] = time.perf_counter()
+            elif event == "connection.connect_tcp.complete":
+                metrics.increment(f"upstream_connections:{self.name}")
+                if not self._tls:
+                    self._observe_connect(started)
+            elif event == "connection.start_tls.complete":
+                self._observe_connect(started)
+
+        return trace
+
+    def _observe_connect(self, started: Dict):
+        if "connect" in started:
+            metrics.observe(
+                f"upstream_connect_seconds:{self.name}",
+                time.perf_counter() - started.pop("connect"),
+            )
+
+    def _retry_delay(self, attempt: int, response: httpx.Response = None):
+        """Seconds before a retry, honouring a provider's Retry-After"""
+        if response is not None:
+            retry_after = response.headers.get("Retry-After", "")
+            if retry_after.isdigit():
+                return min(float(retry_after), self.max_backoff)
+        delay = min(self.backoff * 2**attempt, self.max_backoff)
+        return random.uniform(delay / 2, delay)
+
+    def _should_retry(
+        self, attempt: int, response: httpx.Response = None
+    ) -> bool:
+        if attempt >= self.max_retries:
+            return False
+        if response is not None and response.status_code not in RETRY_STATUSES:
+            return False
+        if not self.retry_budget.try_retry():
+            metrics.increment(f"upstream_retries_denied:{self.name}")
+            return False
+        metrics.increment(f"upstream_retries:{self.name}")
+        return True
+
+    def _wait_to_retry(self, attempt: int, response: httpx.Response = None):
+        """Back off, then take a rate-limit token for the retry"""
+        time.sleep(self._retry_delay(attempt, response))
+        if self.limiter is not None:
+            self.limiter.acquire()
+
+    async def _await_retry(self, attempt: int, response: httpx.Response = None):
+        """Back off, then take a rate-limit token without blocking the loop"""
+        await asyncio.sleep(self._retry_delay(attempt, response))
+        if self.limiter is not None:
+            await anyio.to_thread.run_sync(self.limiter.acquire)
+
+    def get_json(self, path: str, params: Dict[str, Any] = None) -> Any:
+        """GET a JSON document, retrying transient failures"""
+        self.retry_budget.record_request()
+        metrics.increment(f"upstream_requests:{self.name}")
+        trace = self._trace()
+        attempt = 0
+        while True:
+            try:
+                response = self._client.get(
+                    path, params=params, extensions={"trace": trace}
+                )
+            except httpx.TransportError:
+                if not self._should_retry(attempt):
+                    raise
+                self._wait_to_retry(attempt)
+            else:
+                if not self._should_retry(attempt, response):
+                    response.raise_for_status()
+                    return response.json()
+                self._wait_to_retry(attempt, response)
+            attempt += 1
+
+    async def aget_json(self, path: str, params: Dict[str, Any] = None) -> Any:
+        """GET a JSON document without blocking the event loop"""
+        if self._async_client is None:
+            self._async_client = httpx.AsyncClient(**self._options)
+        self.retry_budget.record_request()
+        metrics.increment(f"upstream_requests:{self.name}")
+        sync_trace = self._trace()
+
+        async def trace(event: str, info: Dict):
+            sync_trace(event, info)
+
+        attempt = 0
+        while True:
+            try:
+                response = await self._async_client.get(
+                    path, params=params, extensions={"trace": trace}
+                )
+            except httpx.TransportError:
+                if not self._should_retry(attempt):
+                    raise
+                await self._await_retry(attempt)
+            else:
+                if not self._should_retry(attempt, response):
+                    response.raise_for_status()
+                    return response.json()
+                await self._await_retry(attempt, response)
+            attempt += 1
+
+    def close(self):
+        self._client.close()
+
+    async def aclose(self):
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+
+
+class AlphaVantageClient:
+    """Alpha Vantage daily series over a pooled UpstreamClient
+
+    get_daily returns the same (frame, meta data) pair as
+    alpha_vantage.timeseries.TimeSeries with output_format="pandas".
+    """
+
+    def __init__(self, upstream: UpstreamClient, api_key: str):
+        self.upstream = upstream
+        self.api_key = api_key
+
+    def _params(self, function: str, symbol: str, **params) -> Dict:
+        return {
+            "function": function,
+            "symbol": symbol,
+            "apikey": self.api_key,
+            **params,
+        }
+
+    @staticmethod
+    def _check(payload: Dict, key: str) -> Dict:
+        """Raise the error Alpha Vantage reports in place of data"""
+        if key in payload:
+            return payload
+        for field in ("Error Message", "Information", "Note"):
+            if field in payload:
+                raise UpstreamError(payload[field])
+        raise UpstreamError("Error getting data from the api")
+
+    @staticmethod
+    def _frame(payload: Dict) -> Tuple[pd.DataFrame, Dict]:
+        data = pd.DataFrame.from_dict(
+            payload["Time Series (Daily)"], orient="index", dtype=float
+        )
+        data.index = pd.to_datetime(data.index)
+        data.index.name = "date"
+        return data, payload["Meta Data"]
+
+    def get_daily(
+        self, symbol: str, outputsize: str = "compact"
+    ) -> Tuple[pd.DataFrame, Dict]:
+        payload = self.upstream.get_json(
+            "/query",
+            self._params("TIME_SERIES_DAILY", symbol, outputsize=outputsize),
+        )
+        return self._frame(self._check(payload, "Time Series (Daily)"))
+
+    async def aget_daily(
+        self, symbol: str, outputsize: str = "compact"
+    ) -> Tuple[pd.DataFrame, Dict]:
+        payload = await self.upstream.aget_json(
+            "/query",
+            self._params("TIME_SERIES_DAILY", symbol, outputsize=outputsize),
+        )
+        return self._frame(self._check(payload, "Time Series (Daily)"))
+
+
+def finnhub_headers(api_key: str) -> Dict[str, str]:
+    return {"X-Finnhub-Token": api_key}
+
+
+class FinnhubClient:
+    """Finnhub company news over a pooled UpstreamClient
+
+    company_news matches finnhub.Client.company_news. The upstream client
+    sends the API key in its X-Finnhub-Token header (see finnhub_headers),
+    which keeps it out of URLs.
+    """
+
+    def __init__(self, upstream: UpstreamClient):
+        self.upstream = upstream
+
+    def company_news(self, symbol: str, _from: str, to: str) -> list:
+        return self.upstream.get_json(
+            "/company-news", {"symbol": symbol, "from": _from, "to": to}
+        )
+
+    async def acompany_news(self, symbol: str, _from: str, to: str) -> list:
+        return await self.upstream.aget_json(
+            "/company-news", {"symbol": symbol, "from": _from, "to": to}
+        )